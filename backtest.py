@@ -0,0 +1,612 @@
+"""
+Rejeu hors ligne (backtest) de CardPredictor
+Fait passer un journal de messages du canal de statistiques dans le même
+enchaînement que process_stat_update (should_predict, verify_prediction,
+check_expired_predictions), sans Telegram, sans attente et sans journalisation,
+puis affiche le taux de réussite, la distribution des offsets et le débit.
+
+Sources acceptées:
+- capture du bot (CAPTURE_FILE): .jsonl, .jsonl.gz ou dossier de captures
+- export Telegram Desktop (result.json)
+- fichier texte: un message par ligne
+- --synthetic N: N résultats générés (mesure de débit)
+
+En parallèle (--jobs), l'historique est décrit par tranches (plages d'octets,
+archives, plages de résultats générés) que chaque processus lit, analyse et
+découpe aux changements de cycle (remise à zéro de la numérotation); seuls les
+cycles à cheval sur deux tranches sont recollés, avec une fusion exacte des compteurs.
+
+Usage:
+    python backtest.py captures/stat_events.jsonl
+    python backtest.py export/result.json
+    python backtest.py --synthetic 1000000 --seed 42
+    python backtest.py captures/ --jobs 8
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from predictor import CardPredictor, TriggerRule
+from capture import capture_files, iter_capture
+from ingest import SeenCache
+
+# (type new/edit, identifiant du message ou None, texte)
+Message = Tuple[str, Optional[int], str]
+
+
+# === SOURCES DE MESSAGES ===
+def _export_text(text: Any) -> str:
+    """Texte d'un message d'export Telegram (chaîne ou liste de fragments)"""
+    if isinstance(text, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+    return text or ""
+
+
+def iter_export(path: Path) -> Iterator[Message]:
+    """Messages d'un export Telegram Desktop (result.json)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for message in data.get("messages", []):
+        if message.get("type", "message") != "message":
+            continue
+        text = _export_text(message.get("text"))
+        if text:
+            yield "new", message.get("id"), text
+
+
+def iter_text(path: Path) -> Iterator[Message]:
+    """Un message par ligne"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield "new", None, line
+
+
+def iter_source(source: str) -> Iterator[Message]:
+    """Choisit le lecteur selon le type de source"""
+    path = Path(source)
+    if path.is_dir() or path.name.endswith((".jsonl", ".jsonl.gz")):
+        for event in iter_capture(path):
+            yield event.get("type", "new"), event.get("message_id"), event.get("text", "")
+    elif path.suffix == ".json":
+        yield from iter_export(path)
+    else:
+        yield from iter_text(path)
+
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♠️', '♥️', '♦️', '♣️']
+# (carte affichée, points au baccara)
+CARDS = [(rank + suit, 1 if rank == 'A' else int(rank) if rank.isdigit() and rank != '10' else 0)
+         for rank in RANKS for suit in SUITS]
+
+
+def _group(cards) -> str:
+    return f"{sum(points for _, points in cards) % 10}({''.join(card for card, _ in cards)})"
+
+
+def synthetic_messages(count: int, seed: Optional[int] = None, pending_ratio: float = 0.3,
+                       games_per_cycle: int = 1440, start: int = 0) -> Iterator[Message]:
+    """
+    Génère 'count' résultats au format du canal (#N{n}. ✅3(A♠️K♥️) - 5(9♦️4♣️)).
+    Une partie des jeux est d'abord publiée en cours (⏰) puis éditée.
+    La numérotation repart à 1 tous les 'games_per_cycle' jeux.
+    Chaque cycle a son propre générateur (graine, numéro de cycle): la tranche
+    [start, start + count) est identique à celle d'une génération complète,
+    ce qui permet de la produire directement dans un processus de rejeu.
+    """
+    if seed is None:
+        seed = random.getrandbits(63)
+    end = start + count
+    for cycle in range(start // games_per_cycle, -(-end // games_per_cycle)):
+        rng = random.Random(f"{seed}:{cycle}")
+        choices, rand = rng.choices, rng.random
+        cycle_start = cycle * games_per_cycle
+        for i in range(cycle_start, min(end, cycle_start + games_per_cycle)):
+            game = i - cycle_start + 1
+            cards = choices(CARDS, k=6)
+            # Troisième carte tirée dans environ 40% des mains
+            first = _group(cards[:3] if rand() < 0.4 else cards[:2])
+            second = _group(cards[3:] if rand() < 0.4 else cards[3:5])
+            pending = rand() < pending_ratio
+            final = '✅' if rand() < 0.5 else '🔰'
+            if i < start:
+                continue
+            message_id = i + 1
+            if pending:
+                yield "new", message_id, f"⏰#N{game}. {first} - ▶️{second}"
+                yield "edit", message_id, f"#N{game}. ✅{first} - {second}"
+            else:
+                yield "new", message_id, f"#N{game}. {final}{first} - {second}"
+
+
+# === MOTEUR DE REJEU ===
+class Backtest:
+    """Rejoue des messages dans CardPredictor et compte les résultats"""
+
+    def __init__(self, reset_on_wrap: bool = True, wrap_threshold: int = 100, dedupe: bool = True,
+                 rule: Optional[TriggerRule] = None):
+        """
+        Args:
+            reset_on_wrap: Repartir d'un prédicteur vierge quand la numérotation des jeux recommence
+            wrap_threshold: Baisse minimale du numéro de jeu considérée comme un nouveau cycle
+            dedupe: Écarter les mises à jour identiques (même message, même texte), comme l'ingestion
+            rule: Règle de déclenchement (défaut: règle en production)
+        """
+        self.rule = rule or TriggerRule()
+        self.status_offsets = {self.rule.status(offset): offset for offset in range(self.rule.window + 1)}
+        self.reset_on_wrap = reset_on_wrap
+        self.wrap_threshold = wrap_threshold
+        self.seen = SeenCache() if dedupe else None
+        self.predictor = CardPredictor(self.rule)
+        self.last_game = 0
+        self.messages = 0
+        self.duplicates = 0
+        self.predictions = 0
+        self.offsets = dict.fromkeys(self.status_offsets.values(), 0)
+        self.expired = 0
+        self.unresolved = 0  # Prédictions encore en attente au changement de cycle
+        self.cycles = 1
+        self.engine_seconds = 0.0
+
+    def _new_cycle(self):
+        self.unresolved += sum(1 for s in self.predictor.prediction_status.values() if s == '⌛')
+        self.predictor = CardPredictor(self.rule)
+        self.cycles += 1
+
+    def process(self, kind: str, message_id: Optional[int], text: str):
+        """Même enchaînement que process_stat_update (hors diffusion et éditions)"""
+        self.messages += 1
+        if self.seen is not None and message_id is not None \
+                and self.seen.check_and_add(0, message_id, text):
+            self.duplicates += 1
+            return
+        predictor = self.predictor
+        game_number = predictor.extract_game_number(text)
+        if game_number is not None:
+            if self.reset_on_wrap and game_number < self.last_game - self.wrap_threshold:
+                self._new_cycle()
+                predictor = self.predictor
+            self.last_game = game_number
+
+        is_pending, _ = predictor.is_pending_edit_message(text)
+        if is_pending:
+            return
+
+        predicted, _, _ = predictor.process_final_edit_message(text)
+        if not predicted:
+            predicted, _, _ = predictor.should_predict(text)
+        if predicted:
+            self.predictions += 1
+
+        verified, number = predictor.verify_prediction(text)
+        if verified:
+            self.offsets[self.status_offsets[predictor.prediction_status[number]]] += 1
+
+        if game_number:
+            self.expired += len(predictor.check_expired_predictions(game_number))
+
+    def feed(self, messages: Iterable[Message]) -> "Backtest":
+        """Rejoue les messages (temps moteur mesuré hors lecture de la source)"""
+        perf_counter = time.perf_counter
+        process = self.process
+        for kind, message_id, text in messages:
+            started = perf_counter()
+            process(kind, message_id, text)
+            self.engine_seconds += perf_counter() - started
+        return self
+
+    def run(self, messages: Iterable[Message]) -> Dict[str, Any]:
+        """Rejoue tous les messages et retourne le rapport"""
+        wall_start = time.perf_counter()
+        self.feed(messages)
+        return build_report(self.counters(), time.perf_counter() - wall_start)
+
+    def counters(self) -> Dict[str, Any]:
+        """Compteurs bruts, additionnables entre fragments d'historique"""
+        return {
+            "messages": self.messages,
+            "duplicates": self.duplicates,
+            "cycles": self.cycles,
+            "predictions": self.predictions,
+            "offsets": dict(self.offsets),
+            "expired": self.expired,
+            "unresolved": self.unresolved,
+            "pending": sum(1 for s in self.predictor.prediction_status.values() if s == '⌛'),
+            "engine_seconds": self.engine_seconds,
+        }
+
+
+def merge_counters(parts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Somme exacte des compteurs de plusieurs fragments"""
+    total: Dict[str, Any] = {"messages": 0, "duplicates": 0, "cycles": 0, "predictions": 0,
+                             "offsets": {}, "expired": 0, "unresolved": 0,
+                             "pending": 0, "engine_seconds": 0.0}
+    for part in parts:
+        for key, value in part.items():
+            if key == "offsets":
+                for offset, count in value.items():
+                    total["offsets"][offset] = total["offsets"].get(offset, 0) + count
+            else:
+                total[key] += value
+    return total
+
+
+def build_report(counters: Dict[str, Any], wall_seconds: float, jobs: int = 1) -> Dict[str, Any]:
+    """Rapport final à partir des compteurs (séquentiels ou fusionnés)"""
+    wins = sum(counters["offsets"].values())
+    resolved = wins + counters["expired"]
+    messages = counters["messages"]
+    engine_seconds = counters["engine_seconds"]
+    return {
+        "messages": messages,
+        "duplicates": counters["duplicates"],
+        "cycles": counters["cycles"],
+        "predictions": counters["predictions"],
+        "wins": wins,
+        "losses": counters["expired"],
+        "win_rate": wins / resolved * 100 if resolved else 0.0,
+        "offsets": dict(counters["offsets"]),
+        "pending": counters["pending"],
+        "unresolved": counters["unresolved"],
+        "jobs": jobs,
+        "wall_seconds": wall_seconds,
+        "engine_seconds": engine_seconds,
+        "messages_per_second": messages / wall_seconds if wall_seconds else 0.0,
+        "engine_messages_per_second": messages / engine_seconds if engine_seconds else 0.0,
+    }
+
+
+# === REJEU PARALLÈLE ===
+def _parse_line(fmt: str, line: bytes) -> Optional[Message]:
+    """Message d'une ligne de capture (JSONL) ou de fichier texte"""
+    if fmt == "capture":
+        line = line.strip()
+        if not line:
+            return None
+        event = json.loads(line)
+        return event.get("type", "new"), event.get("message_id"), event.get("text", "")
+    text = line.decode('utf-8').strip()
+    return ("new", None, text) if text else None
+
+
+def _file_lines(shard: Dict[str, Any]) -> Iterator[bytes]:
+    """Lignes d'une tranche de fichier: [start, end) en octets, ou l'archive gzip entière"""
+    if shard["gzip"]:
+        with gzip.open(shard["path"], 'rb') as f:
+            yield from f
+        return
+    with open(shard["path"], 'rb') as f:
+        f.seek(shard["start"])
+        remaining = shard["end"] - shard["start"]
+        for line in f:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            yield line
+
+
+def _last_lines(shard: Dict[str, Any], count: int) -> List[bytes]:
+    """Dernières lignes d'une tranche, lues à rebours (sans relire toute la tranche)"""
+    if shard["gzip"]:
+        return list(deque(_file_lines(shard), maxlen=count))
+    start, position = shard["start"], shard["end"]
+    blocks: List[bytes] = []
+    newlines = 0
+    with open(shard["path"], 'rb') as f:
+        while position > start and newlines <= count:
+            size = min(1 << 16, position - start)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            newlines += block.count(b"\n")
+            blocks.append(block)
+    lines = b"".join(reversed(blocks)).split(b"\n")
+    if position > start:
+        lines = lines[1:]  # Première ligne incomplète
+    return lines[-count:]
+
+
+def shard_messages(shard: Dict[str, Any]) -> Iterator[Message]:
+    """Messages d'une tranche d'historique (lus ou générés dans le processus de rejeu)"""
+    if shard["kind"] == "synthetic":
+        yield from synthetic_messages(shard["count"], shard["seed"], start=shard["start"])
+    elif shard["kind"] == "messages":
+        yield from shard["messages"]
+    else:
+        fmt = shard["format"]
+        for line in _file_lines(shard):
+            message = _parse_line(fmt, line)
+            if message is not None:
+                yield message
+
+
+def _shard_tail(shard: Dict[str, Any], count: int) -> List[Message]:
+    """Derniers messages d'une tranche (amorçage du cache des doublons de la tranche suivante)"""
+    if shard["kind"] == "synthetic":
+        return []  # Identifiants et textes uniques: aucun doublon possible
+    if shard["kind"] == "messages":
+        return shard["messages"][-count:]
+    messages = (_parse_line(shard["format"], line) for line in _last_lines(shard, count))
+    return [message for message in messages if message is not None]
+
+
+def _replay_shard(shard: Dict[str, Any], prime: Optional[Dict[str, Any]], rule: Optional[TriggerRule],
+                  wrap_threshold: int, dedupe: bool) -> Dict[str, Any]:
+    """
+    Tâche d'un processus: lit ou génère sa tranche, écarte les doublons (cache
+    amorcé avec la fin de la tranche précédente), découpe aux changements de
+    cycle et rejoue les cycles complets. Le début et la fin de la tranche,
+    qui peuvent continuer un cycle des tranches voisines, sont renvoyés tels quels.
+    """
+    logging.disable(logging.CRITICAL)
+    seen = SeenCache() if dedupe else None
+    if seen is not None and prime is not None:
+        for _, message_id, text in _shard_tail(prime, seen.max_entries):
+            if message_id is not None:
+                seen.check_and_add(0, message_id, text)
+
+    extract_game_number = CardPredictor().extract_game_number
+    pre: List[Message] = []  # Avant le premier numéro de jeu (cycle de la tranche précédente)
+    cycles: List[List[Message]] = [[]]
+    first_game = last_game = None
+    messages = duplicates = 0
+    for message in shard_messages(shard):
+        messages += 1
+        _, message_id, text = message
+        if seen is not None and message_id is not None and seen.check_and_add(0, message_id, text):
+            duplicates += 1
+            continue
+        game_number = extract_game_number(text)
+        if game_number is not None:
+            if first_game is None:
+                first_game = game_number
+            elif game_number < last_game - wrap_threshold:
+                cycles.append([])
+            last_game = game_number
+        (pre if first_game is None else cycles[-1]).append(message)
+
+    return {
+        "pre": pre,
+        "head": cycles[0],
+        "inner": [Backtest(reset_on_wrap=False, dedupe=False, rule=rule).feed(cycle).counters()
+                  for cycle in cycles[1:-1]],
+        "tail": cycles[-1] if len(cycles) > 1 else None,
+        "first_game": first_game,
+        "last_game": last_game,
+        "messages": messages,
+        "duplicates": duplicates,
+    }
+
+
+def _run_cycles(cycles: List[List[Message]], rule: Optional[TriggerRule] = None) -> List[Dict[str, Any]]:
+    """Tâche d'un processus: chaque cycle repart d'un prédicteur vierge"""
+    logging.disable(logging.CRITICAL)
+    return [Backtest(reset_on_wrap=False, dedupe=False, rule=rule).feed(cycle).counters() for cycle in cycles]
+
+
+class ParallelBacktest:
+    """
+    Rejeu parallèle: l'historique est décrit par tranches (plages d'octets d'un
+    fichier, archives gzip, plages de résultats générés), lues, analysées et
+    découpées aux changements de cycle dans les processus. Le processus
+    principal ne fait que recoller les cycles à cheval sur deux tranches et
+    fusionner les compteurs: le résultat est identique au rejeu séquentiel
+    avec reset_on_wrap.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, shards_per_job: int = 4,
+                 wrap_threshold: int = 100, dedupe: bool = True, rule: Optional[TriggerRule] = None,
+                 min_shard_bytes: int = 1 << 20, messages_per_shard: int = 50000):
+        """
+        Args:
+            jobs: Nombre de processus (défaut: nombre de cœurs)
+            shards_per_job: Tranches par processus (équilibrage de charge)
+            wrap_threshold: Baisse minimale du numéro de jeu considérée comme un nouveau cycle
+            dedupe: Écarter les mises à jour identiques (dans chaque tranche, cache amorcé
+                avec la fin de la tranche précédente)
+            rule: Règle de déclenchement (défaut: règle en production)
+            min_shard_bytes: Taille minimale d'une tranche de fichier
+            messages_per_shard: Taille des tranches d'un itérable de messages quelconque
+        """
+        self.rule = rule
+        self.jobs = jobs or os.cpu_count() or 1
+        self.shards_per_job = max(1, shards_per_job)
+        self.wrap_threshold = wrap_threshold
+        self.dedupe = dedupe
+        self.seen_size = SeenCache().max_entries
+        self.min_shard_bytes = min_shard_bytes
+        self.messages_per_shard = messages_per_shard
+
+    # === DÉCOUPAGE EN TRANCHES (sans lire le contenu) ===
+    def _split_file(self, path: Path, fmt: str) -> List[Dict[str, Any]]:
+        """Plages d'octets alignées sur des débuts de ligne"""
+        size = path.stat().st_size
+        count = max(1, min(self.jobs * self.shards_per_job, size // self.min_shard_bytes))
+        bounds = [0]
+        with open(path, 'rb') as f:
+            for index in range(1, count):
+                f.seek(index * size // count)
+                f.readline()
+                if bounds[-1] < f.tell() < size:
+                    bounds.append(f.tell())
+        bounds.append(size)
+        return [{"kind": "file", "path": str(path), "format": fmt, "gzip": False, "start": start, "end": end}
+                for start, end in zip(bounds, bounds[1:])]
+
+    def source_shards(self, source: str) -> Iterator[Dict[str, Any]]:
+        """Tranches d'une source (mêmes formats que iter_source)"""
+        path = Path(source)
+        if path.suffix == ".json" and not path.is_dir():
+            # Export Telegram: un seul document JSON, lu dans le processus principal
+            yield from self.message_shards(iter_export(path))
+            return
+        is_capture = path.is_dir() or path.name.endswith((".jsonl", ".jsonl.gz"))
+        fmt = "capture" if is_capture else "text"
+        for file in (capture_files(path) if is_capture else [path]):
+            if file.suffix == ".gz":
+                yield {"kind": "file", "path": str(file), "format": fmt, "gzip": True, "start": 0, "end": None}
+            else:
+                yield from self._split_file(file, fmt)
+
+    def synthetic_shards(self, count: int, seed: int, games_per_cycle: int = 1440) -> Iterator[Dict[str, Any]]:
+        """Plages de résultats générés, alignées sur les cycles"""
+        per_shard = -(-count // (self.jobs * self.shards_per_job))
+        per_shard = max(1, -(-per_shard // games_per_cycle)) * games_per_cycle
+        for start in range(0, count, per_shard):
+            yield {"kind": "synthetic", "seed": seed, "start": start, "count": min(per_shard, count - start)}
+
+    def message_shards(self, messages: Iterable[Message]) -> Iterator[Dict[str, Any]]:
+        """Lots d'un itérable de messages quelconque (lu dans le processus principal)"""
+        batch: List[Message] = []
+        for message in messages:
+            batch.append(message)
+            if len(batch) >= self.messages_per_shard:
+                yield {"kind": "messages", "messages": batch}
+                batch = []
+        if batch:
+            yield {"kind": "messages", "messages": batch}
+
+    def _prime(self, shard: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Description de la tranche précédente envoyée pour amorcer le cache des doublons"""
+        if shard is None or not self.dedupe:
+            return None
+        if shard["kind"] == "messages":
+            return dict(shard, messages=shard["messages"][-self.seen_size:])
+        return shard
+
+    # === REJEU ===
+    def run(self, messages: Iterable[Message]) -> Dict[str, Any]:
+        """Rejoue un itérable de messages"""
+        return self.run_shards(self.message_shards(messages))
+
+    def run_source(self, source: str) -> Dict[str, Any]:
+        """Rejoue une capture, un export ou un fichier texte (lus par les processus)"""
+        return self.run_shards(self.source_shards(source))
+
+    def run_synthetic(self, count: int, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Rejoue 'count' résultats générés directement dans les processus"""
+        return self.run_shards(self.synthetic_shards(count, random.getrandbits(63) if seed is None else seed))
+
+    def run_shards(self, shards: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Rejoue les tranches en parallèle, recolle les cycles à cheval et fusionne les compteurs"""
+        wall_start = time.perf_counter()
+        parent_start = time.process_time()
+        self._parts: List[Any] = []  # Compteurs ou Future d'un cycle recollé, dans l'ordre
+        self._current: List[Message] = []  # Cycle en cours de recollage
+        self._last_game = 0
+        self._duplicates = 0
+        in_flight: "deque[Future]" = deque()
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            self._pool = pool
+            previous = None
+            for shard in shards:
+                in_flight.append(pool.submit(_replay_shard, shard, self._prime(previous), self.rule,
+                                             self.wrap_threshold, self.dedupe))
+                previous = shard
+                # File bornée: le découpage ne prend pas trop d'avance
+                while len(in_flight) > self.jobs * 2:
+                    self._absorb(in_flight.popleft().result())
+            while in_flight:
+                self._absorb(in_flight.popleft().result())
+            self._close_cycle()
+            parts = [part.result()[0] if isinstance(part, Future) else part for part in self._parts]
+        self._pool = None
+
+        # Les prédictions en attente à la fin d'un cycle (sauf le dernier) sont non résolues
+        for part in parts[:-1]:
+            part["unresolved"] += part["pending"]
+            part["pending"] = 0
+        counters = merge_counters(parts)
+        counters["messages"] += self._duplicates
+        counters["duplicates"] += self._duplicates
+        report = build_report(counters, time.perf_counter() - wall_start, self.jobs)
+        report["parent_seconds"] = time.process_time() - parent_start
+        return report
+
+    def _close_cycle(self):
+        if self._current:
+            self._parts.append(self._pool.submit(_run_cycles, [self._current], self.rule))
+        self._current = []
+
+    def _absorb(self, result: Dict[str, Any]):
+        """Recolle le résultat d'une tranche au cycle en cours (même détection que Backtest.process)"""
+        self._duplicates += result["duplicates"]
+        self._current.extend(result["pre"])
+        first_game = result["first_game"]
+        if first_game is None:
+            return
+        if first_game < self._last_game - self.wrap_threshold:
+            self._close_cycle()
+        self._current.extend(result["head"])
+        if result["tail"] is not None:
+            self._close_cycle()
+            self._parts.extend(result["inner"])
+            self._current = result["tail"]
+        self._last_game = result["last_game"]
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formate le rapport de backtest pour l'affichage"""
+    wins = report["wins"] or 1
+    offsets = " | ".join(f"+{k}: {v} ({v / wins * 100:.1f}%)" for k, v in sorted(report["offsets"].items()))
+    return f"""📊 Rapport de backtest
+📨 Messages: {report['messages']} (doublons écartés: {report['duplicates']}, cycles: {report['cycles']})
+🎯 Prédictions: {report['predictions']} | ✅ {report['wins']} | ❌ {report['losses']} | ⌛ {report['pending']} (non résolues aux changements de cycle: {report['unresolved']})
+🏆 Taux de réussite: {report['win_rate']:.2f}%
+📐 Offsets: {offsets}
+⚡ Débit: {report['messages_per_second']:,.0f} msg/s en {report['wall_seconds']:.2f} s avec {report['jobs']} processus (moteur: {report['engine_messages_per_second']:,.0f} msg/s par processus)""" + (
+        f"\n🧭 Processus principal: {report['parent_seconds']:.2f} s CPU (découpage, recollage, fusion)"
+        if "parent_seconds" in report else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu hors ligne des règles de CardPredictor")
+    parser.add_argument("source", nargs="?", help="Capture (.jsonl/.jsonl.gz/dossier), export result.json ou texte")
+    parser.add_argument("--synthetic", type=int, default=0, help="Nombre de résultats générés à la place d'une source")
+    parser.add_argument("--seed", type=int, default=None, help="Graine des résultats générés")
+    parser.add_argument("--no-reset-on-wrap", action="store_true",
+                        help="Garder l'état du prédicteur quand la numérotation recommence (comme un bot jamais réinitialisé)")
+    parser.add_argument("--wrap-threshold", type=int, default=100,
+                        help="Baisse du numéro de jeu considérée comme un nouveau cycle")
+    parser.add_argument("--jobs", type=int, default=0,
+                        help="Processus de rejeu parallèle par cycle (défaut: nombre de cœurs, 1 = séquentiel)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Ne pas écarter les mises à jour identiques (jamais pour --synthetic)")
+    args = parser.parse_args()
+    if not args.source and not args.synthetic:
+        parser.error("indiquer une source ou --synthetic N")
+
+    # Aucune ligne de log: chaque appel logger.* devient un simple test
+    logging.disable(logging.CRITICAL)
+
+    dedupe = not (args.keep_duplicates or args.synthetic)
+    jobs = args.jobs or os.cpu_count() or 1
+    if jobs > 1 and args.no_reset_on_wrap:
+        # Sans remise à zéro, l'état traverse les cycles: pas de découpage possible
+        print("ℹ️ --no-reset-on-wrap: rejeu séquentiel")
+        jobs = 1
+    if jobs > 1:
+        # Les processus lisent ou génèrent eux-mêmes leurs tranches
+        backtest = ParallelBacktest(jobs, wrap_threshold=args.wrap_threshold, dedupe=dedupe)
+        report = backtest.run_synthetic(args.synthetic, args.seed) if args.synthetic \
+            else backtest.run_source(args.source)
+    else:
+        messages = synthetic_messages(args.synthetic, args.seed) if args.synthetic else iter_source(args.source)
+        backtest = Backtest(reset_on_wrap=not args.no_reset_on_wrap, wrap_threshold=args.wrap_threshold,
+                            dedupe=dedupe)
+        report = backtest.run(messages)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
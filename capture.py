@@ -0,0 +1,173 @@
+"""
+Capture brute des mises à jour du canal de statistiques
+Enregistreur optionnel (CAPTURE_FILE) qui ajoute chaque message reçu ou édité
+(type new/edit, canal, message, horodatage, texte) à un journal JSONL.
+L'écriture se fait dans un thread séparé (QueueListener) avec tampon; le
+fichier actif tourne à max_bytes et les anciens fichiers sont compressés en gzip.
+Les captures servent à rejouer la production hors ligne (backtest, régressions).
+"""
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Union
+from log_setup import DeferredQueueHandler, get_logger
+from tracing import JsonLineFormatter
+
+logger = get_logger('capture')
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotation par taille, fichiers archivés compressés (.1.gz, .2.gz...) et écriture tamponnée"""
+
+    def __init__(self, filename: str, max_bytes: int, backups: int, flush_every: int = 200):
+        self._size = 0  # Octets du fichier actif (sans stream.tell(), qui viderait le tampon)
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self.flush_every = max(1, flush_every)
+        self._unflushed = 0
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+
+    def _open(self):
+        stream = super()._open()
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def emit(self, record: logging.LogRecord):
+        # Ligne formatée une seule fois, pour la taille et l'écriture; la taille est suivie
+        # par le handler (RotatingFileHandler appelle stream.tell() à chaque ligne)
+        try:
+            line = self.format(record) + self.terminator
+            size = len(line.encode('utf-8'))
+            if self.stream is None:
+                self.stream = self._open()
+            if 0 < self.maxBytes <= self._size + size and self._size > 0:
+                self.doRollover()
+            self.stream.write(line)
+            self._size += size
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def flush(self):
+        # Appelé par StreamHandler.emit après chaque ligne: on ne vide le tampon que toutes les N lignes
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.force_flush()
+
+    def force_flush(self):
+        self._unflushed = 0
+        super().flush()
+
+    def close(self):
+        self.force_flush()
+        super().close()
+
+
+class EventRecorder:
+    """Journal des mises à jour brutes du canal de statistiques"""
+
+    def __init__(self, capture_file: str = "captures/stat_events.jsonl", max_bytes: int = 20 * 1024 * 1024,
+                 backups: int = 50, flush_every: int = 200):
+        """
+        Args:
+            capture_file: Fichier JSONL actif (archives: capture_file.N.gz, N=1 le plus récent)
+            max_bytes: Taille avant rotation
+            backups: Nombre d'archives conservées
+            flush_every: Nombre de lignes entre deux écritures sur disque
+        """
+        self.capture_file = capture_file
+        self.recorded = 0
+        self._listener = None
+        self._logger = logging.getLogger(f"capture.{id(self):x}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        try:
+            Path(capture_file).parent.mkdir(parents=True, exist_ok=True)
+            self._output = CompressingRotatingFileHandler(capture_file, max_bytes, backups, flush_every)
+            self._output.setFormatter(JsonLineFormatter())
+            capture_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            self._logger.addHandler(DeferredQueueHandler(capture_queue))
+            self._listener = logging.handlers.QueueListener(capture_queue, self._output)
+            self._listener.start()
+            logger.info("🎥 Capture des mises à jour activée: %s", capture_file)
+        except OSError as e:
+            logger.warning("⚠️ Capture désactivée (%s): %s", capture_file, e)
+
+    @property
+    def enabled(self) -> bool:
+        return self._listener is not None
+
+    def record(self, kind: str, chat_id: int, message_id: int, text: str, timestamp: Optional[float] = None):
+        """Ajoute une mise à jour au journal (ne bloque pas la boucle)"""
+        if self._listener is None:
+            return
+        self.recorded += 1
+        self._logger.info({
+            "type": kind,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "ts": round(timestamp if timestamp is not None else time.time(), 3),
+            "text": text,
+        })
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "file": self.capture_file, "recorded": self.recorded}
+
+    def stop(self):
+        """Vide la file et le tampon, puis arrête le thread d'écriture"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._output.close()
+            self._listener = None
+
+
+def capture_files(path: Union[str, Path]) -> List[Path]:
+    """
+    Fichiers d'une capture dans l'ordre chronologique: archives de la plus
+    ancienne (.N.gz) à la plus récente (.1.gz), puis le fichier actif.
+    'path' peut être le fichier actif, une archive seule ou un dossier de captures.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files: List[Path] = []
+        for active in sorted(path.glob("*.jsonl")):
+            files.extend(capture_files(active))
+        return files
+    if not path.name.endswith(".jsonl"):
+        return [path]
+    pattern = re.compile(re.escape(path.name) + r"\.(\d+)\.gz$")
+    archives = []
+    for candidate in path.parent.glob(path.name + ".*.gz"):
+        match = pattern.match(candidate.name)
+        if match:
+            archives.append((int(match.group(1)), candidate))
+    files = [p for _, p in sorted(archives, reverse=True)]
+    if path.exists():
+        files.append(path)
+    return files
+
+
+def iter_capture(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Relit une capture (fichiers .jsonl ou .jsonl.gz) événement par événement"""
+    for file in capture_files(path):
+        opener = gzip.open if file.suffix == ".gz" else open
+        with opener(file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
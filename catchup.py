@@ -0,0 +1,186 @@
+"""
+Rattrapage au démarrage des messages manqués du canal de statistiques
+Le dernier message traité de chaque canal est persisté; au démarrage, les
+messages publiés pendant l'arrêt du bot sont récupérés du plus récent au plus
+ancien (iter_messages), dans une limite de temps et de nombre, puis passés
+par lots et dans l'ordre chronologique dans un chemin de traitement rapide,
+sans diffusion ni attente. Quand la limite est atteinte, ce sont les messages
+les plus anciens qui manquent (les plus récents portent les prédictions encore
+en cours): la plage non traitée est enregistrée comme trou avec le point de
+reprise. Un FloodWait suspend la récupération, qui reprend après le dernier
+message reçu.
+"""
+import asyncio
+import time
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from telethon.errors import FloodWaitError
+from log_setup import get_logger
+
+logger = get_logger('catchup')
+
+
+class CheckpointStore:
+    """
+    Dernier message traité par canal, sauvegardé en YAML de façon espacée,
+    avec les plages de messages jamais traitées (trous laissés par un rattrapage limité)
+    """
+
+    def __init__(self, checkpoint_file: str = "yaml_db/checkpoints.yaml", save_interval: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic, max_gaps: int = 50):
+        """
+        Args:
+            checkpoint_file: Fichier YAML des points de reprise
+            save_interval: Délai minimum (secondes) entre deux écritures
+            clock: Horloge monotone injectable
+            max_gaps: Nombre de trous conservés par canal (les plus anciens sont oubliés)
+        """
+        self.checkpoint_file = Path(checkpoint_file)
+        self.save_interval = save_interval
+        self.clock = clock
+        self.max_gaps = max_gaps
+        self.checkpoints: Dict[int, int] = {}
+        self.gaps: Dict[int, List[List[Optional[int]]]] = {}  # canal → [[premier id, dernier id ou None]]
+        self._dirty = False
+        self._last_save = 0.0
+
+    def load(self) -> Dict[int, int]:
+        """Charge les points de reprise et les trous enregistrés"""
+        try:
+            if self.checkpoint_file.exists():
+                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                    data = yaml.safe_load(f) or {}
+                self.checkpoints = {int(k): int(v) for k, v in data.get("last_message_ids", {}).items()}
+                self.gaps = {int(k): [list(gap) for gap in v] for k, v in (data.get("gaps") or {}).items()}
+                logger.info("✅ Points de reprise chargés: %s (trous: %s)", self.checkpoints, self.gaps)
+        except Exception as e:
+            logger.error("❌ Erreur chargement points de reprise: %s", e)
+        return self.checkpoints
+
+    def get(self, chat_id: int) -> Optional[int]:
+        """Dernier message traité d'un canal"""
+        return self.checkpoints.get(chat_id)
+
+    def record_gap(self, chat_id: int, first_id: int, last_id: Optional[int] = None):
+        """
+        Enregistre une plage de messages non traitée. Sans dernier id (récupération
+        impossible), le trou est fermé par le prochain message traité du canal.
+        """
+        gaps = self.gaps.setdefault(chat_id, [])
+        gaps.append([first_id, last_id])
+        del gaps[:-self.max_gaps]
+        self._dirty = True
+        logger.warning("⚠️ Messages non traités dans le canal %s: #%s à %s", chat_id, first_id,
+                       f"#{last_id}" if last_id is not None else "la reprise en direct")
+
+    def advance(self, chat_id: int, message_id: int):
+        """Avance le point de reprise (jamais en arrière) et sauvegarde si l'intervalle est écoulé"""
+        if message_id <= self.checkpoints.get(chat_id, 0):
+            return
+        for gap in self.gaps.get(chat_id, ()):
+            if gap[1] is None:
+                gap[1] = max(gap[0], message_id - 1)
+        self.checkpoints[chat_id] = message_id
+        self._dirty = True
+        if self.clock() - self._last_save >= self.save_interval:
+            self.flush()
+
+    def flush(self):
+        """Écrit les points de reprise s'ils ont changé"""
+        if not self._dirty:
+            return
+        try:
+            self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+                yaml.dump({"last_message_ids": self.checkpoints, "gaps": self.gaps}, f, default_flow_style=False)
+            self._dirty = False
+            self._last_save = self.clock()
+        except Exception as e:
+            logger.error("❌ Erreur sauvegarde points de reprise: %s", e)
+
+
+async def catch_up(client, chat_id: int, since_id: int,
+                   process_batch: Callable[[List[Any]], Awaitable[int]],
+                   max_seconds: float = 30.0, max_messages: int = 5000,
+                   batch_size: int = 100) -> Dict[str, Any]:
+    """
+    Récupère les messages postérieurs à since_id, des plus récents aux plus
+    anciens, puis les traite par lots du plus ancien au plus récent.
+
+    Args:
+        client: Client Telegram
+        chat_id: Canal à rattraper
+        since_id: Dernier message déjà traité
+        process_batch: Coroutine traitant une liste de messages, retourne le nombre traité
+        max_seconds: Durée maximale de la récupération
+        max_messages: Nombre maximum de messages récupérés (les plus récents)
+        batch_size: Taille des lots de traitement
+
+    Returns:
+        Résumé: messages récupérés/traités, durée, dernier id traité, plages non
+        traitées ('gaps': [premier id, dernier id ou None]) et rattrapage tronqué ou non
+    """
+    started = time.monotonic()
+    deadline = started + max_seconds
+    messages: List[Any] = []
+    complete = False
+
+    try:
+        offset_id = 0  # 0: à partir du plus récent
+        while True:
+            try:
+                async for message in client.iter_messages(chat_id, min_id=since_id, offset_id=offset_id,
+                                                          limit=max_messages - len(messages)):
+                    messages.append(message)
+                    offset_id = message.id
+                    if time.monotonic() >= deadline:
+                        break
+                else:
+                    complete = len(messages) < max_messages
+                break
+            except FloodWaitError as e:
+                if time.monotonic() + e.seconds >= deadline:
+                    raise
+                logger.warning("⏳ FloodWait %ss pendant le rattrapage du canal %s, reprise avant #%s",
+                               e.seconds, chat_id, offset_id)
+                await asyncio.sleep(e.seconds)
+    except Exception as e:
+        logger.error("❌ Erreur pendant le rattrapage du canal %s: %s", chat_id, e)
+
+    gaps: List[List[Optional[int]]] = []
+    if not complete:
+        # Les plus anciens manquent: de since_id jusqu'au plus ancien récupéré (ou la reprise en direct)
+        oldest = messages[-1].id if messages else None
+        if oldest is None:
+            gaps.append([since_id + 1, None])
+        elif oldest > since_id + 1:
+            gaps.append([since_id + 1, oldest - 1])
+
+    messages.reverse()
+    processed = 0
+    last_id = since_id
+    for i in range(0, len(messages), batch_size):
+        batch = messages[i:i + batch_size]
+        try:
+            processed += await process_batch(batch)
+        except Exception as e:
+            logger.error("❌ Erreur pendant le traitement du rattrapage du canal %s: %s", chat_id, e)
+            gaps.append([batch[0].id, messages[-1].id])
+            break
+        last_id = batch[-1].id
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "chat_id": chat_id,
+        "since_id": since_id,
+        "last_id": last_id,
+        "fetched": len(messages),
+        "processed": processed,
+        "elapsed": elapsed,
+        "gaps": gaps,
+        "truncated": bool(gaps),
+    }
+    logger.info("⏩ Rattrapage canal %s: %s/%s message(s) depuis #%s en %.1fs%s", chat_id, processed,
+                len(messages), since_id, elapsed, " (tronqué)" if gaps else "")
+    return summary
@@ -0,0 +1,260 @@
+"""
+File d'attente de diffusion différée des prédictions
+Remplace l'attente bloquante (asyncio.sleep) de handle_messages: la diffusion
+est planifiée, persistée dans un fichier YAML et exécutée à l'heure prévue.
+Une diffusion ne quitte la file (et le fichier) qu'une fois envoyée: en cas
+d'échec elle est replanifiée avec un délai croissant (backoff exponentiel).
+"""
+import asyncio
+import heapq
+import time
+import yaml
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from log_setup import get_logger
+
+logger = get_logger('dispatch_queue')
+
+
+class DispatchQueue:
+    """File persistante de diffusions différées, ordonnée par heure d'échéance"""
+
+    PENDING_STATUS = '⌛'
+    RESOLVED_POLICIES = ('rewrite', 'drop')
+
+    def __init__(self, send_callback: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 queue_file: str = "yaml_db/dispatch_queue.yaml",
+                 clock: Callable[[], float] = time.time,
+                 status_lookup: Optional[Callable[[int], Optional[str]]] = None,
+                 resolved_policy: str = 'rewrite', base_delay: float = 5.0, max_delay: float = 300.0):
+        """
+        Initialise la file de diffusion
+
+        Args:
+            send_callback: Coroutine appelée avec l'entrée à diffuser à échéance; lève une
+                exception si la diffusion n'a produit aucun message
+            queue_file: Fichier YAML de persistance des diffusions en attente
+            clock: Horloge injectable (secondes epoch), utilisée par la simulation
+            status_lookup: Retourne le statut courant d'un numéro de jeu au moment de l'envoi
+            resolved_policy: 'rewrite' (diffuser directement le statut final) ou
+                'drop' (abandonner) quand la prédiction est déjà résolue
+            base_delay: Délai (secondes) avant la première nouvelle tentative
+            max_delay: Délai maximum entre deux tentatives
+        """
+        if resolved_policy not in self.RESOLVED_POLICIES:
+            raise ValueError(f"Politique inconnue: {resolved_policy} (attendu: {', '.join(self.RESOLVED_POLICIES)})")
+        self.send_callback = send_callback
+        self.queue_file = Path(queue_file)
+        self.clock = clock
+        self.status_lookup = status_lookup
+        self.resolved_policy = resolved_policy
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Compteurs d'envois évités
+        self.stats = {
+            "sent": 0,
+            "retries": 0,
+            "dropped_resolved": 0,
+            "rewritten_resolved": 0,
+            "fallback_avoided": 0,
+        }
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._next_id = 1
+        self._inflight: Optional[int] = None  # Diffusion en cours d'envoi
+        self._wakeup = asyncio.Event()
+        self.is_running = False
+
+    # === PERSISTANCE ===
+    def load(self) -> int:
+        """Recharge les diffusions en attente après un redémarrage"""
+        try:
+            if not self.queue_file.exists():
+                return 0
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {}
+            self._next_id = int(data.get("next_id", 1))
+            self.entries = {int(e["id"]): e for e in data.get("dispatches", [])}
+            self._heap = [(e["due_at"], entry_id) for entry_id, e in self.entries.items()]
+            heapq.heapify(self._heap)
+            self._wakeup.set()
+            logger.info("✅ File de diffusion rechargée: %s diffusion(s) en attente", len(self.entries))
+            return len(self.entries)
+        except Exception as e:
+            logger.error("❌ Erreur chargement file de diffusion: %s", e)
+            return 0
+
+    def save(self):
+        """Sauvegarde les diffusions en attente"""
+        try:
+            self.queue_file.parent.mkdir(parents=True, exist_ok=True)
+            data = {"next_id": self._next_id, "dispatches": self.list_pending()}
+            with open(self.queue_file, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+        except Exception as e:
+            logger.error("❌ Erreur sauvegarde file de diffusion: %s", e)
+
+    # === GESTION DES DIFFUSIONS ===
+    def schedule(self, game_number: int, text: str, delay_seconds: float, trace_id: Optional[str] = None) -> int:
+        """Planifie une diffusion et retourne immédiatement son identifiant"""
+        due_at = self.clock() + max(0.0, delay_seconds)
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = {
+            "id": entry_id,
+            "game_number": game_number,
+            "text": text,
+            "due_at": due_at,
+            "due": datetime.fromtimestamp(due_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "created_at": datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d %H:%M:%S"),
+            "trace_id": trace_id,
+        }
+        heapq.heappush(self._heap, (due_at, entry_id))
+        self.save()
+        self._wakeup.set()
+        logger.debug("🗓️ Diffusion #%s planifiée pour le jeu #%s à %s",
+                     entry_id, game_number, self.entries[entry_id]['due'])
+        return entry_id
+
+    def cancel(self, entry_id: int) -> bool:
+        """Annule une diffusion en attente"""
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return False
+        # L'entrée reste dans le tas et sera ignorée à échéance
+        self.save()
+        self._wakeup.set()
+        logger.info("🚫 Diffusion #%s annulée (jeu #%s)", entry_id, entry['game_number'])
+        return True
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        """Retourne les diffusions en attente triées par échéance"""
+        return sorted(self.entries.values(), key=lambda e: (e["due_at"], e["id"]))
+
+    def pending_for_game(self, game_number: int) -> Optional[Dict[str, Any]]:
+        """
+        Retourne la diffusion en attente pour un numéro de jeu, s'il y en a une.
+        La diffusion en cours d'envoi est exclue: son texte est déjà figé, un
+        changement de statut doit passer par l'édition du message.
+        """
+        for entry_id, entry in self.entries.items():
+            if entry["game_number"] == game_number and entry_id != self._inflight:
+                return entry
+        return None
+
+    def pop_due(self) -> List[Dict[str, Any]]:
+        """
+        Retourne les diffusions arrivées à échéance, retirées du tas seulement:
+        elles restent dans la file (et le fichier) jusqu'à leur envoi
+        """
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, entry_id = heapq.heappop(self._heap)
+            entry = self.entries.get(entry_id)
+            if entry is not None and entry["due_at"] <= now:
+                due.append(entry)
+        return due
+
+    def _done(self, entry: Dict[str, Any]):
+        """Retire une diffusion envoyée ou abandonnée (sauf si annulée entre-temps)"""
+        if self.entries.get(entry["id"]) is entry:
+            del self.entries[entry["id"]]
+            self.save()
+
+    def backoff(self, attempts: int) -> float:
+        """Délai avant la tentative suivante"""
+        return min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+
+    def _retry(self, entry: Dict[str, Any], error: Exception):
+        """Replanifie une diffusion en échec"""
+        if self.entries.get(entry["id"]) is not entry:
+            return
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        entry["last_error"] = str(error)
+        entry["due_at"] = self.clock() + self.backoff(entry["attempts"])
+        entry["due"] = datetime.fromtimestamp(entry["due_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        heapq.heappush(self._heap, (entry["due_at"], entry["id"]))
+        self.stats["retries"] += 1
+        self.save()
+        logger.warning("🔁 Diffusion #%s (jeu #%s) en échec, tentative %s, nouvel essai à %s: %s",
+                       entry['id'], entry['game_number'], entry['attempts'], entry['due'], error)
+
+    def check_resolved(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Vérifie le statut de la prédiction au moment de l'envoi.
+        Retourne None si l'envoi est abandonné; sinon l'entrée, avec
+        'resolved_status' renseigné si le texte doit être réécrit.
+        """
+        if self.status_lookup is None:
+            return entry
+        status = self.status_lookup(entry["game_number"])
+        if not status or status == self.PENDING_STATUS:
+            return entry
+
+        if self.resolved_policy == 'drop':
+            self.stats["dropped_resolved"] += 1
+            logger.info("🗑️ Diffusion #%s abandonnée: jeu #%s déjà résolu (%s)",
+                        entry['id'], entry['game_number'], status)
+            return None
+
+        self.stats["rewritten_resolved"] += 1
+        logger.info("✏️ Diffusion #%s réécrite: jeu #%s déjà résolu (%s)", entry['id'], entry['game_number'], status)
+        return dict(entry, resolved_status=status)
+
+    def note_fallback_avoided(self, game_number: int):
+        """Compte un envoi de secours évité car la diffusion du jeu est encore en attente"""
+        self.stats["fallback_avoided"] += 1
+        logger.debug("⏭️ Envoi de secours évité pour le jeu #%s: diffusion encore en file", game_number)
+
+    def avoided_sends(self) -> int:
+        """Nombre total d'appels API évités"""
+        return (self.stats["dropped_resolved"] + self.stats["rewritten_resolved"]
+                + self.stats["fallback_avoided"])
+
+    def seconds_until_next(self) -> Optional[float]:
+        """Délai avant la prochaine échéance (None si la file est vide)"""
+        while self._heap and self._heap[0][1] not in self.entries:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    # === BOUCLE DE DIFFUSION ===
+    async def run(self):
+        """Boucle principale: attend la prochaine échéance puis diffuse"""
+        logger.info("🚀 Démarrage de la file de diffusion")
+        self.is_running = True
+        while self.is_running:
+            try:
+                self._wakeup.clear()
+                for entry in self.pop_due():
+                    if entry["id"] not in self.entries:
+                        continue  # Annulée pendant l'envoi précédent
+                    self._inflight = entry["id"]
+                    try:
+                        dispatch = self.check_resolved(entry)
+                        if dispatch is not None:
+                            await self.send_callback(dispatch)
+                            self.stats["sent"] += 1
+                        self._done(entry)
+                    except Exception as e:
+                        self._retry(entry, e)
+                    finally:
+                        self._inflight = None
+
+                timeout = self.seconds_until_next()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                logger.error("❌ Erreur dans la file de diffusion: %s", e)
+                await asyncio.sleep(5)
+
+    def stop(self):
+        """Arrête la boucle de diffusion"""
+        self.is_running = False
+        self._wakeup.set()
+        logger.info("🛑 File de diffusion arrêtée")
@@ -0,0 +1,132 @@
+"""
+Cache d'identité et d'entités Telegram
+L'identité du bot (get_me) et les entités/titres des canaux (get_entity) sont
+chargés une fois au démarrage puis rafraîchis en arrière-plan: les chemins
+courants (ChatAction, /set_stat, /set_display) ne font plus d'aller-retour réseau.
+Une entrée expirée reste servie pendant son rafraîchissement.
+"""
+import asyncio
+import time
+from typing import Dict, Any, Optional, Callable, Iterable
+from instrumented_client import retry_flood_wait
+from log_setup import get_logger
+
+logger = get_logger('entity_cache')
+
+
+class EntityCache:
+    """Cache avec durée de vie de get_me et get_entity"""
+
+    ME_KEY = 'me'
+
+    def __init__(self, client, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            client: Client Telegram
+            ttl: Durée de vie (secondes) d'une entrée avant rafraîchissement
+            clock: Horloge monotone injectable
+        """
+        self.client = client
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[Any, Dict[str, Any]] = {}  # clé → {"value", "fetched_at"}
+        self._refreshing: Dict[Any, asyncio.Task] = {}
+        self.is_running = False
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "errors": 0,
+        }
+
+    async def _fetch(self, key):
+        if key == self.ME_KEY:
+            value = await retry_flood_wait(self.client.get_me)
+        else:
+            value = await retry_flood_wait(lambda: self.client.get_entity(key))
+        self._entries[key] = {"value": value, "fetched_at": self.clock()}
+        return value
+
+    def _refresh_in_background(self, key):
+        """Rafraîchit une entrée expirée sans faire attendre l'appelant"""
+        if key in self._refreshing:
+            return
+
+        async def _refresh():
+            try:
+                await self._fetch(key)
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning("⚠️ Rafraîchissement du cache impossible pour %s: %s", key, e)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(_refresh())
+
+    async def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return await self._fetch(key)
+        if self.clock() - entry["fetched_at"] >= self.ttl:
+            self.stats["stale_hits"] += 1
+            self._refresh_in_background(key)
+        else:
+            self.stats["hits"] += 1
+        return entry["value"]
+
+    # === API PUBLIQUE ===
+    async def get_me(self):
+        """Identité du bot (mise en cache)"""
+        return await self._get(self.ME_KEY)
+
+    def me_id(self) -> Optional[int]:
+        """Identifiant du bot s'il est déjà en cache (sans appel réseau)"""
+        entry = self._entries.get(self.ME_KEY)
+        return getattr(entry["value"], 'id', None) if entry else None
+
+    async def get_entity(self, chat_id: int):
+        """Entité d'un canal (mise en cache)"""
+        return await self._get(chat_id)
+
+    async def get_title(self, chat_id: int) -> str:
+        """Titre d'un canal, ou 'Canal <id>' s'il est inaccessible"""
+        try:
+            chat = await self.get_entity(chat_id)
+            return getattr(chat, 'title', f'Canal {chat_id}')
+        except Exception:
+            self.stats["errors"] += 1
+            return f'Canal {chat_id}'
+
+    def invalidate(self, key):
+        """Retire une entrée (ex: canal quitté)"""
+        self._entries.pop(key, None)
+
+    async def warm(self, chat_ids: Iterable[Optional[int]] = ()):
+        """Remplit le cache au démarrage: identité du bot et canaux configurés"""
+        keys = [self.ME_KEY] + [c for c in dict.fromkeys(chat_ids) if c]
+        results = await asyncio.gather(*(self._fetch(k) for k in keys), return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        self.stats["errors"] += failed
+        logger.info("🗂️ Cache d'entités initialisé: %s/%s entrée(s)", len(keys) - failed, len(keys))
+
+    async def run(self, interval: Optional[float] = None):
+        """Rafraîchit périodiquement les entrées proches de l'expiration"""
+        interval = interval or max(60.0, self.ttl / 4)
+        self.is_running = True
+        while self.is_running:
+            await asyncio.sleep(interval)
+            now = self.clock()
+            for key, entry in list(self._entries.items()):
+                if now - entry["fetched_at"] >= self.ttl - interval:
+                    self._refresh_in_background(key)
+
+    def stop(self):
+        """Arrête le rafraîchissement périodique"""
+        self.is_running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs du cache"""
+        return dict(self.stats, size=len(self._entries))
@@ -0,0 +1,60 @@
+"""
+Routage des mises à jour Telegram par canal
+Le filtre est évalué par Telethon avant la création de la coroutine du
+handler: une mise à jour hors route ne coûte qu'une recherche dans un dict.
+La table des routes est modifiable à chaud (ex: /set_stat).
+"""
+from typing import Dict, Any, Optional, Callable
+from log_setup import get_logger
+
+logger = get_logger('event_router')
+
+
+class EventRouter:
+    """Table des routes nom → canal avec compteurs d'acceptation et de rejet"""
+
+    def __init__(self):
+        self.routes: Dict[str, Optional[int]] = {}
+        self._by_chat: Dict[int, str] = {}
+        self.stats = {
+            "received": 0,
+            "rejected": 0,
+        }
+        self.routed: Dict[str, int] = {}
+
+    def set_route(self, name: str, chat_id: Optional[int]):
+        """Associe (ou retire avec None) le canal d'une route"""
+        previous = self.routes.get(name)
+        if previous is not None and self._by_chat.get(previous) == name:
+            del self._by_chat[previous]
+        self.routes[name] = chat_id
+        self.routed.setdefault(name, 0)
+        if chat_id is not None:
+            self._by_chat[chat_id] = name
+        logger.info("🧭 Route '%s' → %s", name, chat_id)
+
+    def route_for(self, chat_id: Optional[int]) -> Optional[str]:
+        """Nom de la route d'un canal (None si non routé)"""
+        return self._by_chat.get(chat_id)
+
+    def accepts(self, name: str) -> Callable[[Any], bool]:
+        """Filtre Telethon (paramètre func=) n'acceptant que le canal de la route"""
+        def _filter(event) -> bool:
+            self.stats["received"] += 1
+            if self._by_chat.get(event.chat_id) == name:
+                self.routed[name] += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+        self.routed.setdefault(name, 0)
+        return _filter
+
+    def get_table(self) -> Dict[str, Any]:
+        """Table des routes et compteurs"""
+        return {
+            "routes": {name: {"chat_id": chat_id, "routed": self.routed.get(name, 0)}
+                       for name, chat_id in self.routes.items()},
+            "received": self.stats["received"],
+            "rejected": self.stats["rejected"],
+        }
@@ -0,0 +1,287 @@
+"""
+Recherche de règles de déclenchement (grid search) sur l'historique
+Chaque message est analysé une seule fois (numéro de jeu, marqueurs, As,
+cartes et symboles par groupe) dans un corpus en colonnes compact, partagé
+avec les processus de calcul. Chaque combinaison de paramètres de TriggerRule
+est ensuite évaluée sur ce corpus sans réanalyse, avec exactement les mêmes
+décisions que CardPredictor, puis les règles sont classées par taux de réussite.
+
+Usage:
+    python grid_search.py captures/stat_events.jsonl
+    python grid_search.py --synthetic 200000 --seed 42 --distance 1,2 --window 1,2,3,4
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from predictor import CardPredictor, TriggerRule
+from backtest import Message, build_report, iter_source, synthetic_messages
+from ingest import SeenCache
+from strategies import (F_PENDING, F_FINAL, F_VERIFY, F_TWO_GROUPS, F_SUITS_1, F_SUITS_2,
+                        parse_message)
+
+
+class ParsedCorpus:
+    """Historique analysé une fois, en colonnes (array) pour un partage compact entre processus"""
+
+    def __init__(self):
+        self.games = array('i')
+        self.flags = array('B')
+        self.aces = (array('B'), array('B'))
+        self.cards = (array('B'), array('B'))
+        self.cycle_starts = array('l')
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    @classmethod
+    def build(cls, messages: Iterable[Message], wrap_threshold: int = 100, dedupe: bool = True) -> "ParsedCorpus":
+        """
+        Analyse les messages (parse_message, comme le flux en direct), en écartant
+        les doublons et en marquant les changements de cycle comme le backtest
+        """
+        corpus = cls()
+        parser = CardPredictor()
+        seen = SeenCache() if dedupe else None
+        last_game = 0
+        for _, message_id, text in messages:
+            if seen is not None and message_id is not None and seen.check_and_add(0, message_id, text):
+                corpus.duplicates += 1
+                continue
+            game_number, flags, aces, cards = parse_message(parser, text)
+            if game_number >= 0:
+                if game_number < last_game - wrap_threshold or not corpus.cycle_starts:
+                    corpus.cycle_starts.append(len(corpus.games))
+                last_game = game_number
+            elif not corpus.cycle_starts:
+                corpus.cycle_starts.append(0)
+
+            corpus.games.append(game_number)
+            corpus.flags.append(flags)
+            for index in (0, 1):
+                corpus.aces[index].append(aces[index])
+                corpus.cards[index].append(cards[index])
+        return corpus
+
+    def cycles(self) -> List[Tuple[int, int]]:
+        """Bornes [début, fin) de chaque cycle"""
+        ends = list(self.cycle_starts[1:]) + [len(self.games)]
+        return list(zip(self.cycle_starts, ends))
+
+
+def evaluate(corpus: ParsedCorpus, rule: TriggerRule) -> Dict[str, Any]:
+    """
+    Rejoue le corpus avec une règle: mêmes décisions que CardPredictor dans
+    Backtest.process (prédicteur vierge à chaque cycle). Retourne les compteurs.
+    Boucle en colonnes équivalente à strategies.ShadowPredictor.step, sans
+    appel de méthode par message (égalité avec Backtest: tests/test_grid_search.py).
+    """
+    started = time.perf_counter()
+    games, flags = corpus.games, corpus.flags
+    trigger_aces, other_aces = corpus.aces[rule.trigger_group], corpus.aces[1 - rule.trigger_group]
+    first_cards, second_cards = corpus.cards
+    trigger_suits = F_SUITS_1 if rule.trigger_group == 0 else F_SUITS_2
+    trigger_mask = F_TWO_GROUPS | trigger_suits
+    verify_mask = F_VERIFY | F_TWO_GROUPS
+    ace_count, block, distance, window = rule.ace_count, rule.block_other_group, rule.distance, rule.window
+    valid_cards = rule.valid_cards
+    offsets = [0] * (window + 1)
+    predictions = expired = unresolved = pending = 0
+    waiting = -1  # statut '⌛' (sinon offset de réussite, ou -2 pour expirée)
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    cycles = corpus.cycles()
+    for cycle_index, (start, end) in enumerate(cycles):
+        status: Dict[int, int] = {}
+        processed = set()
+        pending_edit = set()
+        heap: List[int] = []
+        for i in range(start, end):
+            game, flag = games[i], flags[i]
+            if flag & F_PENDING:
+                if game > 0:
+                    pending_edit.add(game)
+                    continue
+            elif flag & F_FINAL and game > 0:
+                pending_edit.discard(game)
+
+            # Déclenchement (should_predict)
+            if game >= 0 and flag & trigger_mask == trigger_mask and trigger_aces[i] == ace_count \
+                    and not (block and other_aces[i]):
+                predicted = game + distance
+                if predicted not in status and game not in processed:
+                    processed.add(game)
+                    status[predicted] = waiting
+                    heappush(heap, predicted)
+                    predictions += 1
+
+            # Vérification (verify_prediction)
+            if game >= 0 and flag & verify_mask == verify_mask and not flag & F_PENDING \
+                    and (valid_cards is None or (first_cards[i], second_cards[i]) == valid_cards):
+                for offset in range(window + 1):
+                    if status.get(game - offset) == waiting:
+                        status[game - offset] = offset
+                        offsets[offset] += 1
+                        break
+
+            # Expiration (check_expired_predictions)
+            if game > 0:
+                while heap and game > heap[0] + window:
+                    number = heappop(heap)
+                    if status.get(number) == waiting:
+                        status[number] = -2
+                        expired += 1
+
+        still_waiting = sum(1 for value in status.values() if value == waiting)
+        if cycle_index == len(cycles) - 1:
+            pending = still_waiting
+        else:
+            unresolved += still_waiting
+
+    return {
+        "messages": len(corpus) + corpus.duplicates,
+        "duplicates": corpus.duplicates,
+        "cycles": len(cycles),
+        "predictions": predictions,
+        "offsets": dict(enumerate(offsets)),
+        "expired": expired,
+        "unresolved": unresolved,
+        "pending": pending,
+        "engine_seconds": time.perf_counter() - started,
+    }
+
+
+# === ÉVALUATION PARALLÈLE ===
+_worker_corpus: Optional[ParsedCorpus] = None
+
+
+def _init_worker(corpus: ParsedCorpus):
+    """Reçoit le corpus une seule fois par processus"""
+    global _worker_corpus
+    logging.disable(logging.CRITICAL)
+    _worker_corpus = corpus
+
+
+def _evaluate_in_worker(rule: TriggerRule) -> Dict[str, Any]:
+    return evaluate(_worker_corpus, rule)
+
+
+def build_grid(ace_counts: Iterable[int], trigger_groups: Iterable[int], blocks: Iterable[bool],
+               distances: Iterable[int], windows: Iterable[int],
+               valid_cards: Iterable[Optional[Tuple[int, int]]]) -> List[TriggerRule]:
+    """Toutes les combinaisons de paramètres"""
+    return [TriggerRule(ace_count=a, trigger_group=g, block_other_group=b, distance=d, window=w, valid_cards=v)
+            for a, g, b, d, w, v in itertools.product(ace_counts, trigger_groups, blocks, distances, windows,
+                                                      valid_cards)]
+
+
+def search(corpus: ParsedCorpus, rules: List[TriggerRule], jobs: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Évalue chaque règle (en parallèle si jobs > 1) et retourne un rapport par règle"""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(rules) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(corpus,)) as pool:
+            counters = list(pool.map(_evaluate_in_worker, rules, chunksize=max(1, len(rules) // (jobs * 4))))
+    else:
+        counters = [evaluate(corpus, rule) for rule in rules]
+    results = []
+    for rule, counter in zip(rules, counters):
+        report = build_report(counter, counter["engine_seconds"])
+        report["rule"] = rule
+        results.append(report)
+    return results
+
+
+def rank(results: List[Dict[str, Any]], min_predictions: int = 30) -> List[Dict[str, Any]]:
+    """Classement par taux de réussite (puis nombre de réussites), échantillons trop petits écartés"""
+    eligible = [r for r in results if r["wins"] + r["losses"] >= min_predictions]
+    return sorted(eligible, key=lambda r: (r["win_rate"], r["wins"]), reverse=True)
+
+
+def format_table(ranked: List[Dict[str, Any]], top: int = 20) -> str:
+    """Tableau des meilleures règles (★ = règle en production)"""
+    production = TriggerRule()
+    lines = [f"{'#':>3}  {'réussite':>8}  {'prédictions':>11}  {'✅':>7}  {'❌':>7}  {'offsets':<24}  règle"]
+    for position, report in enumerate(ranked[:top], 1):
+        resolved = report["wins"] or 1
+        offsets = "/".join(f"{v / resolved * 100:.0f}" for _, v in sorted(report["offsets"].items()))
+        marker = " ★" if report["rule"] == production else ""
+        lines.append(f"{position:>3}  {report['win_rate']:>7.2f}%  {report['predictions']:>11}  "
+                     f"{report['wins']:>7}  {report['losses']:>7}  {offsets:<24}  {report['rule'].describe()}{marker}")
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _bool_list(value: str) -> List[bool]:
+    choices = {"oui": [True], "non": [False], "both": [True, False], "les2": [True, False]}
+    if value not in choices:
+        raise argparse.ArgumentTypeError("attendu: oui, non ou les2")
+    return choices[value]
+
+
+def _cards_list(value: str) -> List[Optional[Tuple[int, int]]]:
+    cards: List[Optional[Tuple[int, int]]] = []
+    for item in value.split(","):
+        item = item.strip()
+        if item in ("toutes", "any"):
+            cards.append(None)
+        elif item:
+            first, second = item.split("x")
+            cards.append((int(first), int(second)))
+    return cards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recherche parallèle de règles de déclenchement")
+    parser.add_argument("source", nargs="?", help="Capture (.jsonl/.jsonl.gz/dossier), export result.json ou texte")
+    parser.add_argument("--synthetic", type=int, default=0, help="Nombre de résultats générés à la place d'une source")
+    parser.add_argument("--seed", type=int, default=None, help="Graine des résultats générés")
+    parser.add_argument("--ace-count", type=_int_list, default=[0, 1, 2], help="Nombres d'As (ex: 0,1,2)")
+    parser.add_argument("--trigger-group", type=_int_list, default=[1, 2], help="Groupes déclencheurs (1, 2)")
+    parser.add_argument("--block-other", type=_bool_list, default=[True, False],
+                        help="Bloquer si As dans l'autre groupe: oui, non ou les2")
+    parser.add_argument("--distance", type=_int_list, default=[1, 2, 3], help="Distances de prédiction")
+    parser.add_argument("--window", type=_int_list, default=[0, 1, 2, 3, 4, 5], help="Fenêtres de vérification")
+    # 'toutes' rend la vérification triviale (tout résultat valide la prédiction): pas dans la grille par défaut
+    parser.add_argument("--valid-cards", type=_cards_list, default=[(2, 2), (2, 3), (3, 2)],
+                        help="Cartes d'un résultat valide (ex: 2x2,2x3,toutes)")
+    parser.add_argument("--wrap-threshold", type=int, default=100,
+                        help="Baisse du numéro de jeu considérée comme un nouveau cycle")
+    parser.add_argument("--min-predictions", type=int, default=30, help="Prédictions résolues minimum pour être classée")
+    parser.add_argument("--top", type=int, default=20, help="Nombre de règles affichées")
+    parser.add_argument("--jobs", type=int, default=0, help="Processus (défaut: nombre de cœurs)")
+    args = parser.parse_args()
+    if not args.source and not args.synthetic:
+        parser.error("indiquer une source ou --synthetic N")
+
+    logging.disable(logging.CRITICAL)
+
+    rules = build_grid(args.ace_count, [g - 1 for g in args.trigger_group], args.block_other,
+                       args.distance, args.window, args.valid_cards)
+
+    started = time.perf_counter()
+    messages = synthetic_messages(args.synthetic, args.seed) if args.synthetic else iter_source(args.source)
+    corpus = ParsedCorpus.build(messages, wrap_threshold=args.wrap_threshold, dedupe=not args.synthetic)
+    parse_seconds = time.perf_counter() - started
+    print(f"📚 Corpus: {len(corpus)} messages analysés en {parse_seconds:.2f} s "
+          f"({corpus.duplicates} doublons, {len(corpus.cycle_starts)} cycles)")
+
+    started = time.perf_counter()
+    results = search(corpus, rules, args.jobs)
+    search_seconds = time.perf_counter() - started
+    print(f"🔎 {len(rules)} règles évaluées en {search_seconds:.2f} s "
+          f"({len(rules) * len(corpus) / search_seconds:,.0f} messages-règles/s)\n")
+    print(format_table(rank(results, args.min_predictions), args.top))
+
+
+if __name__ == "__main__":
+    main()
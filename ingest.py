@@ -0,0 +1,187 @@
+"""
+Pipeline d'ingestion ordonnée des messages du canal de statistiques
+Chaque canal source a sa propre file, vidée par un worker dédié dans l'ordre
+d'arrivée: un NewMessage et son MessageEdited ne peuvent plus s'entrelacer.
+La profondeur des files est bornée (contre-pression) et les éditions
+intermédiaires d'un même message encore en file sont fusionnées.
+Les doublons (rejeux après reconnexion, éditions identiques, même contenu reçu
+en NewMessage puis MessageEdited) sont écartés en O(1) avant toute analyse.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+from log_setup import get_logger
+
+logger = get_logger('ingest')
+
+
+class SeenCache:
+    """Cache borné des mises à jour déjà vues: (chat_id, message_id, empreinte du texte)"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[tuple, None]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+        }
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+    def check_and_add(self, chat_id: int, message_id: int, text: str) -> bool:
+        """Retourne True si la mise à jour a déjà été vue, sinon la mémorise"""
+        key = (chat_id, message_id, self.digest(text))
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            self.stats["hits"] += 1
+            return True
+        self._seen[key] = None
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        self.stats["misses"] += 1
+        return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class ChannelQueue:
+    """File d'un canal source et ses métriques"""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.items = deque()
+        self.pending_edits: Dict[int, Dict[str, Any]] = {}  # message_id → édition en file
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+        self.worker: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "coalesced": 0,
+            "blocked": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "last_wait_ms": 0.0,
+        }
+
+
+class IngestPipeline:
+    """Files d'ingestion par canal avec worker dédié et contre-pression"""
+
+    def __init__(self, process_callback: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 max_depth: int = 200, seen_cache_size: int = 5000):
+        """
+        Args:
+            process_callback: Coroutine de traitement d'une mise à jour (appelée dans l'ordre)
+            max_depth: Profondeur maximale de chaque file avant contre-pression
+            seen_cache_size: Nombre de mises à jour mémorisées pour écarter les doublons
+        """
+        self.process_callback = process_callback
+        self.max_depth = max_depth
+        self.seen = SeenCache(seen_cache_size)
+        self.channels: Dict[int, ChannelQueue] = {}
+        self.started = False
+
+    def _channel(self, chat_id: int) -> ChannelQueue:
+        channel = self.channels.get(chat_id)
+        if channel is None:
+            channel = ChannelQueue(chat_id)
+            self.channels[chat_id] = channel
+            if self.started:
+                channel.worker = asyncio.create_task(self._worker(channel))
+        return channel
+
+    async def submit(self, chat_id: int, message_id: int, text: str, kind: str = "new", trace=None) -> bool:
+        """
+        Ajoute une mise à jour à la file de son canal.
+        Attend (contre-pression) si la file est pleine.
+        Retourne False si la mise à jour est un doublon déjà vu.
+        """
+        if self.seen.check_and_add(chat_id, message_id, text):
+            return False
+
+        channel = self._channel(chat_id)
+
+        if kind == "edit":
+            queued = channel.pending_edits.get(message_id)
+            if queued is not None:
+                # Édition intermédiaire pas encore traitée: seul le dernier texte compte
+                queued["text"] = text
+                if queued["trace"] is not None:
+                    # La trace remplacée ne sera jamais traitée: on la termine ici
+                    queued["trace"].finish(coalesced=True)
+                queued["trace"] = trace
+                channel.stats["coalesced"] += 1
+                return True
+
+        while len(channel.items) >= self.max_depth:
+            channel.stats["blocked"] += 1
+            channel.not_full.clear()
+            await channel.not_full.wait()
+
+        update = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "kind": kind,
+            "trace": trace,
+            "received_at": time.monotonic(),
+        }
+        channel.items.append(update)
+        if kind == "edit":
+            channel.pending_edits[message_id] = update
+        channel.stats["enqueued"] += 1
+        channel.stats["max_depth"] = max(channel.stats["max_depth"], len(channel.items))
+        channel.not_empty.set()
+        return True
+
+    async def _worker(self, channel: ChannelQueue):
+        """Vide la file d'un canal dans l'ordre d'arrivée"""
+        while True:
+            if not channel.items:
+                channel.not_empty.clear()
+                await channel.not_empty.wait()
+                continue
+
+            update = channel.items.popleft()
+            if channel.pending_edits.get(update["message_id"]) is update:
+                del channel.pending_edits[update["message_id"]]
+            channel.not_full.set()
+
+            channel.stats["last_wait_ms"] = (time.monotonic() - update["received_at"]) * 1000
+            try:
+                await self.process_callback(update)
+            except Exception as e:
+                channel.stats["errors"] += 1
+                logger.error("❌ Erreur traitement mise à jour %s/%s: %s", update['chat_id'], update['message_id'], e)
+            channel.stats["processed"] += 1
+
+    def start(self):
+        """Démarre les workers (les mises à jour reçues avant sont conservées en file)"""
+        self.started = True
+        for channel in self.channels.values():
+            if channel.worker is None:
+                channel.worker = asyncio.create_task(self._worker(channel))
+        logger.info("🚀 Pipeline d'ingestion démarré (profondeur max %s)", self.max_depth)
+
+    def stop(self):
+        """Arrête les workers"""
+        self.started = False
+        for channel in self.channels.values():
+            if channel.worker is not None:
+                channel.worker.cancel()
+                channel.worker = None
+
+    def depth(self) -> int:
+        """Nombre total de mises à jour en attente"""
+        return sum(len(c.items) for c in self.channels.values())
+
+    def get_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Métriques par canal"""
+        return {chat_id: dict(c.stats, depth=len(c.items)) for chat_id, c in self.channels.items()}
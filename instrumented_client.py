@@ -0,0 +1,153 @@
+"""
+Instrumentation des appels à l'API Telegram
+Enveloppe mince autour de TelegramClient (ou d'un faux client de benchmark):
+send_message, edit_message, send_file, get_entity et get_me sont chronométrés
+et comptés par méthode et par canal (appels, erreurs par type, FloodWait).
+Les autres attributs sont transmis tels quels au client enveloppé.
+Le client est créé avec flood_sleep_threshold=0: les appels faits hors de la
+file d'envoi attendent les FloodWait via retry_flood_wait.
+"""
+import asyncio
+import time
+from typing import Dict, Any, Tuple, Callable, Awaitable
+from telethon.errors import FloodWaitError
+from metrics import Counter, Histogram
+from log_setup import get_logger
+
+logger = get_logger('instrumented_client')
+
+TELEGRAM_CALLS = Counter('telegram_calls_total', "Appels à l'API Telegram", ('method', 'chat'))
+TELEGRAM_CALL_SECONDS = Histogram('telegram_call_duration_seconds', "Durée des appels à l'API Telegram",
+                                  ('method', 'chat'))
+TELEGRAM_CALL_ERRORS = Counter('telegram_call_errors_total', "Appels à l'API Telegram en erreur",
+                               ('method', 'chat', 'error'))
+FLOOD_WAITS = Counter('telegram_flood_waits_total', "FloodWait reçus", ('method', 'chat'))
+FLOOD_WAIT_SECONDS = Counter('telegram_flood_wait_seconds_total', "Secondes d'attente imposées par FloodWait",
+                             ('method', 'chat'))
+
+
+async def retry_flood_wait(call: Callable[[], Awaitable[Any]], max_wait: float = 60.0, attempts: int = 3):
+    """
+    Exécute un appel en attendant les FloodWait (comportement par défaut de Telethon,
+    désactivé sur le client pour que la file d'envoi les gère elle-même)
+
+    Args:
+        call: Fonction sans argument retournant la coroutine de l'appel
+        max_wait: Attente maximale acceptée (secondes); au-delà l'erreur est relevée
+        attempts: Nombre maximum de tentatives
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except FloodWaitError as e:
+            if e.seconds > max_wait or attempt == attempts:
+                raise
+            logger.warning("⏳ FloodWait %ss, nouvelle tentative (%s/%s)", e.seconds, attempt, attempts)
+            await asyncio.sleep(e.seconds)
+
+
+class InstrumentedClient:
+    """Client Telegram instrumenté (mêmes méthodes, mêmes signatures)"""
+
+    INSTRUMENTED = ('send_message', 'edit_message', 'send_file', 'get_entity', 'get_me')
+
+    def __init__(self, client):
+        """
+        Args:
+            client: TelegramClient ou faux client exposant les mêmes coroutines
+        """
+        self.client = client
+        # Compteurs par (méthode, canal) pour /status et les benchmarks
+        self.calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def __getattr__(self, name):
+        # Appelé seulement pour les attributs non définis ici (on, start, iter_messages...)
+        return getattr(self.client, name)
+
+    def _entry(self, method: str, chat: str) -> Dict[str, Any]:
+        entry = self.calls.get((method, chat))
+        if entry is None:
+            entry = self.calls[(method, chat)] = {
+                "calls": 0, "errors": {}, "flood_waits": 0, "flood_wait_seconds": 0,
+                "total_seconds": 0.0, "max_seconds": 0.0,
+            }
+        return entry
+
+    @staticmethod
+    def chat_label(entity) -> str:
+        """Libellé de canal borné: identifiant numérique, nom d'utilisateur ou '-'"""
+        if entity is None:
+            return '-'
+        if isinstance(entity, (int, str)):
+            return str(entity)
+        entity_id = getattr(entity, 'id', None) or getattr(entity, 'channel_id', None) \
+            or getattr(entity, 'user_id', None)
+        return str(entity_id) if entity_id is not None else type(entity).__name__
+
+    async def _call(self, method: str, entity, *args, **kwargs):
+        chat = self.chat_label(entity)
+        entry = self._entry(method, chat)
+        entry["calls"] += 1
+        TELEGRAM_CALLS.labels(method, chat).inc()
+        started = time.perf_counter()
+        try:
+            return await getattr(self.client, method)(*args, **kwargs)
+        except FloodWaitError as e:
+            entry["flood_waits"] += 1
+            entry["flood_wait_seconds"] += e.seconds
+            FLOOD_WAITS.labels(method, chat).inc()
+            FLOOD_WAIT_SECONDS.labels(method, chat).inc(e.seconds)
+            self._error(entry, method, chat, e)
+            raise
+        except Exception as e:
+            self._error(entry, method, chat, e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            entry["total_seconds"] += elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+            TELEGRAM_CALL_SECONDS.labels(method, chat).observe(elapsed)
+
+    @staticmethod
+    def _error(entry: Dict[str, Any], method: str, chat: str, error: Exception):
+        error_type = type(error).__name__
+        entry["errors"][error_type] = entry["errors"].get(error_type, 0) + 1
+        TELEGRAM_CALL_ERRORS.labels(method, chat, error_type).inc()
+
+    # === MÉTHODES INSTRUMENTÉES ===
+    async def send_message(self, entity, *args, **kwargs):
+        return await self._call('send_message', entity, entity, *args, **kwargs)
+
+    async def edit_message(self, entity, *args, **kwargs):
+        return await self._call('edit_message', entity, entity, *args, **kwargs)
+
+    async def send_file(self, entity, *args, **kwargs):
+        return await self._call('send_file', entity, entity, *args, **kwargs)
+
+    async def get_entity(self, entity, *args, **kwargs):
+        return await self._call('get_entity', entity, entity, *args, **kwargs)
+
+    async def get_me(self, *args, **kwargs):
+        return await self._call('get_me', None, *args, **kwargs)
+
+    # === RÉSULTATS ===
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Compteurs par méthode (tous canaux) avec latence moyenne et maximale en ms"""
+        summary: Dict[str, Dict[str, Any]] = {}
+        for (method, _chat), entry in self.calls.items():
+            s = summary.setdefault(method, {"calls": 0, "errors": 0, "flood_waits": 0,
+                                            "flood_wait_seconds": 0, "total_seconds": 0.0, "max_ms": 0.0})
+            s["calls"] += entry["calls"]
+            s["errors"] += sum(entry["errors"].values())
+            s["flood_waits"] += entry["flood_waits"]
+            s["flood_wait_seconds"] += entry["flood_wait_seconds"]
+            s["total_seconds"] += entry["total_seconds"]
+            s["max_ms"] = max(s["max_ms"], round(entry["max_seconds"] * 1000, 1))
+        for s in summary.values():
+            s["avg_ms"] = round(s.pop("total_seconds") / s["calls"] * 1000, 1) if s["calls"] else 0.0
+        return summary
+
+    def get_chat_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Compteurs détaillés par 'méthode canal'"""
+        return {f"{method} {chat}": dict(entry, errors=dict(entry["errors"]))
+                for (method, chat), entry in self.calls.items()}
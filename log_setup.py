@@ -0,0 +1,110 @@
+"""
+Journalisation structurée et hiérarchisée du bot
+- Niveaux standards (LOG_LEVEL): en production à INFO, les lignes DEBUG par
+  message ne coûtent qu'un test de niveau (formatage paresseux %s).
+- Échantillonnage des lignes DEBUG (LOG_DEBUG_SAMPLE: 1 sur N par gabarit).
+- Écriture asynchrone: QueueHandler côté boucle, formatage et sortie dans
+  le thread d'un QueueListener.
+- Format clé=valeur: les champs passés via extra={'fields': {...}} sont ajoutés.
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Dict, Any, Optional
+
+ROOT_LOGGER = 'bot'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """horodatage niveau logger message champ=valeur..."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields: Dict[str, Any] = getattr(record, 'fields', None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class DebugSampler(logging.Filter):
+    """Ne laisse passer qu'une ligne DEBUG sur N pour chaque gabarit de message"""
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[tuple, int] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui ne formate pas le message dans le thread appelant:
+    le gabarit et ses arguments sont transmis tels quels au listener
+    (les appelants passent des valeurs immuables ou des copies).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Les traces sont formatées tout de suite (les frames ne survivent pas)
+            return super().prepare(record)
+        return record
+
+
+def configure_logging(level: str = 'INFO', debug_sample_every: int = 1,
+                      stream=None) -> logging.Logger:
+    """
+    Configure (une seule fois) la journalisation asynchrone du bot
+
+    Args:
+        level: Niveau minimum (DEBUG, INFO, WARNING, ERROR)
+        debug_sample_every: Conserver une ligne DEBUG sur N par gabarit
+        stream: Sortie (stdout par défaut)
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if _listener is not None:
+        return root
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(DebugSampler(debug_sample_every))
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    return root
+
+
+def shutdown_logging():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger d'un module du bot (ex: get_logger('predictor') → bot.predictor)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,147 @@
+"""
+Surveillance de la boucle asyncio
+- Échantillonneur de retard: une tâche dort un intervalle fixe et mesure le
+  retard de son réveil (temps pendant lequel la boucle n'a pas pu la reprendre).
+- Détecteur d'appels bloquants: une tâche de battement met à jour un horodatage
+  au moins toutes les stall_threshold/2 et un thread de surveillance vérifie qu'il
+  avance; au-delà du seuil, il capture la pile du thread de la boucle pour
+  identifier la coroutine fautive (dump YAML, zip de /deploy, print massif...).
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from metrics import Counter, Histogram
+from log_setup import get_logger
+
+logger = get_logger('loop_monitor')
+
+LOOP_LAG_SECONDS = Histogram('event_loop_lag_seconds', "Retard de réveil de la boucle asyncio",
+                             buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+LOOP_STALLS = Counter('event_loop_stalls_total', "Blocages de la boucle asyncio au-delà du seuil")
+
+
+class LoopMonitor:
+    """Mesure du retard de la boucle et capture des blocages"""
+
+    def __init__(self, interval: float = 0.5, stall_threshold: float = 0.25,
+                 history: int = 240, max_stalls: int = 20, stack_depth: int = 12):
+        """
+        Args:
+            interval: Période d'échantillonnage (secondes)
+            stall_threshold: Durée (secondes) sans progression de la boucle considérée comme un blocage
+            history: Nombre d'échantillons de retard conservés
+            max_stalls: Nombre de blocages conservés
+            stack_depth: Nombre de frames conservées par pile capturée
+        """
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stack_depth = stack_depth
+        self.lags = deque(maxlen=history)
+        self.stalls = deque(maxlen=max_stalls)
+        self.max_lag = 0.0
+        self.samples = 0
+        self._heartbeat = time.monotonic()
+        self._beat_task: Optional[asyncio.Task] = None
+        self._loop_thread_id: Optional[int] = None
+        self._current_stall: Optional[Dict[str, Any]] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.is_running = False
+
+    # === ÉCHANTILLONNAGE (dans la boucle) ===
+    async def run(self):
+        """Tâche d'échantillonnage du retard de la boucle"""
+        self._loop_thread_id = threading.get_ident()
+        self.is_running = True
+        self._start_watchdog()
+        self._beat_task = asyncio.create_task(self._beat())
+        logger.info("🩺 Surveillance de la boucle démarrée (seuil de blocage %.0f ms)", self.stall_threshold * 1000)
+        while self.is_running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    async def _beat(self):
+        """Battement fréquent: un blocage est mesuré depuis le dernier battement, sans l'intervalle"""
+        period = min(self.interval, self.stall_threshold / 2)
+        while self.is_running:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(period)
+
+    # === DÉTECTION DES BLOCAGES (thread séparé) ===
+    def _start_watchdog(self):
+        if self._watchdog is not None and self._watchdog.is_alive():
+            return
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        """Vérifie la progression de la boucle; capture la pile en cas de blocage"""
+        while not self._stop.wait(self.stall_threshold / 4):
+            blocked_for = time.monotonic() - self._heartbeat
+            if blocked_for < self.stall_threshold:
+                if self._current_stall is not None:
+                    logger.warning("🐢 Boucle bloquée %.0f ms dans %s",
+                                   self._current_stall['blocked_ms'], self._current_stall['location'])
+                    self._current_stall = None
+                continue
+            stall_ms = blocked_for * 1000
+            if self._current_stall is None:
+                stack = self._capture_stack()
+                self._current_stall = {
+                    "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "blocked_ms": stall_ms,
+                    "location": stack[-1] if stack else "inconnu",
+                    "stack": stack,
+                }
+                self.stalls.append(self._current_stall)
+                LOOP_STALLS.inc()
+            else:
+                self._current_stall["blocked_ms"] = stall_ms
+
+    def _capture_stack(self) -> List[str]:
+        """Pile courante du thread de la boucle (frames les plus récentes)"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        entries = traceback.extract_stack(frame)[-self.stack_depth:]
+        return [f"{e.filename.rsplit('/', 1)[-1]}:{e.lineno} {e.name}" for e in entries]
+
+    def stop(self):
+        """Arrête l'échantillonnage et le thread de surveillance"""
+        self.is_running = False
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+
+    # === RÉSULTATS ===
+    def percentile(self, q: float) -> float:
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retard récent (ms) et derniers blocages"""
+        return {
+            "samples": self.samples,
+            "lag_ms_p50": round(self.percentile(0.50) * 1000, 1),
+            "lag_ms_p95": round(self.percentile(0.95) * 1000, 1),
+            "lag_ms_max": round(self.max_lag * 1000, 1),
+            "stalls": len(self.stalls),
+            "last_stalls": [
+                {"at": s["at"], "blocked_ms": round(s["blocked_ms"], 1), "location": s["location"]}
+                for s in list(self.stalls)[-5:]
+            ],
+        }
@@ -1,5 +1,7 @@
 import os
 import asyncio
+import time
+import io
 import re
 import json
 import zipfile
@@ -9,8 +11,24 @@ from datetime import datetime
 from telethon import TelegramClient, events
 from telethon.events import ChatAction
 from dotenv import load_dotenv
-from predictor import CardPredictor
+from predictor import CardPredictor, TriggerRule
 from scheduler import PredictionScheduler
+from session_store import resolve_session_path, cleanup_orphan_sessions, StartupTimer
+from dispatch_queue import DispatchQueue
+from outbound import OutboundQueue
+from instrumented_client import InstrumentedClient, retry_flood_wait
+from ingest import IngestPipeline
+from event_router import EventRouter
+from catchup import CheckpointStore, catch_up
+from entity_cache import EntityCache
+from outbox import Outbox
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, Counter, Gauge, Histogram
+from loop_monitor import LoopMonitor
+from profiler import Profiler
+from log_setup import configure_logging, shutdown_logging, get_logger
+from tracing import Tracer
+from capture import EventRecorder
+from strategies import StrategyRegistry
 from yaml_database import init_yaml_database, yaml_db
 from aiohttp import web
 import threading
@@ -25,6 +43,32 @@ try:
     BOT_TOKEN = os.getenv('BOT_TOKEN') or ''
     ADMIN_ID = int(os.getenv('ADMIN_ID') or '0')
     PORT = int(os.getenv('PORT') or '10000')
+    SCHEDULER_MAX_CONCURRENCY = int(os.getenv('SCHEDULER_MAX_CONCURRENCY') or '5')
+    DISPATCH_RESOLVED_POLICY = os.getenv('DISPATCH_RESOLVED_POLICY') or 'rewrite'
+    OUTBOUND_CHAT_PER_MINUTE = float(os.getenv('OUTBOUND_CHAT_PER_MINUTE') or '20')
+    OUTBOUND_GLOBAL_PER_SECOND = float(os.getenv('OUTBOUND_GLOBAL_PER_SECOND') or '25')
+    OUTBOUND_EDIT_WINDOW = float(os.getenv('OUTBOUND_EDIT_WINDOW') or '1.0')
+    INGEST_MAX_DEPTH = int(os.getenv('INGEST_MAX_DEPTH') or '200')
+    SEEN_CACHE_SIZE = int(os.getenv('SEEN_CACHE_SIZE') or '5000')
+    CATCHUP_MAX_SECONDS = float(os.getenv('CATCHUP_MAX_SECONDS') or '30')
+    CATCHUP_MAX_MESSAGES = int(os.getenv('CATCHUP_MAX_MESSAGES') or '2000')
+    PENDING_RESTORE_MAX_SECONDS = float(os.getenv('PENDING_RESTORE_MAX_SECONDS') or '21600')
+    SESSION_NAME = os.getenv('SESSION_NAME') or 'bot_session'
+    SESSION_DIR = os.getenv('SESSION_DIR') or None
+    ENTITY_CACHE_TTL = float(os.getenv('ENTITY_CACHE_TTL') or '3600')
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS') or '6')
+    LOOP_STALL_THRESHOLD_MS = float(os.getenv('LOOP_STALL_THRESHOLD_MS') or '250')
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN') or ''
+    LOG_LEVEL = os.getenv('LOG_LEVEL') or 'INFO'
+    LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE') or '1')
+    TRACE_FILE = os.getenv('TRACE_FILE') or 'traces/stat_trace.jsonl'
+    CAPTURE_FILE = os.getenv('CAPTURE_FILE') or ''  # vide = capture désactivée
+    STRATEGIES = os.getenv('STRATEGIES') or ''  # ex: "deux_as:ace_count=2;large:window=5"
+    PRIMARY_STRATEGY = os.getenv('PRIMARY_STRATEGY') or 'production'
+    # Stratégies validées en entier avant tout enregistrement ('production' toujours présente)
+    STRATEGY_RULES = {'production': TriggerRule(), **dict(StrategyRegistry.parse_spec(STRATEGIES))}
+    if PRIMARY_STRATEGY not in STRATEGY_RULES:
+        raise ValueError(f"PRIMARY_STRATEGY inconnue: {PRIMARY_STRATEGY} (stratégies: {', '.join(STRATEGY_RULES)})")
     
     # Validation des variables requises
     if not API_ID or API_ID == 0:
@@ -40,30 +84,48 @@ except Exception as e:
     print("Vérifiez vos variables d'environnement")
     exit(1)
 
+# Journalisation asynchrone (les lignes par message sont au niveau DEBUG)
+configure_logging(LOG_LEVEL, LOG_DEBUG_SAMPLE)
+logger = get_logger('main')
+
 # Fichier de configuration persistante
 CONFIG_FILE = 'bot_config.json'
 
+# Modules du bot à inclure dans les packages de déploiement (/ni, /deploy)
+BOT_MODULES = [
+    'dispatch_queue.py', 'outbound.py', 'ingest.py', 'event_router.py',
+    'catchup.py', 'session_store.py', 'entity_cache.py', 'outbox.py', 'metrics.py',
+    'loop_monitor.py', 'profiler.py', 'log_setup.py', 'tracing.py', 'instrumented_client.py',
+    'capture.py', 'strategies.py'
+]
+
 # Variables d'état
 detected_stat_channel = None
 detected_display_channel = None
 confirmation_pending = {}
 prediction_interval = 5  # Intervalle en minutes avant de chercher "A" (défaut: 5 min)
+scheduler_targets = []  # Canaux de diffusion supplémentaires du planificateur
+last_catchup = None  # Résumé du dernier rattrapage au démarrage
 
 def load_config():
     """Load configuration from YAML database"""
-    global detected_stat_channel, detected_display_channel, prediction_interval
+    global detected_stat_channel, detected_display_channel, prediction_interval, scheduler_targets
     try:
         if yaml_db:
             detected_stat_channel = yaml_db.get_config('stat_channel')
             detected_display_channel = yaml_db.get_config('display_channel')
             interval_config = yaml_db.get_config('prediction_interval')
+            targets_config = yaml_db.get_config('scheduler_targets')
             if detected_stat_channel:
                 detected_stat_channel = int(detected_stat_channel)
             if detected_display_channel:
                 detected_display_channel = int(detected_display_channel)
             if interval_config:
                 prediction_interval = int(interval_config)
-            print(f"✅ Configuration chargée depuis YAML: Stats={detected_stat_channel}, Display={detected_display_channel}, Intervalle={prediction_interval}min")
+            if targets_config:
+                scheduler_targets = [int(t) for t in targets_config.split(',') if t.strip()]
+            logger.info("✅ Configuration chargée depuis YAML: Stats=%s, Display=%s, Intervalle=%smin",
+                        detected_stat_channel, detected_display_channel, prediction_interval)
         else:
             # Fallback vers JSON si YAML non disponible
             if os.path.exists(CONFIG_FILE):
@@ -72,11 +134,14 @@ def load_config():
                     detected_stat_channel = config.get('stat_channel')
                     detected_display_channel = config.get('display_channel')
                     prediction_interval = config.get('prediction_interval', 5)
-                    print(f"✅ Configuration chargée depuis JSON (fallback): Stats={detected_stat_channel}, Display={detected_display_channel}, Intervalle={prediction_interval}min")
+                    scheduler_targets = config.get('scheduler_targets', [])
+                    logger.info("✅ Configuration chargée depuis JSON (fallback): Stats=%s, Display=%s, Intervalle=%smin",
+                                detected_stat_channel, detected_display_channel, prediction_interval)
             else:
-                print("ℹ️ Aucune configuration trouvée, nouvelle configuration")
+                logger.info("ℹ️ Aucune configuration trouvée, nouvelle configuration")
     except Exception as e:
-        print(f"⚠️ Erreur chargement configuration: {e}")
+        logger.warning("⚠️ Erreur chargement configuration: %s", e)
+    router.set_route('stat', detected_stat_channel)
 
 def save_config():
     """Save configuration to YAML database and JSON backup"""
@@ -86,40 +151,113 @@ def save_config():
             yaml_db.set_config('stat_channel', detected_stat_channel)
             yaml_db.set_config('display_channel', detected_display_channel)
             yaml_db.set_config('prediction_interval', prediction_interval)
-            print("💾 Configuration sauvegardée en YAML")
+            yaml_db.set_config('scheduler_targets', ','.join(map(str, scheduler_targets)))
+            logger.info("💾 Configuration sauvegardée en YAML")
 
         # Sauvegarde JSON de secours
         config = {
             'stat_channel': detected_stat_channel,
             'display_channel': detected_display_channel,
-            'prediction_interval': prediction_interval
+            'prediction_interval': prediction_interval,
+            'scheduler_targets': scheduler_targets
         }
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2)
-        print(f"💾 Configuration sauvegardée: Stats={detected_stat_channel}, Display={detected_display_channel}, Intervalle={prediction_interval}min")
+        logger.info("💾 Configuration sauvegardée: Stats=%s, Display=%s, Intervalle=%smin",
+                    detected_stat_channel, detected_display_channel, prediction_interval)
     except Exception as e:
-        print(f"❌ Erreur sauvegarde configuration: {e}")
+        logger.error("❌ Erreur sauvegarde configuration: %s", e)
+
+def get_scheduler_targets() -> list:
+    """Canal de diffusion principal suivi des canaux supplémentaires, sans doublons"""
+    targets = [detected_display_channel] + scheduler_targets
+    return [t for t in dict.fromkeys(targets) if t]
 
 def update_channel_config(source_id: int, target_id: int):
     """Update channel configuration"""
     global detected_stat_channel, detected_display_channel
     detected_stat_channel = source_id
     detected_display_channel = target_id
+    router.set_route('stat', detected_stat_channel)
     save_config()
 
 # Initialize YAML database
 database = init_yaml_database()
 
-# Gestionnaire de prédictions
-predictor = CardPredictor()
+# Gestionnaire de prédictions (règle de la stratégie principale)
+predictor = CardPredictor(STRATEGY_RULES[PRIMARY_STRATEGY])
+
+# Stratégies évaluées sur chaque message: la principale est suivie à partir des décisions
+# du prédicteur (analyse partagée), les autres en ombre
+strategies = StrategyRegistry(predictor)
+for strategy_name, strategy_rule in STRATEGY_RULES.items():
+    strategies.register(strategy_name, strategy_rule, primary=(strategy_name == PRIMARY_STRATEGY))
+logger.info("🧪 Stratégies: %s (principale: %s)", ', '.join(strategies.strategies), strategies.primary)
+
+# Routage des mises à jour par canal (filtré à l'enregistrement des handlers)
+router = EventRouter()
 
 # Planificateur automatique
 scheduler = None
 
-# Initialize Telegram client with unique session name
-import time
-session_name = f'bot_session_{int(time.time())}'
-client = TelegramClient(session_name, API_ID, API_HASH)
+async def dispatch_prediction(entry):
+    """Diffuse une prédiction arrivée à échéance dans la file de diffusion (lève en cas d'échec)"""
+    game_number = entry['game_number']
+    text = entry['text']
+    if entry.get('resolved_status'):
+        # Prédiction déjà résolue pendant l'attente: diffuser directement le statut final
+        text = f"🔵{game_number}— 3D🔵 statut :{entry['resolved_status']}"
+    started = time.perf_counter()
+    sent_messages = await broadcast(text)
+    tracer.record(entry.get('trace_id'), 'outbound_send', time.perf_counter() - started, game=game_number)
+    if not sent_messages:
+        # La diffusion reste en file et sera retentée
+        raise RuntimeError("aucun message diffusé")
+
+    # Store message IDs for later editing
+    if game_number:
+        for chat_id, message_id in sent_messages:
+            predictor.store_prediction_message(game_number, message_id, chat_id)
+        # Index persistant: les éditions de statut retrouvent le message après un redémarrage
+        if database:
+            database.set_prediction_messages(game_number, sent_messages)
+            chat_id, message_id = sent_messages[0]
+            database.add_prediction(game_number, message_id=message_id, chat_id=chat_id)
+
+    logger.info("✅ Prédiction #%s diffusée (file de diffusion #%s)", game_number, entry['id'])
+
+# File de diffusion différée (intervalle de prédiction)
+dispatch_queue = DispatchQueue(
+    dispatch_prediction,
+    status_lookup=predictor.prediction_status.get,
+    resolved_policy=DISPATCH_RESOLVED_POLICY
+)
+
+# Mesure du démarrage (lancement → connexion → première mise à jour traitée)
+startup_timer = StartupTimer()
+
+# Initialize Telegram client with a stable session (réutilisée entre les redémarrages)
+session_name = resolve_session_path(SESSION_NAME, SESSION_DIR)
+cleanup_orphan_sessions(session_name)
+# flood_sleep_threshold=0: Telethon lève FloodWaitError au lieu de dormir dans l'appel, pour que la
+# file d'envoi bloque le seau du canal concerné et que les FloodWait soient comptés; les autres
+# appels (connexion, entités, rattrapage) attendent et réessaient eux-mêmes (retry_flood_wait)
+client = TelegramClient(session_name, API_ID, API_HASH, flood_sleep_threshold=0)
+
+# Appels API chronométrés et comptés (les handlers restent enregistrés sur le client brut)
+api = InstrumentedClient(client)
+
+# File d'envoi partagée (diffusions, éditions, planificateur) avec limitation de débit
+outbound = OutboundQueue(
+    api,
+    per_chat_rate=OUTBOUND_CHAT_PER_MINUTE / 60,
+    global_rate=OUTBOUND_GLOBAL_PER_SECOND,
+    global_burst=OUTBOUND_GLOBAL_PER_SECOND,
+    edit_window=OUTBOUND_EDIT_WINDOW
+)
+
+# Cache de l'identité du bot et des entités de canaux
+entities = EntityCache(api, ttl=ENTITY_CACHE_TTL)
 
 async def start_bot():
     """Start the bot with proper error handling"""
@@ -127,16 +265,18 @@ async def start_bot():
         # Load saved configuration first
         load_config()
 
-        await client.start(bot_token=BOT_TOKEN)
-        print("Bot démarré avec succès...")
+        await retry_flood_wait(lambda: client.start(bot_token=BOT_TOKEN))
+        startup_timer.mark('connected')
+        logger.info("Bot démarré avec succès...")
 
-        # Get bot info
-        me = await client.get_me()
+        # Identité du bot et canaux configurés mis en cache dès le démarrage
+        await entities.warm([detected_stat_channel, detected_display_channel] + scheduler_targets)
+        me = await entities.get_me()
         username = getattr(me, 'username', 'Unknown') or f"ID:{getattr(me, 'id', 'Unknown')}"
-        print(f"Bot connecté: @{username}")
+        logger.info("Bot connecté: @%s", username)
 
     except Exception as e:
-        print(f"Erreur lors du démarrage du bot: {e}")
+        logger.error("Erreur lors du démarrage du bot: %s", e)
         return False
 
     return True
@@ -148,24 +288,20 @@ async def handler_join(event):
     global confirmation_pending
 
     try:
-        print(f"ChatAction event: {event}")
-        print(f"user_joined: {event.user_joined}, user_added: {event.user_added}")
-        print(f"user_id: {event.user_id}, chat_id: {event.chat_id}")
+        logger.debug("ChatAction event: %s", event)
+        logger.debug("user_joined: %s, user_added: %s", event.user_joined, event.user_added)
+        logger.debug("user_id: %s, chat_id: %s", event.user_id, event.chat_id)
 
         if event.user_joined or event.user_added:
-            me = await client.get_me()
+            me = await entities.get_me()
             me_id = getattr(me, 'id', None)
-            print(f"Mon ID: {me_id}, Event user_id: {event.user_id}")
+            logger.debug("Mon ID: %s, Event user_id: %s", me_id, event.user_id)
 
             if event.user_id == me_id:
                 confirmation_pending[event.chat_id] = 'waiting_confirmation'
 
                 # Get channel info
-                try:
-                    chat = await client.get_entity(event.chat_id)
-                    chat_title = getattr(chat, 'title', f'Canal {event.chat_id}')
-                except:
-                    chat_title = f'Canal {event.chat_id}'
+                chat_title = await entities.get_title(event.chat_id)
 
                 # Send private invitation to admin
                 invitation_msg = f"""🔔 **Nouveau canal détecté**
@@ -180,15 +316,15 @@ async def handler_join(event):
 Envoyez votre choix en réponse à ce message."""
 
                 try:
-                    await client.send_message(ADMIN_ID, invitation_msg)
-                    print(f"Invitation envoyée à l'admin pour le canal: {chat_title} ({event.chat_id})")
+                    await api.send_message(ADMIN_ID, invitation_msg)
+                    logger.info("Invitation envoyée à l'admin pour le canal: %s (%s)", chat_title, event.chat_id)
                 except Exception as e:
-                    print(f"Erreur envoi invitation privée: {e}")
+                    logger.error("Erreur envoi invitation privée: %s", e)
                     # Fallback: send to the channel temporarily for testing
-                    await client.send_message(event.chat_id, f"⚠️ Impossible d'envoyer l'invitation privée. Canal ID: {event.chat_id}")
-                    print(f"Message fallback envoyé dans le canal {event.chat_id}")
+                    await api.send_message(event.chat_id, f"⚠️ Impossible d'envoyer l'invitation privée. Canal ID: {event.chat_id}")
+                    logger.info("Message fallback envoyé dans le canal %s", event.chat_id)
     except Exception as e:
-        print(f"Erreur dans handler_join: {e}")
+        logger.error("Erreur dans handler_join: %s", e)
 
 @client.on(events.NewMessage(pattern=r'/set_stat (-?\d+)'))
 async def set_stat_channel(event):
@@ -215,21 +351,18 @@ async def set_stat_channel(event):
 
         detected_stat_channel = channel_id
         confirmation_pending[channel_id] = 'configured_stat'
+        router.set_route('stat', detected_stat_channel)
 
         # Save configuration
         save_config()
 
-        try:
-            chat = await client.get_entity(channel_id)
-            chat_title = getattr(chat, 'title', f'Canal {channel_id}')
-        except:
-            chat_title = f'Canal {channel_id}'
+        chat_title = await entities.get_title(channel_id)
 
         await event.respond(f"✅ **Canal de statistiques configuré**\n📋 {chat_title}\n\n✨ Le bot surveillera ce canal pour les prédictions - développé par Sossou Kouamé Appolinaire\n💾 Configuration sauvegardée automatiquement")
-        print(f"Canal de statistiques configuré: {channel_id}")
+        logger.info("Canal de statistiques configuré: %s", channel_id)
 
     except Exception as e:
-        print(f"Erreur dans set_stat_channel: {e}")
+        logger.error("Erreur dans set_stat_channel: %s", e)
 
 @client.on(events.NewMessage(pattern=r'/set_display (-?\d+)'))
 async def set_display_channel(event):
@@ -260,17 +393,13 @@ async def set_display_channel(event):
         # Save configuration
         save_config()
 
-        try:
-            chat = await client.get_entity(channel_id)
-            chat_title = getattr(chat, 'title', f'Canal {channel_id}')
-        except:
-            chat_title = f'Canal {channel_id}'
+        chat_title = await entities.get_title(channel_id)
 
         await event.respond(f"✅ **Canal de diffusion configuré**\n📋 {chat_title}\n\n🚀 Le bot publiera les prédictions dans ce canal - développé par Sossou Kouamé Appolinaire\n💾 Configuration sauvegardée automatiquement")
-        print(f"Canal de diffusion configuré: {channel_id}")
+        logger.info("Canal de diffusion configuré: %s", channel_id)
 
     except Exception as e:
-        print(f"Erreur dans set_display_channel: {e}")
+        logger.error("Erreur dans set_display_channel: %s", e)
 
 # --- COMMANDES DE BASE ---
 @client.on(events.NewMessage(pattern='/start'))
@@ -296,6 +425,7 @@ async def start_command(event):
 • `/start` - Ce message
 • `/status` - État du bot (admin)
 • `/intervalle` - Configure le délai de prédiction (admin)
+• `/queue` - Diffusions en attente, `/queue cancel [id]` (admin)
 
 • `/sta` - Statut des déclencheurs (admin)
 • `/reset` - Réinitialiser (admin)
@@ -305,7 +435,7 @@ async def start_command(event):
 Le bot est prêt à analyser vos jeux ! 🚀"""
 
         await event.respond(welcome_msg)
-        print(f"Message de bienvenue envoyé à l'utilisateur {event.sender_id}")
+        logger.info("Message de bienvenue envoyé à l'utilisateur %s", event.sender_id)
 
         # Test message private pour vérifier la connectivité
         if event.sender_id == ADMIN_ID:
@@ -314,7 +444,7 @@ Le bot est prêt à analyser vos jeux ! 🚀"""
             await event.respond(test_msg)
 
     except Exception as e:
-        print(f"Erreur dans start_command: {e}")
+        logger.error("Erreur dans start_command: %s", e)
 
 # --- COMMANDES ADMINISTRATIVES ---
 @client.on(events.NewMessage(pattern='/status'))
@@ -334,10 +464,20 @@ Configuration persistante: {config_status}
 Prédictions actives: {len(predictor.prediction_status)}
 Dernières prédictions: {len(predictor.last_predictions)}
 Messages traités: {len(predictor.processed_messages)}
+Diffusions en attente: {len(dispatch_queue.entries)}
+Envois évités (prédictions déjà résolues): {dispatch_queue.avoided_sends()}
+File d'envoi: {outbound.depth()} en attente, FloodWait: {outbound.stats['flood_waits']} ({outbound.stats['flood_wait_seconds']}s)
+Éditions fusionnées: {outbound.edit_buffer.stats['coalesced']}, identiques ignorées: {outbound.edit_buffer.stats['skipped_identical']}
+File d'ingestion: {ingest.depth()} en attente
+Mises à jour routées: {router.routed.get('stat', 0)}, rejetées: {router.stats['rejected']}
+Doublons écartés: {ingest.seen.stats['hits']}
+Boîte d'envoi: {len(outbox.entries)} édition(s) en attente, doublons ignorés: {outbox.stats['deduplicated']}, secours: {outbox.stats['fallbacks']}
+Retard boucle: p95 {loop_monitor.percentile(0.95) * 1000:.0f} ms, blocages: {len(loop_monitor.stalls)} (/loop)
+Stratégies: {len(strategies.strategies)}, principale: {strategies.primary} (/strategies)
 """
         await event.respond(status_msg)
     except Exception as e:
-        print(f"Erreur dans show_status: {e}")
+        logger.error("Erreur dans show_status: %s", e)
 
 @client.on(events.NewMessage(pattern='/reset'))
 async def reset_bot(event):
@@ -352,14 +492,18 @@ async def reset_bot(event):
         detected_display_channel = None
         confirmation_pending.clear()
         predictor.reset()
+        strategies.reset()
+        if database:
+            database.clear_message_index()
+        router.set_route('stat', None)
 
         # Save the reset configuration
         save_config()
 
         await event.respond("🔄 Bot réinitialisé avec succès\n💾 Configuration effacée et sauvegardée")
-        print("Bot réinitialisé par l'administrateur")
+        logger.info("Bot réinitialisé par l'administrateur")
     except Exception as e:
-        print(f"Erreur dans reset_bot: {e}")
+        logger.error("Erreur dans reset_bot: %s", e)
 
 # Handler /deploy supprimé - remplacé par le handler 2D plus bas
 
@@ -383,10 +527,10 @@ async def test_invite(event):
 Ceci est un message de test pour vérifier les invitations."""
 
         await event.respond(test_msg)
-        print(f"Message de test envoyé à l'admin")
+        logger.info("Message de test envoyé à l'admin")
 
     except Exception as e:
-        print(f"Erreur dans test_invite: {e}")
+        logger.error("Erreur dans test_invite: %s", e)
 
 @client.on(events.NewMessage(pattern='/sta'))
 async def show_trigger_numbers(event):
@@ -415,10 +559,10 @@ async def show_trigger_numbers(event):
 💡 **Canal détecté**: {detected_stat_channel if detected_stat_channel else 'Aucun'}"""
 
         await event.respond(msg)
-        print(f"Statut des déclencheurs envoyé à l'admin")
+        logger.info("Statut des déclencheurs envoyé à l'admin")
 
     except Exception as e:
-        print(f"Erreur dans show_trigger_numbers: {e}")
+        logger.error("Erreur dans show_trigger_numbers: %s", e)
         await event.respond(f"❌ Erreur: {e}")
 
 # Report command completely removed from deployer50
@@ -428,7 +572,7 @@ async def show_trigger_numbers(event):
 @client.on(events.NewMessage(pattern='/scheduler'))
 async def manage_scheduler(event):
     """Gestion du planificateur automatique (admin uniquement)"""
-    global scheduler
+    global scheduler, scheduler_targets
     try:
         if event.sender_id != ADMIN_ID:
             return
@@ -446,6 +590,7 @@ async def manage_scheduler(event):
 • `status` - Affiche le statut actuel
 • `generate` - Génère une nouvelle planification
 • `config [source_id] [target_id]` - Configure les canaux
+• `targets [id1] [id2] ...` - Canaux de diffusion supplémentaires (`targets clear` pour vider)
 
 **Exemple**: `/scheduler config -1001234567890 -1001987654321`""")
             return
@@ -456,8 +601,10 @@ async def manage_scheduler(event):
             if not scheduler:
                 if detected_stat_channel and detected_display_channel:
                     scheduler = PredictionScheduler(
-                        client, predictor,
-                        detected_stat_channel, detected_display_channel
+                        api, predictor,
+                        detected_stat_channel, get_scheduler_targets(),
+                        max_concurrent_sends=SCHEDULER_MAX_CONCURRENCY,
+                        outbound=outbound
                     )
                     # Démarre le planificateur en arrière-plan
                     asyncio.create_task(scheduler.run_scheduler())
@@ -491,7 +638,7 @@ async def manage_scheduler(event):
 
 🔧 **Configuration**:
 • Canal source: {detected_stat_channel}
-• Canal cible: {detected_display_channel}"""
+• Canaux cibles: {', '.join(map(str, scheduler.target_channel_ids))}"""
                 await event.respond(status_msg)
             else:
                 await event.respond("ℹ️ **Planificateur non configuré**\n\nUtilisez `/scheduler start` pour l'activer.")
@@ -502,7 +649,7 @@ async def manage_scheduler(event):
                 await event.respond("🔄 **Nouvelle planification générée**\n\nLa planification quotidienne a été régénérée avec succès.")
             else:
                 # Crée un planificateur temporaire pour générer
-                temp_scheduler = PredictionScheduler(client, predictor, 0, 0)
+                temp_scheduler = PredictionScheduler(api, predictor, 0, 0)
                 temp_scheduler.regenerate_schedule()
                 await event.respond("✅ **Planification générée**\n\nFichier `prediction.yaml` créé. Utilisez `/scheduler start` pour activer.")
 
@@ -520,11 +667,27 @@ async def manage_scheduler(event):
 
 Utilisez `/scheduler start` pour activer le planificateur.""")
 
+        elif command == "targets":
+            if len(message_parts) >= 3:
+                if message_parts[2].lower() == "clear":
+                    scheduler_targets = []
+                else:
+                    scheduler_targets = [int(t) for t in message_parts[2:]]
+                save_config()
+
+            targets = get_scheduler_targets()
+            await event.respond(f"""📤 **Canaux cibles du planificateur**
+
+{chr(10).join(f'• {t}' for t in targets) or 'Aucun canal configuré'}
+
+⚡ Envois simultanés max: {SCHEDULER_MAX_CONCURRENCY}
+Les changements s'appliquent au prochain `/scheduler start`.""")
+
         else:
             await event.respond("❌ **Commande inconnue**\n\nUtilisez `/scheduler` sans paramètre pour voir l'aide.")
 
     except Exception as e:
-        print(f"Erreur dans manage_scheduler: {e}")
+        logger.error("Erreur dans manage_scheduler: %s", e)
         await event.respond(f"❌ Erreur: {e}")
 
 @client.on(events.NewMessage(pattern='/schedule_info'))
@@ -559,9 +722,142 @@ async def schedule_info(event):
             await event.respond("❌ **Aucune planification active**\n\nUtilisez `/scheduler generate` pour créer une planification.")
 
     except Exception as e:
-        print(f"Erreur dans schedule_info: {e}")
+        logger.error("Erreur dans schedule_info: %s", e)
         await event.respond(f"❌ Erreur: {e}")
 
+@client.on(events.NewMessage(pattern=r'/queue'))
+async def manage_dispatch_queue(event):
+    """Liste ou annule les diffusions différées en attente (admin uniquement)"""
+    try:
+        if event.sender_id != ADMIN_ID:
+            return
+
+        message_parts = event.message.message.split()
+
+        if len(message_parts) >= 3 and message_parts[1].lower() == "cancel":
+            try:
+                entry_id = int(message_parts[2])
+            except ValueError:
+                await event.respond("❌ **Erreur**: Identifiant de diffusion invalide")
+                return
+
+            if dispatch_queue.cancel(entry_id):
+                await event.respond(f"🚫 **Diffusion #{entry_id} annulée**")
+            else:
+                await event.respond(f"❌ **Diffusion #{entry_id} introuvable**")
+            return
+
+        pending = dispatch_queue.list_pending()
+        msg = f"🗓️ **Diffusions en attente** ({len(pending)})\n\n"
+        for entry in pending[:20]:
+            msg += f"#{entry['id']} → 🔵{entry['game_number']} à {entry['due']}\n"
+
+        if not pending:
+            msg += "ℹ️ Aucune diffusion en attente."
+        else:
+            msg += "\nUtilisez `/queue cancel [id]` pour annuler une diffusion."
+
+        stats = dispatch_queue.stats
+        msg += f"""
+
+📊 **Envois** (politique: {dispatch_queue.resolved_policy}):
+• Diffusées: {stats['sent']}
+• Abandonnées (déjà résolues): {stats['dropped_resolved']}
+• Réécrites avec le statut final: {stats['rewritten_resolved']}
+• Envois de secours évités: {stats['fallback_avoided']}"""
+
+        await event.respond(msg)
+
+    except Exception as e:
+        logger.error("Erreur dans manage_dispatch_queue: %s", e)
+        await event.respond(f"❌ Erreur: {e}")
+
+@client.on(events.NewMessage(pattern='/loop'))
+async def show_loop_monitor(event):
+    """Retard de la boucle asyncio et derniers blocages détectés (admin uniquement)"""
+    try:
+        if event.sender_id != ADMIN_ID:
+            return
+
+        stats = loop_monitor.get_stats()
+        msg = f"""🩺 **Boucle asyncio**
+
+Échantillons: {stats['samples']}
+Retard p50: {stats['lag_ms_p50']} ms
+Retard p95: {stats['lag_ms_p95']} ms
+Retard max: {stats['lag_ms_max']} ms
+Blocages > {loop_monitor.stall_threshold * 1000:.0f} ms: {stats['stalls']}"""
+
+        if loop_monitor.stalls:
+            last = loop_monitor.stalls[-1]
+            stack = "\n".join(last['stack'][-6:])
+            msg += f"""
+
+🐢 **Dernier blocage** ({last['at']}, {last['blocked_ms']:.0f} ms)
+`{last['location']}`
+```
+{stack}
+```"""
+
+        await event.respond(msg)
+    except Exception as e:
+        logger.error("Erreur dans show_loop_monitor: %s", e)
+
+@client.on(events.NewMessage(pattern='/strategies'))
+async def show_strategies(event):
+    """Performances des stratégies principale et en ombre (admin uniquement)"""
+    try:
+        if event.sender_id != ADMIN_ID:
+            return
+
+        lines = []
+        for name, stats in strategies.get_stats().items():
+            marker = "📣" if stats['primary'] else "👻"
+            lines.append(f"{marker} **{name}** - {stats['win_rate']:.1f}% "
+                         f"(✅ {stats['wins']} / ❌ {stats['losses']} / ⌛ {stats['pending']})\n"
+                         f"   `{stats['rule']}`")
+        await event.respond(f"""🧪 **Stratégies** ({strategies.messages} messages analysés)
+
+{chr(10).join(lines)}
+
+📣 publie sur Telegram, 👻 suivie en ombre""")
+    except Exception as e:
+        logger.error("Erreur dans show_strategies: %s", e)
+
+@client.on(events.NewMessage(pattern='/profile'))
+async def profile_bot(event):
+    """Profile le bot en direct: /profile [secondes] [cpu|mem] (admin uniquement)"""
+    try:
+        if event.sender_id != ADMIN_ID:
+            return
+
+        parts = event.message.message.split()
+        try:
+            seconds, mode = profiler.parse_request(parts[1] if len(parts) > 1 else 30,
+                                                   parts[2] if len(parts) > 2 else 'cpu')
+        except ValueError as e:
+            await event.respond(f"""❌ {e}
+
+**Usage**: `/profile [secondes] [cpu|mem]`
+• `/profile 30` - Profil CPU (cProfile) pendant 30s
+• `/profile 60 mem` - Allocations (tracemalloc) pendant 60s""")
+            return
+
+        if profiler.is_busy():
+            await event.respond("⏳ Un profilage est déjà en cours")
+            return
+
+        await event.respond(f"🔬 Profilage {mode} démarré pour {seconds:.0f}s...")
+        report = await profiler.run(seconds, mode)
+
+        document = io.BytesIO(report.encode('utf-8'))
+        document.name = f"profile_{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        await api.send_file(event.chat_id, document,
+                               caption=f"🔬 **Profil {mode}** - {seconds:.0f}s sous trafic réel")
+    except Exception as e:
+        logger.error("Erreur dans profile_bot: %s", e)
+        await event.respond(f"❌ Erreur profilage: {e}")
+
 @client.on(events.NewMessage(pattern='/intervalle'))
 async def set_prediction_interval(event):
     """Configure l'intervalle avant que le système cherche 'A' (admin uniquement)"""
@@ -612,13 +908,13 @@ Le système attendra maintenant {prediction_interval} minute(s) avant de commenc
 
 Configuration sauvegardée automatiquement.""")
             
-            print(f"✅ Intervalle de prédiction mis à jour: {old_interval} → {prediction_interval} minutes")
+            logger.info("✅ Intervalle de prédiction mis à jour: %s → %s minutes", old_interval, prediction_interval)
             
         except ValueError:
             await event.respond("❌ **Erreur**: Veuillez entrer un nombre valide de minutes")
             
     except Exception as e:
-        print(f"Erreur dans set_prediction_interval: {e}")
+        logger.error("Erreur dans set_prediction_interval: %s", e)
         await event.respond(f"❌ Erreur: {e}")
 
 @client.on(events.NewMessage(pattern='/ni'))
@@ -640,7 +936,7 @@ async def generate_ni_package(event):
                     'main.py', 'render_main_deployer50.py', 'render_predictor.py', 
                     'yaml_database.py', 'predictor.py', 'scheduler.py', 
                     'README_RENDER.md', 'DEPLOYMENT_GUIDE.md', 'DEPLOYER50_VERIFICATION.md'
-                ]
+                ] + BOT_MODULES
                 
                 for file_path in files_to_include:
                     if os.path.exists(file_path):
@@ -708,19 +1004,19 @@ PREDICTION_INTERVAL={prediction_interval}"""
 • ⏳ Intervalle: {prediction_interval}min avant diffusion""")
             
             # Envoyer le fichier ZIP en pièce jointe
-            await client.send_file(
+            await api.send_file(
                 event.chat_id,
                 package_name,
                 caption="📦 **Package deployer50 modifié** - Logique As STRICTE + Intervalle fonctionnel"
             )
             
-            print(f"✅ Package deployer50.zip modifié créé: {file_size:.1f} KB")
+            logger.info("✅ Package deployer50.zip modifié créé: %.1f KB", file_size)
             
         except Exception as e:
             await event.respond(f"❌ Erreur création: {str(e)}")
 
     except Exception as e:
-        print(f"Erreur /ni: {e}")
+        logger.error("Erreur /ni: %s", e)
 
 @client.on(events.NewMessage(pattern='/deploy'))
 async def generate_deploy_package(event):
@@ -741,7 +1037,7 @@ async def generate_deploy_package(event):
                     'main.py', 'render_main_deployer50.py', 'render_predictor.py', 
                     'render_requirements.txt', 'render.yaml', 'yaml_database.py',
                     'predictor.py', 'scheduler.py', 'README_RENDER.md', 'DEPLOYMENT_GUIDE.md'
-                ]
+                ] + BOT_MODULES
                 
                 for file_path in files_to_include:
                     if os.path.exists(file_path):
@@ -816,157 +1112,264 @@ Prêt pour déploiement Render.com avec système YAML complet!"""
 📚 **Documentation deployer50** complète""")
             
             # Envoyer le fichier ZIP en pièce jointe
-            await client.send_file(
+            await api.send_file(
                 event.chat_id,
                 package_name,
                 caption="📦 **Package deployer50** - Système YAML + nouveau format pour Render.com"
             )
             
-            print(f"✅ Package deployer50.zip créé: {file_size:.1f} KB avec système YAML complet")
+            logger.info("✅ Package deployer50.zip créé: %.1f KB avec système YAML complet", file_size)
             
         except Exception as e:
             await event.respond(f"❌ Erreur création: {str(e)}")
 
     except Exception as e:
-        print(f"Erreur deploy: {e}")
+        logger.error("Erreur deploy: %s", e)
 
 # --- TRAITEMENT DES MESSAGES DU CANAL DE STATISTIQUES ---
-@client.on(events.NewMessage())
-@client.on(events.MessageEdited())
+STAGE_SECONDS = Histogram('stat_update_stage_duration_seconds',
+                          "Durée des étapes de traitement d'un message de statistiques", ('stage',))
+
+# Traces par message (identifiant de corrélation + durée de chaque étape)
+tracer = Tracer(TRACE_FILE, histogram=STAGE_SECONDS)
+
+# Capture brute optionnelle des mises à jour (rejeu hors ligne)
+recorder = EventRecorder(CAPTURE_FILE) if CAPTURE_FILE else None
+
+# Seules les mises à jour du canal de statistiques atteignent le handler:
+# le filtre du routeur est évalué par Telethon avant toute coroutine
+@client.on(events.NewMessage(func=router.accepts('stat')))
+@client.on(events.MessageEdited(func=router.accepts('stat')))
 async def handle_messages(event):
     """Handle messages from statistics channel"""
+    trace = None
     try:
-        # Debug: Log ALL incoming messages first
-        message_text = event.message.message if event.message else "Pas de texte"
-        print(f"📬 TOUS MESSAGES: Canal {event.chat_id} | Texte: {message_text[:100]}")
-        print(f"🔧 Canal stats configuré: {detected_stat_channel}")
-
-        # Check if stat channel is configured
-        if detected_stat_channel is None:
-            print("⚠️ PROBLÈME: Canal de statistiques non configuré!")
+        message_text = event.message.message if event.message else None
+        if not message_text:
+            logger.debug("❌ Message vide ignoré")
             return
 
-        # Check if message is from the configured channel
-        if event.chat_id != detected_stat_channel:
-            print(f"❌ Message ignoré: Canal {event.chat_id} ≠ Canal stats {detected_stat_channel}")
-            return
+        # Mise en file ordonnée par canal: le traitement se fait dans process_stat_update
+        kind = 'edit' if isinstance(event, events.MessageEdited.Event) else 'new'
+        trace = tracer.start(chat_id=event.chat_id, message_id=event.message.id, kind=kind)
+        sent_at = event.message.edit_date or event.message.date
+        if recorder is not None:
+            recorder.record(kind, event.chat_id, event.message.id, message_text,
+                            sent_at.timestamp() if sent_at else None)
+        if sent_at:
+            # Délai Telegram → bot (résolution d'une seconde)
+            trace.add('receive', max(0.0, time.time() - sent_at.timestamp()))
+        # Avant submit: en cas d'attente (contre-pression), le worker peut terminer la trace avant le retour
+        trace.lap('route')
+        accepted = await ingest.submit(event.chat_id, event.message.id, message_text, kind, trace=trace)
+        if not accepted:
+            trace.finish(duplicate=True)
+        trace = None  # Désormais terminée par le worker
 
-        if not message_text:
-            print("❌ Message vide ignoré")
-            return
+    except Exception as e:
+        logger.error("Erreur dans handle_messages: %s", e)
+        if trace is not None:
+            trace.finish(error=type(e).__name__)
+
+def schedule_prediction(game_number: int, text: str, trace_id=None) -> int:
+    """
+    Planifie la diffusion d'une nouvelle prédiction après l'intervalle configuré.
+    Les numéros de jeu reviennent à chaque cycle: les statuts déjà livrés pour ce
+    numéro appartiennent à la prédiction précédente et sont oubliés, tout comme
+    son message (sinon les éditions viseraient le message du cycle précédent).
+    """
+    outbox.forget_game(game_number)
+    predictor.prediction_messages.pop(game_number, None)
+    if database:
+        database.forget_prediction_messages(game_number)
+    return dispatch_queue.schedule(game_number, text, prediction_interval * 60, trace_id)
+
+async def process_stat_update(update):
+    """
+    Traite une mise à jour du canal de statistiques (appelé dans l'ordre d'arrivée).
+    Une mise à jour 'historical' (rattrapage au démarrage) ne déclenche aucune
+    nouvelle prédiction et n'envoie pas de message de secours: seules les
+    prédictions déjà publiées sont éditées.
+    """
+    message_text = update['text']
+    historical = update.get('historical', False)
+    trace = update.get('trace') or tracer.start(chat_id=update['chat_id'], message_id=update['message_id'],
+                                                kind=update.get('kind'), historical=historical)
+    trace.lap('queue')
+    game_number = None
+    try:
+        logger.debug("✅ Message accepté du canal stats %s: %s", update['chat_id'], message_text)
+
+        game_number = predictor.extract_game_number(message_text)
+        trace.lap('parse')
 
-        print(f"✅ Message accepté du canal stats {event.chat_id}: {message_text}")
+        # Stratégies en ombre: analyse mémorisée par le prédicteur et réutilisée par ses étapes
+        # (rattrapage: pas de déclenchement)
+        strategies.process(message_text, allow_trigger=not historical)
+        trace.lap('strategies')
 
         # 1. Vérifier si c'est un message en cours d'édition (⏰ ou 🕐)
         is_pending, game_num = predictor.is_pending_edit_message(message_text)
+        trace.lap('pending_edit')
         if is_pending:
-            print(f"⏳ Message #{game_num} mis en attente d'édition finale")
+            trace.add('decision', trace.total('pending_edit'))
+            logger.debug("⏳ Message #%s mis en attente d'édition finale", game_num)
             return  # Ignorer pour le moment, attendre l'édition finale
 
         # 2. Vérifier si c'est l'édition finale d'un message en attente (🔰 ou ✅)
-        predicted, predicted_game, suit = predictor.process_final_edit_message(message_text)
+        # (rattrapage: déclencheur périmé, le jeu prédit est déjà passé)
+        if historical:
+            predicted, predicted_game, suit = False, None, None
+        else:
+            predicted, predicted_game, suit = predictor.process_final_edit_message(message_text)
         if predicted:
-            print(f"🎯 Message édité finalisé, traitement de la prédiction #{predicted_game}")
+            logger.debug("🎯 Message édité finalisé, traitement de la prédiction #%s", predicted_game)
             # Message de prédiction selon le nouveau format demandé
             prediction_text = f"🔵{predicted_game}— 3D🔵 statut :⌛"
 
-            # ATTENDRE L'INTERVALLE CONFIGURÉ avant diffusion
-            print(f"⏳ Attente de {prediction_interval} minute(s) avant diffusion de la prédiction #{predicted_game}")
-            import asyncio
-            await asyncio.sleep(prediction_interval * 60)  # Convertir minutes en secondes
-
-            sent_messages = await broadcast(prediction_text)
-
-            # Store message IDs for later editing
-            if sent_messages and predicted_game:
-                for chat_id, message_id in sent_messages:
-                    predictor.store_prediction_message(predicted_game, message_id, chat_id)
-
-            print(f"✅ Prédiction générée après édition finale pour le jeu #{predicted_game}: {suit} (après attente de {prediction_interval}min)")
-        else:
+            # Diffusion planifiée après l'intervalle configuré (sans bloquer le handler)
+            schedule_prediction(predicted_game, prediction_text, trace.trace_id)
+            logger.info("✅ Prédiction générée après édition finale pour le jeu #%s: %s (diffusion dans %smin)",
+                        predicted_game, suit, prediction_interval)
+        elif not historical:
             # 3. Traitement normal des messages (pas d'édition en cours)
             predicted, predicted_game, suit = predictor.should_predict(message_text)
             if predicted:
                 # Message de prédiction manuelle selon le nouveau format demandé
                 prediction_text = f"🔵{predicted_game}— 3D🔵 statut :⌛"
 
-                # ATTENDRE L'INTERVALLE CONFIGURÉ avant diffusion
-                print(f"⏳ Attente de {prediction_interval} minute(s) avant diffusion de la prédiction #{predicted_game}")
-                import asyncio
-                await asyncio.sleep(prediction_interval * 60)  # Convertir minutes en secondes
-
-                sent_messages = await broadcast(prediction_text)
-
-                # Store message IDs for later editing
-                if sent_messages and predicted_game:
-                    for chat_id, message_id in sent_messages:
-                        predictor.store_prediction_message(predicted_game, message_id, chat_id)
+                # Diffusion planifiée après l'intervalle configuré (sans bloquer le handler)
+                schedule_prediction(predicted_game, prediction_text, trace.trace_id)
+                logger.info("✅ Prédiction manuelle générée pour le jeu #%s: %s (diffusion dans %smin)",
+                            predicted_game, suit, prediction_interval)
 
-                print(f"✅ Prédiction manuelle générée pour le jeu #{predicted_game}: {suit} (après attente de {prediction_interval}min)")
+        trace.lap('trigger')
+        # Étape agrégée historique (/metrics): détection d'édition en cours + déclenchement
+        trace.add('decision', trace.total('pending_edit', 'trigger'))
 
         # Check for prediction verification (manuel + automatique)
+        statut = None
         verified, number = predictor.verify_prediction(message_text)
         if verified is not None and number is not None:
             statut = predictor.prediction_status.get(number, 'Inconnu')
-            # Edit the original prediction message instead of sending new message
-            success = await edit_prediction_message(number, statut)
-            if success:
-                print(f"✅ Message de prédiction #{number} mis à jour avec statut: {statut}")
-            else:
-                print(f"⚠️ Impossible de mettre à jour le message #{number}, envoi d'un nouveau message")
-                status_text = f"🔵{number}— 3D🔵 statut :{statut}"
-                await broadcast(status_text)
+            # Édition du message d'origine via la boîte d'envoi (une seule édition par statut)
+            outbox.enqueue(number, statut, f"🔵{number}— 3D🔵 statut :{statut}", fallback=not historical,
+                           trace_id=trace.trace_id)
+        trace.lap('verify')
         
         # Check for expired predictions on every valid result message
-        game_number = predictor.extract_game_number(message_text)
+        expired = []
         if game_number and not ("⏰" in message_text or "🕐" in message_text):
             expired = predictor.check_expired_predictions(game_number)
             for expired_num in expired:
                 # Edit expired prediction messages
-                success = await edit_prediction_message(expired_num, '❌❌')
-                if success:
-                    print(f"✅ Message de prédiction expirée #{expired_num} mis à jour avec ❌❌")
-                else:
-                    print(f"⚠️ Impossible de mettre à jour le message expiré #{expired_num}")
-                    status_text = f"🔵{expired_num}— 3D🔵 statut :❌❌"
-                    await broadcast(status_text)
+                outbox.enqueue(expired_num, '❌❌', f"🔵{expired_num}— 3D🔵 statut :❌❌", fallback=not historical,
+                               trace_id=trace.trace_id)
+        strategies.record_primary(bool(predicted), statut, len(expired))
+        trace.lap('expiry')
 
         # Vérification des prédictions automatiques du scheduler
         if scheduler and scheduler.schedule_data:
-            # Récupère les numéros des prédictions automatiques en attente
-            pending_auto_predictions = []
-            for numero_str, data in scheduler.schedule_data.items():
-                if data["launched"] and not data["verified"]:
-                    numero_int = int(numero_str.replace('N', ''))
-                    pending_auto_predictions.append(numero_int)
-
-            if pending_auto_predictions:
-                # Vérifie si ce message correspond à une prédiction automatique
-                predicted_num, status = scheduler.verify_prediction_from_message(message_text, pending_auto_predictions)
-
-                if predicted_num and status:
-                    # Met à jour la prédiction automatique
-                    numero_str = f"N{predicted_num:03d}"
-                    if numero_str in scheduler.schedule_data:
-                        data = scheduler.schedule_data[numero_str]
-                        data["verified"] = True
-                        data["statut"] = status
-
-                        # Met à jour le message
-                        await scheduler.update_prediction_message(numero_str, data, status)
-
-                        # Ajouter une nouvelle prédiction pour maintenir la continuité
-                        scheduler.add_next_prediction()
-
-                        # Sauvegarde
-                        scheduler.save_schedule(scheduler.schedule_data)
-                        print(f"📝 Prédiction automatique {numero_str} vérifiée: {status}")
-                        print(f"🔄 Nouvelle prédiction générée pour maintenir la continuité")
+            await scheduler.process_result_message(message_text)
+            trace.lap('scheduler')
 
         # Periodic report functionality removed
 
     except Exception as e:
-        print(f"Erreur dans handle_messages: {e}")
+        logger.exception("Erreur dans process_stat_update: %s", e)
+    finally:
+        trace.finish(game=game_number)
+        # Point de reprise pour le rattrapage au prochain démarrage
+        checkpoints.advance(update['chat_id'], update['message_id'])
+        if not historical:
+            startup_timer.mark('first_update')
+
+# Pipeline d'ingestion ordonné par canal source
+ingest = IngestPipeline(process_stat_update, max_depth=INGEST_MAX_DEPTH, seen_cache_size=SEEN_CACHE_SIZE)
+
+def restore_prediction_messages() -> int:
+    """Recharge les messages de prédiction diffusés avant le redémarrage"""
+    if not database:
+        return 0
+    index = database.load_message_index()
+    for game_number, messages in index.items():
+        if messages and game_number not in predictor.prediction_messages:
+            predictor.store_prediction_message(game_number, messages[0]['message_id'], messages[0]['chat_id'])
+    logger.info("✅ Index des messages de prédiction rechargé: %s prédiction(s)", len(index))
+    return len(index)
+
+def restore_pending_predictions() -> int:
+    """
+    Remet à '⌛' les prédictions encore en attente avant le redémarrage (diffusions
+    en file et prédictions diffusées non résolues), pour que le rattrapage puisse
+    les vérifier ou les expirer
+    """
+    pending = {entry['game_number'] for entry in dispatch_queue.entries.values()}
+    if database:
+        now = datetime.now()
+        seen_games = set()
+        # La plus récente d'abord (les numéros de jeu reviennent à chaque cycle)
+        for prediction in reversed(database.get_all_predictions()):
+            game_number = prediction.get('game_number')
+            if game_number in seen_games:
+                continue
+            seen_games.add(game_number)
+            if prediction.get('status') != '⌛':
+                continue
+            try:
+                age = (now - datetime.fromisoformat(prediction['created_at'])).total_seconds()
+            except (KeyError, TypeError, ValueError):
+                continue
+            # Au-delà, la prédiction appartient à un cycle précédent
+            if age <= PENDING_RESTORE_MAX_SECONDS:
+                pending.add(game_number)
+
+    for game_number in pending:
+        if game_number and game_number not in predictor.prediction_status:
+            predictor.mark_pending(game_number)
+    logger.info("✅ Prédictions en attente restaurées: %s", len(pending))
+    return len(pending)
+
+# Dernier message traité par canal (rattrapage au démarrage)
+checkpoints = CheckpointStore()
+
+async def process_catchup_batch(messages) -> int:
+    """Traite un lot de messages manqués pendant l'arrêt (sans diffusion ni attente)"""
+    processed = 0
+    for message in messages:
+        text = message.message
+        if not text:
+            continue
+        # Mémorisé dans le cache des doublons: un rejeu en direct sera écarté
+        if ingest.seen.check_and_add(message.chat_id, message.id, text):
+            continue
+        await process_stat_update({
+            "chat_id": message.chat_id,
+            "message_id": message.id,
+            "text": text,
+            "kind": "new",
+            "historical": True,
+        })
+        processed += 1
+    return processed
+
+async def run_catchup():
+    """Rattrape les messages du canal de statistiques publiés depuis le dernier traité"""
+    checkpoints.load()
+    if not detected_stat_channel:
+        return None
+    since_id = checkpoints.get(detected_stat_channel)
+    if since_id is None:
+        logger.info("ℹ️ Aucun point de reprise pour le canal de statistiques, rattrapage ignoré")
+        return None
+    summary = await catch_up(client, detected_stat_channel, since_id, process_catchup_batch,
+                             max_seconds=CATCHUP_MAX_SECONDS, max_messages=CATCHUP_MAX_MESSAGES)
+    # Plages non traitées enregistrées explicitement: le point de reprise peut les dépasser
+    for first_id, last_id in summary["gaps"]:
+        checkpoints.record_gap(detected_stat_channel, first_id, last_id)
+    checkpoints.advance(detected_stat_channel, summary["last_id"])
+    checkpoints.flush()
+    return summary
 
 async def broadcast(message):
     """Broadcast message to display channel"""
@@ -975,36 +1378,65 @@ async def broadcast(message):
     sent_messages = []
     if detected_display_channel:
         try:
-            sent_message = await client.send_message(detected_display_channel, message)
+            sent_message = await outbound.send_message(detected_display_channel, message)
             sent_messages.append((detected_display_channel, sent_message.id))
-            print(f"Message diffusé: {message}")
+            logger.debug("Message diffusé: %s", message)
         except Exception as e:
-            print(f"Erreur lors de l'envoi: {e}")
+            logger.error("Erreur lors de l'envoi: %s", e)
     else:
-        print("⚠️ Canal d'affichage non configuré")
+        logger.warning("⚠️ Canal d'affichage non configuré")
 
     return sent_messages
 
-async def edit_prediction_message(game_number: int, new_status: str):
-    """Edit prediction message with new status"""
-    try:
-        message_info = predictor.get_prediction_message(game_number)
-        if message_info:
-            chat_id = message_info['chat_id']
-            message_id = message_info['message_id']
-            new_text = f"🔵{game_number}— 3D🔵 statut :{new_status}"
-
-            await client.edit_message(chat_id, message_id, new_text)
-            print(f"Message de prédiction #{game_number} mis à jour avec statut: {new_status}")
-            
-            # Save to YAML database
-            if yaml_db:
-                yaml_db.update_prediction_status(game_number, new_status)
-            
-            return True
-    except Exception as e:
-        print(f"Erreur lors de la modification du message: {e}")
-    return False
+async def edit_prediction_message(entry):
+    """Edit prediction message with new status (livraison de la boîte d'envoi; lève en cas d'échec)"""
+    game_number = entry['game_number']
+    new_status = entry['status']
+    if dispatch_queue.pending_for_game(game_number):
+        # La diffusion en file publiera directement le statut final
+        dispatch_queue.note_fallback_avoided(game_number)
+        return
+    message_info = predictor.get_prediction_message(game_number)
+    if not message_info:
+        raise LookupError(f"message de la prédiction #{game_number} inconnu")
+
+    started = time.perf_counter()
+    await outbound.edit_message(message_info['chat_id'], message_info['message_id'], entry['text'])
+    tracer.record(entry.get('trace_id'), 'outbound_edit', time.perf_counter() - started, game=game_number)
+    logger.info("Message de prédiction #%s mis à jour avec statut: %s", game_number, new_status)
+
+    # Save to YAML database
+    if database:
+        database.update_prediction_status(game_number, new_status)
+
+async def send_status_fallback(entry):
+    """Publie le statut dans un nouveau message quand l'édition reste impossible"""
+    if not await broadcast(entry['text']):
+        raise RuntimeError("diffusion du statut impossible")
+
+# Boîte d'envoi persistante des changements de statut (idempotente, avec nouvelles tentatives)
+outbox = Outbox(edit_prediction_message, send_status_fallback, max_attempts=OUTBOX_MAX_ATTEMPTS)
+
+# Surveillance du retard de la boucle et des appels bloquants
+loop_monitor = LoopMonitor(stall_threshold=LOOP_STALL_THRESHOLD_MS / 1000)
+
+# Profilage à la demande (/profile et route HTTP)
+profiler = Profiler()
+
+# --- MÉTRIQUES (valeurs lues au moment de la collecte) ---
+UPDATES_RECEIVED = Counter('stat_updates_received_total', "Mises à jour examinées par le filtre de routage")
+UPDATES_RECEIVED.set_function(lambda: router.stats['received'])
+UPDATES_ROUTED = Counter('stat_updates_routed_total', "Mises à jour acceptées par route", ('route',))
+UPDATES_ROUTED.labels('stat').set_function(lambda: router.routed.get('stat', 0))
+UPDATES_DUPLICATE = Counter('stat_updates_duplicate_total', "Mises à jour écartées comme doublons")
+UPDATES_DUPLICATE.set_function(lambda: ingest.seen.stats['hits'])
+PENDING_PREDICTIONS = Gauge('predictions_pending', "Prédictions en attente de résultat")
+PENDING_PREDICTIONS.set_function(lambda: sum(1 for s in predictor.prediction_status.values() if s == '⌛'))
+QUEUE_DEPTH = Gauge('queue_depth', "Éléments en attente par file", ('queue',))
+QUEUE_DEPTH.labels('outbound').set_function(outbound.depth)
+QUEUE_DEPTH.labels('ingest').set_function(ingest.depth)
+QUEUE_DEPTH.labels('dispatch').set_function(lambda: len(dispatch_queue.entries))
+QUEUE_DEPTH.labels('outbox').set_function(lambda: len(outbox.entries))
 
 # Report functionality completely removed from deployer50
 
@@ -1014,13 +1446,13 @@ async def edit_prediction_message(game_number: int, new_status: str):
 # --- GESTION D'ERREURS ET RECONNEXION ---
 async def handle_connection_error():
     """Handle connection errors and attempt reconnection"""
-    print("Tentative de reconnexion...")
+    logger.warning("Tentative de reconnexion...")
     await asyncio.sleep(5)
     try:
         await client.connect()
-        print("Reconnexion réussie")
+        logger.info("Reconnexion réussie")
     except Exception as e:
-        print(f"Échec de la reconnexion: {e}")
+        logger.error("Échec de la reconnexion: %s", e)
 
 # --- SERVEUR WEB POUR MONITORING ---
 async def health_check(request):
@@ -1034,27 +1466,72 @@ async def bot_status(request):
         "stat_channel": detected_stat_channel,
         "display_channel": detected_display_channel,
         "predictions_active": len(predictor.prediction_status),
-        "total_predictions": len(predictor.status_log)
+        "total_predictions": len(predictor.status_log),
+        "dispatch_pending": len(dispatch_queue.entries),
+        "dispatch_stats": dict(dispatch_queue.stats, avoided_sends=dispatch_queue.avoided_sends()),
+        "outbound_queue_depth": outbound.depth(),
+        "outbound_stats": outbound.stats,
+        "edit_buffer_stats": outbound.edit_buffer.stats,
+        "ingest_queue_depth": ingest.depth(),
+        "ingest_stats": ingest.get_stats(),
+        "routing": router.get_table(),
+        "duplicates": dict(ingest.seen.stats, size=len(ingest.seen)),
+        "catchup": last_catchup,
+        "startup_ms": startup_timer.report(),
+        "entity_cache": entities.get_stats(),
+        "outbox_pending": len(outbox.entries),
+        "outbox_stats": outbox.stats,
+        "event_loop": loop_monitor.get_stats(),
+        "pipeline_stages": tracer.get_summary(),
+        "telegram_api": api.get_stats(),
+        "capture": recorder.get_stats() if recorder is not None else None,
+        "strategies": strategies.get_stats()
     }
     return web.json_response(status)
 
+async def metrics_endpoint(request):
+    """Métriques au format texte Prometheus"""
+    return web.Response(body=REGISTRY.expose().encode('utf-8'), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+async def profile_endpoint(request):
+    """Profilage via HTTP (protégé par PROFILE_TOKEN): /profile?seconds=30&mode=cpu&token=..."""
+    if not PROFILE_TOKEN:
+        return web.Response(text="Profilage HTTP désactivé (PROFILE_TOKEN non défini)", status=404)
+    token = request.headers.get('X-Profile-Token') or request.query.get('token')
+    if token != PROFILE_TOKEN:
+        return web.Response(text="Jeton invalide", status=403)
+    try:
+        seconds, mode = profiler.parse_request(request.query.get('seconds', 30), request.query.get('mode', 'cpu'))
+    except ValueError as e:
+        return web.Response(text=str(e), status=400)
+    if profiler.is_busy():
+        return web.Response(text="Un profilage est déjà en cours", status=409)
+
+    report = await profiler.run(seconds, mode)
+    filename = f"profile_{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    return web.Response(text=report, content_type='text/plain', charset='utf-8',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 async def create_web_server():
     """Create and start web server"""
     app = web.Application()
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
     app.router.add_get('/status', bot_status)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_get('/profile', profile_endpoint)
     
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
     await site.start()
-    print(f"✅ Serveur web démarré sur 0.0.0.0:{PORT}")
+    logger.info("✅ Serveur web démarré sur 0.0.0.0:%s", PORT)
     return runner
 
 # --- LANCEMENT ---
 async def main():
     """Main function to start the bot"""
+    global last_catchup
     print("Démarrage du bot Telegram...")
     print(f"API_ID: {API_ID}")
     print(f"Bot Token configuré: {'Oui' if BOT_TOKEN else 'Non'}")
@@ -1062,27 +1539,58 @@ async def main():
 
     # Validate configuration
     if not API_ID or not API_HASH or not BOT_TOKEN:
-        print("❌ Configuration manquante! Vérifiez votre fichier .env")
+        logger.error("❌ Configuration manquante! Vérifiez votre fichier .env")
         return
 
     try:
         # Start web server first
         web_runner = await create_web_server()
+
+        # Surveillance de la boucle (retard et appels bloquants)
+        asyncio.create_task(loop_monitor.run())
+
+        # File d'envoi Telegram (doit tourner avant toute diffusion)
+        asyncio.create_task(outbound.run())
         
         # Start the bot
         if await start_bot():
+            # Reprise des diffusions différées et des éditions en attente avant le redémarrage
+            restore_prediction_messages()
+            dispatch_queue.load()
+            outbox.load()
+            asyncio.create_task(outbox.run())
+
+            # Statuts '⌛' perdus au redémarrage: le rattrapage doit pouvoir les résoudre
+            restore_pending_predictions()
+
+            # Rattrapage des messages manqués avant de passer aux événements en direct
+            # (les mises à jour reçues entre-temps restent en file d'ingestion)
+            last_catchup = await run_catchup()
+            asyncio.create_task(dispatch_queue.run())
+
+            # Workers d'ingestion (une file ordonnée par canal source)
+            ingest.start()
+
+            # Rafraîchissement du cache d'entités en arrière-plan
+            asyncio.create_task(entities.run())
+
             print("✅ Bot en ligne et en attente de messages...")
             print(f"🌐 Accès web: http://0.0.0.0:{PORT}")
             await client.run_until_disconnected()
         else:
-            print("❌ Échec du démarrage du bot")
+            logger.error("❌ Échec du démarrage du bot")
 
     except KeyboardInterrupt:
-        print("\n🛑 Arrêt du bot demandé par l'utilisateur")
+        logger.info("🛑 Arrêt du bot demandé par l'utilisateur")
     except Exception as e:
-        print(f"❌ Erreur critique: {e}")
+        logger.error("❌ Erreur critique: %s", e)
         await handle_connection_error()
     finally:
+        checkpoints.flush()
+        tracer.stop()
+        if recorder is not None:
+            recorder.stop()
+        shutdown_logging()
         try:
             await client.disconnect()
             print("Bot déconnecté proprement")
@@ -0,0 +1,330 @@
+"""
+File d'envoi sortante vers Telegram avec limitation de débit
+Tous les envois (send_message) et éditions (edit_message) passent par une
+file unique: seaux à jetons par canal et global, prise en compte des
+FloodWaitError et priorité aux éditions de résultats sur les nouvelles diffusions.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple
+from telethon.errors import FloodWaitError, MessageNotModifiedError
+from log_setup import get_logger
+
+logger = get_logger('outbound')
+
+# Priorités (la plus petite passe en premier)
+PRIORITY_EDIT = 0
+PRIORITY_SEND = 1
+
+
+class TokenBucket:
+    """Seau à jetons avec blocage temporaire (FloodWait)"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate: Jetons ajoutés par seconde
+            capacity: Nombre maximum de jetons (rafale autorisée)
+            clock: Horloge monotone injectable
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def delay(self) -> float:
+        """Secondes avant qu'un jeton soit disponible (0 si disponible)"""
+        now = self.clock()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Consomme un jeton (appeler après delay() == 0)"""
+        self._refill(self.clock())
+        self.tokens -= 1
+
+    def block_for(self, seconds: float):
+        """Bloque le seau (FloodWait) et vide les jetons accumulés"""
+        now = self.clock()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+        self.updated_at = self.blocked_until
+
+
+class EditBuffer:
+    """
+    Tampon d'éditions par (chat_id, message_id): ne garde que le dernier texte
+    demandé pendant la fenêtre et ignore les éditions identiques au dernier envoi
+    """
+
+    def __init__(self, window: float = 1.0, max_entries: int = 2000):
+        """
+        Args:
+            window: Délai (secondes) pendant lequel les éditions successives sont fusionnées
+            max_entries: Nombre de messages dont le dernier texte envoyé est mémorisé
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self.pending: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+        self.last_sent: "OrderedDict[Tuple[Any, int], str]" = OrderedDict()
+        self.stats = {
+            "requested": 0,
+            "coalesced": 0,
+            "skipped_identical": 0,
+        }
+
+    def is_identical(self, key: Tuple[Any, int], text: str) -> bool:
+        """Vrai si le texte est celui déjà affiché par le message"""
+        return self.last_sent.get(key) == text
+
+    def remember(self, key: Tuple[Any, int], text: str):
+        """Mémorise le dernier texte envoyé pour un message (LRU borné)"""
+        self.last_sent[key] = text
+        self.last_sent.move_to_end(key)
+        while len(self.last_sent) > self.max_entries:
+            self.last_sent.popitem(last=False)
+
+
+class OutboundQueue:
+    """File sortante partagée par toutes les diffusions et éditions"""
+
+    def __init__(self, client, per_chat_rate: float = 20 / 60, per_chat_burst: float = 3,
+                 global_rate: float = 25, global_burst: float = 25, max_retries: int = 3,
+                 edit_window: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialise la file sortante
+
+        Args:
+            client: Client Telegram (ou tout objet exposant send_message/edit_message)
+            per_chat_rate: Messages par seconde autorisés par canal
+            per_chat_burst: Rafale autorisée par canal
+            global_rate: Messages par seconde autorisés tous canaux confondus
+            global_burst: Rafale globale autorisée
+            max_retries: Nombre de nouvelles tentatives après un FloodWait
+            edit_window: Fenêtre (secondes) de fusion des éditions d'un même message
+            clock: Horloge monotone injectable
+        """
+        self.client = client
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock)
+        self.chat_buckets: Dict[Any, TokenBucket] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._inflight = set()
+        self.edit_buffer = EditBuffer(edit_window)
+        self.is_running = False
+        self.stats = {
+            "sent": 0,
+            "edited": 0,
+            "errors": 0,
+            "retries": 0,
+            "flood_waits": 0,
+            "flood_wait_seconds": 0,
+        }
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst, self.clock)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def depth(self) -> int:
+        """Nombre d'appels en attente dans la file"""
+        return len(self._heap)
+
+    # === API PUBLIQUE (même signature que TelegramClient) ===
+    async def send_message(self, chat_id, message, **kwargs):
+        """Envoie un message via la file (priorité normale)"""
+        return await self.submit("send_message", chat_id, (chat_id, message), kwargs, PRIORITY_SEND)
+
+    async def edit_message(self, chat_id, message_id, text=None, **kwargs):
+        """
+        Édite un message via la file (prioritaire sur les nouvelles diffusions).
+        Les éditions d'un même message dans la fenêtre sont fusionnées (seul le
+        dernier texte est envoyé) et une édition identique au texte affiché est ignorée.
+        """
+        buffer = self.edit_buffer
+        buffer.stats["requested"] += 1
+        key = (chat_id, message_id)
+
+        pending = buffer.pending.get(key)
+        if pending is not None:
+            # Une édition de ce message attend encore: on remplace son texte
+            buffer.stats["coalesced"] += 1
+            pending["args"] = (chat_id, message_id, text)
+            pending["kwargs"] = kwargs
+            return await asyncio.shield(pending["future"])
+
+        if buffer.is_identical(key, text):
+            buffer.stats["skipped_identical"] += 1
+            return None
+
+        job = self._enqueue("edit_message", chat_id, (chat_id, message_id, text), kwargs, PRIORITY_EDIT,
+                            not_before=self.clock() + buffer.window)
+        buffer.pending[key] = job
+        return await job["future"]
+
+    def submit(self, method: str, chat_id, args: tuple, kwargs: dict, priority: int) -> asyncio.Future:
+        """Ajoute un appel à la file et retourne le futur de son résultat"""
+        return self._enqueue(method, chat_id, args, kwargs, priority)["future"]
+
+    def _enqueue(self, method: str, chat_id, args: tuple, kwargs: dict, priority: int,
+                 not_before: float = 0.0) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        job = {"method": method, "chat_id": chat_id, "args": args, "kwargs": kwargs,
+               "future": future, "attempts": 0, "not_before": not_before}
+        heapq.heappush(self._heap, (priority, next(self._seq), job))
+        self._wakeup.set()
+        return job
+
+    # === DISTRIBUTION ===
+    def _next_ready(self) -> tuple:
+        """
+        Retire le premier appel prêt par ordre de priorité.
+        Retourne (job, None) ou (None, délai avant le prochain appel prêt).
+        """
+        global_delay = self.global_bucket.delay()
+        if global_delay > 0:
+            return None, global_delay
+
+        now = self.clock()
+        min_delay = None
+        ready = None
+        blocked = []
+        chat_delays: Dict[Any, float] = {}
+        # Dépile par priorité; les appels bloqués (fenêtre d'édition, seau du canal) sont remis en file
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            job = entry[2]
+            chat_delay = chat_delays.get(job["chat_id"])
+            if chat_delay is None:
+                chat_delay = chat_delays[job["chat_id"]] = self._bucket(job["chat_id"]).delay()
+            delay = max(job["not_before"] - now, chat_delay)
+            if delay <= 0:
+                ready = job
+                break
+            blocked.append(entry)
+            min_delay = delay if min_delay is None else min(min_delay, delay)
+        for entry in blocked:
+            heapq.heappush(self._heap, entry)
+
+        if ready is None:
+            return None, min_delay
+        if ready["method"] == "edit_message":
+            # Édition partie: les suivantes créeront un nouvel appel
+            self.edit_buffer.pending.pop((ready["chat_id"], ready["args"][1]), None)
+        return ready, None
+
+    async def _execute(self, job: Dict[str, Any]):
+        """Exécute un appel; en cas de FloodWait, bloque le canal et le remet en file"""
+        future = job["future"]
+        try:
+            if job["method"] == "edit_message":
+                chat_id, message_id, text = job["args"]
+                if self.edit_buffer.is_identical((chat_id, message_id), text):
+                    # Le texte fusionné est déjà celui affiché
+                    self.edit_buffer.stats["skipped_identical"] += 1
+                    if not future.done():
+                        future.set_result(None)
+                    return
+                try:
+                    result = await self.client.edit_message(*job["args"], **job["kwargs"])
+                except MessageNotModifiedError:
+                    result = None
+                self.edit_buffer.remember((chat_id, message_id), text)
+                self.stats["edited"] += 1
+            else:
+                result = await getattr(self.client, job["method"])(*job["args"], **job["kwargs"])
+                self.stats["sent"] += 1
+                if job["method"] == "send_message" and getattr(result, "id", None) is not None:
+                    self.edit_buffer.remember((job["chat_id"], result.id), job["args"][1])
+            if not future.done():
+                future.set_result(result)
+        except FloodWaitError as e:
+            self.stats["flood_waits"] += 1
+            self.stats["flood_wait_seconds"] += e.seconds
+            self._bucket(job["chat_id"]).block_for(e.seconds)
+            logger.warning("⏳ FloodWait %ss sur %s (%s)", e.seconds, job['chat_id'], job['method'])
+            job["attempts"] += 1
+            if job["attempts"] <= self.max_retries:
+                self.stats["retries"] += 1
+                priority = PRIORITY_EDIT if job["method"] == "edit_message" else PRIORITY_SEND
+                if job["method"] == "edit_message":
+                    key = (job["chat_id"], job["args"][1])
+                    newer = self.edit_buffer.pending.get(key)
+                    if newer is not None:
+                        # Une édition plus récente attend déjà: elle remplace celle-ci
+                        newer["future"].add_done_callback(lambda f: self._chain(f, future))
+                        return
+                    self.edit_buffer.pending[key] = job
+                heapq.heappush(self._heap, (priority, next(self._seq), job))
+                self._wakeup.set()
+            elif not future.done():
+                self.stats["errors"] += 1
+                future.set_exception(e)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if not future.done():
+                future.set_exception(e)
+
+    @staticmethod
+    def _chain(source: asyncio.Future, target: asyncio.Future):
+        """Reporte le résultat d'un futur sur un autre"""
+        if target.done():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+    async def run(self):
+        """Boucle de distribution: respecte les seaux puis lance les appels en parallèle"""
+        logger.info("🚀 Démarrage de la file d'envoi Telegram")
+        self.is_running = True
+        while self.is_running:
+            try:
+                self._wakeup.clear()
+                job, delay = self._next_ready() if self._heap else (None, None)
+                if job is not None:
+                    self.global_bucket.take()
+                    self._bucket(job["chat_id"]).take()
+                    # Chaque appel est une tâche: un canal lent ne bloque pas les autres
+                    task = asyncio.create_task(self._execute(job))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                logger.error("❌ Erreur dans la file d'envoi: %s", e)
+                await asyncio.sleep(1)
+
+    def stop(self):
+        """Arrête la boucle de distribution"""
+        self.is_running = False
+        self._wakeup.set()
+        logger.info("🛑 File d'envoi arrêtée")
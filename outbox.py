@@ -0,0 +1,257 @@
+"""
+Boîte d'envoi persistante des changements de statut
+Chaque changement de statut d'une prédiction (jeu + statut) est enregistré
+avec une clé d'idempotence dans un fichier YAML, puis livré par un worker
+avec nouvelles tentatives espacées (backoff exponentiel). Une clé déjà livrée
+ou déjà en attente est ignorée: un statut ne donne lieu qu'à une seule édition,
+même après un redémarrage. Les clés d'un jeu sont oubliées quand une nouvelle
+prédiction est planifiée pour ce numéro (cycle suivant). Le message de secours
+(nouveau message) n'est envoyé qu'une fois, quand toutes les tentatives
+d'édition ont échoué. Les éditions de jeux différents sont livrées en parallèle.
+"""
+import asyncio
+import time
+import yaml
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from log_setup import get_logger
+
+logger = get_logger('outbox')
+
+
+class Outbox:
+    """File persistante et idempotente des éditions de statut"""
+
+    def __init__(self, deliver_callback: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 fallback_callback: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+                 outbox_file: str = "yaml_db/outbox.yaml",
+                 clock: Callable[[], float] = time.time,
+                 max_attempts: int = 6, base_delay: float = 2.0, max_delay: float = 300.0,
+                 delivered_size: int = 2000):
+        """
+        Args:
+            deliver_callback: Coroutine d'édition; lève une exception en cas d'échec
+            fallback_callback: Coroutine appelée une seule fois quand les tentatives sont épuisées
+            outbox_file: Fichier YAML de persistance
+            clock: Horloge injectable (secondes epoch)
+            max_attempts: Nombre de tentatives avant le message de secours
+            base_delay: Délai (secondes) avant la première nouvelle tentative
+            max_delay: Délai maximum entre deux tentatives
+            delivered_size: Nombre de clés livrées mémorisées pour l'idempotence
+        """
+        self.deliver_callback = deliver_callback
+        self.fallback_callback = fallback_callback
+        self.outbox_file = Path(outbox_file)
+        self.clock = clock
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delivered_size = delivered_size
+        self.entries: Dict[str, Dict[str, Any]] = {}  # clé → entrée en attente
+        self.delivered: "OrderedDict[str, str]" = OrderedDict()  # clé → mode de livraison
+        self._inflight: Dict[str, asyncio.Task] = {}  # clé → tentative en cours
+        self._dirty = False
+        self._wakeup = asyncio.Event()
+        self.is_running = False
+        self.stats = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "superseded": 0,
+            "delivered": 0,
+            "retries": 0,
+            "fallbacks": 0,
+            "abandoned": 0,
+            "forgotten": 0,
+        }
+
+    @staticmethod
+    def key(game_number: int, status: str) -> str:
+        """Clé d'idempotence d'un changement de statut"""
+        return f"{game_number}:{status}"
+
+    # === PERSISTANCE ===
+    def load(self) -> int:
+        """Recharge les éditions en attente et les clés déjà livrées"""
+        try:
+            if not self.outbox_file.exists():
+                return 0
+            with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {}
+            self.entries = {e["key"]: e for e in data.get("pending", [])}
+            self.delivered = OrderedDict((k, "restored") for k in data.get("delivered", []))
+            self._wakeup.set()
+            logger.info("✅ Boîte d'envoi rechargée: %s édition(s) en attente", len(self.entries))
+            return len(self.entries)
+        except Exception as e:
+            logger.error("❌ Erreur chargement boîte d'envoi: %s", e)
+            return 0
+
+    def save(self):
+        """Sauvegarde les éditions en attente et les clés livrées"""
+        try:
+            self.outbox_file.parent.mkdir(parents=True, exist_ok=True)
+            data = {"pending": self.list_pending(), "delivered": list(self.delivered)}
+            with open(self.outbox_file, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+        except Exception as e:
+            logger.error("❌ Erreur sauvegarde boîte d'envoi: %s", e)
+
+    # === GESTION DES ÉDITIONS ===
+    def enqueue(self, game_number: int, status: str, text: str, fallback: bool = True,
+                trace_id: Optional[str] = None) -> bool:
+        """
+        Enregistre un changement de statut à livrer.
+        Retourne False si ce statut a déjà été livré ou est déjà en attente.
+
+        Args:
+            fallback: Autoriser un nouveau message si l'édition reste impossible
+            trace_id: Trace du message de statistiques à l'origine du changement
+        """
+        key = self.key(game_number, status)
+        if key in self.delivered or key in self.entries:
+            self.stats["deduplicated"] += 1
+            return False
+
+        # Un statut plus récent du même jeu remplace celui encore en attente
+        for other_key, other in list(self.entries.items()):
+            if other["game_number"] == game_number:
+                del self.entries[other_key]
+                self.stats["superseded"] += 1
+
+        self.entries[key] = {
+            "key": key,
+            "game_number": game_number,
+            "status": status,
+            "text": text,
+            "fallback": fallback,
+            "attempts": 0,
+            "next_attempt_at": self.clock(),
+            "created_at": datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d %H:%M:%S"),
+            "last_error": None,
+            "trace_id": trace_id,
+        }
+        self.stats["enqueued"] += 1
+        self.save()
+        self._wakeup.set()
+        return True
+
+    def forget_game(self, game_number: int) -> int:
+        """
+        Oublie les clés livrées et les éditions en attente d'un numéro de jeu,
+        à appeler quand une nouvelle prédiction est planifiée pour ce numéro:
+        les statuts du cycle précédent ne doivent pas bloquer ceux de la nouvelle.
+        """
+        prefix = f"{game_number}:"
+        forgotten = [key for key in self.delivered if key.startswith(prefix)]
+        for key in forgotten:
+            del self.delivered[key]
+        for key in [key for key, entry in self.entries.items() if entry["game_number"] == game_number]:
+            del self.entries[key]
+            forgotten.append(key)
+        if forgotten:
+            self.stats["forgotten"] += len(forgotten)
+            self.save()
+        return len(forgotten)
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        """Éditions en attente triées par prochaine tentative"""
+        return sorted(self.entries.values(), key=lambda e: e["next_attempt_at"])
+
+    def _mark_delivered(self, entry: Dict[str, Any], mode: str):
+        if self.entries.get(entry["key"]) is not entry:
+            # Remplacée (statut plus récent) ou oubliée (nouvelle prédiction) pendant la tentative
+            return
+        del self.entries[entry["key"]]
+        self.delivered[entry["key"]] = mode
+        while len(self.delivered) > self.delivered_size:
+            self.delivered.popitem(last=False)
+
+    def backoff(self, attempts: int) -> float:
+        """Délai avant la tentative suivante"""
+        return min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+
+    async def _attempt(self, entry: Dict[str, Any]):
+        """Tente une livraison; replanifie ou passe au message de secours en cas d'échec"""
+        entry["attempts"] += 1
+        try:
+            await self.deliver_callback(entry)
+            self._mark_delivered(entry, "edit")
+            self.stats["delivered"] += 1
+            return
+        except Exception as e:
+            entry["last_error"] = str(e)
+
+        if entry["attempts"] < self.max_attempts:
+            self.stats["retries"] += 1
+            entry["next_attempt_at"] = self.clock() + self.backoff(entry["attempts"])
+            logger.warning("🔁 Édition #%s (%s) en échec, tentative %s/%s: %s",
+                           entry['game_number'], entry['status'], entry['attempts'], self.max_attempts,
+                           entry['last_error'])
+            return
+
+        if entry["fallback"] and self.fallback_callback is not None:
+            try:
+                await self.fallback_callback(entry)
+                self._mark_delivered(entry, "fallback")
+                self.stats["fallbacks"] += 1
+                logger.warning("⚠️ Édition #%s impossible, statut publié dans un nouveau message",
+                               entry['game_number'])
+                return
+            except Exception as e:
+                entry["last_error"] = str(e)
+        self._mark_delivered(entry, "abandoned")
+        self.stats["abandoned"] += 1
+        logger.error("❌ Édition #%s (%s) abandonnée: %s", entry['game_number'], entry['status'], entry['last_error'])
+
+    def seconds_until_next(self) -> Optional[float]:
+        """Délai avant la prochaine tentative hors tentatives en cours (None si rien à faire)"""
+        waiting = [e["next_attempt_at"] for key, e in self.entries.items() if key not in self._inflight]
+        if not waiting:
+            return None
+        return max(0.0, min(waiting) - self.clock())
+
+    def _attempt_done(self, key: str):
+        self._inflight.pop(key, None)
+        self._dirty = True
+        self._wakeup.set()
+
+    # === BOUCLE DE LIVRAISON ===
+    async def run(self):
+        """
+        Lance les éditions arrivées à échéance, chacune dans sa propre tâche:
+        une édition lente ou en échec ne retarde pas celles des autres jeux
+        (la file d'envoi applique ensuite les limites par canal)
+        """
+        logger.info("🚀 Démarrage de la boîte d'envoi")
+        self.is_running = True
+        while self.is_running:
+            try:
+                self._wakeup.clear()
+                if self._dirty:
+                    self._dirty = False
+                    self.save()
+                now = self.clock()
+                for entry in self.list_pending():
+                    if entry["next_attempt_at"] > now:
+                        break
+                    if entry["key"] in self._inflight:
+                        continue
+                    task = asyncio.create_task(self._attempt(entry))
+                    self._inflight[entry["key"]] = task
+                    task.add_done_callback(lambda _task, key=entry["key"]: self._attempt_done(key))
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.seconds_until_next())
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                logger.error("❌ Erreur dans la boîte d'envoi: %s", e)
+                await asyncio.sleep(5)
+
+    def stop(self):
+        """Arrête la boucle de livraison"""
+        self.is_running = False
+        self._wakeup.set()
+        logger.info("🛑 Boîte d'envoi arrêtée")
@@ -1,17 +1,90 @@
 import re
+import heapq
+import logging
 import random
 from typing import Tuple, Optional, List
+from log_setup import get_logger
+
+logger = get_logger('predictor')
+
+# Expressions compilées une fois (appelées plusieurs fois par message)
+GAME_NUMBER_RE = re.compile(r"#N\s*(\d+)\.?", re.IGNORECASE)
+GAME_NUMBER_ALT_RE = re.compile(r"jeu\s*#?\s*(\d+)", re.IGNORECASE)
+PARENTHESES_RE = re.compile(r"\(([^)]*)\)")
+
+
+class TriggerRule:
+    """
+    Paramètres de la règle de déclenchement et de vérification.
+    Les valeurs par défaut sont la règle en production: exactement 1 As dans le
+    premier groupe, aucun dans le deuxième, prédiction du jeu suivant, vérifiée
+    sur les offsets 0 à 3 par un résultat 2+2 cartes.
+    """
+
+    __slots__ = ('ace_count', 'trigger_group', 'block_other_group', 'distance', 'window', 'valid_cards')
+
+    def __init__(self, ace_count: int = 1, trigger_group: int = 0, block_other_group: bool = True,
+                 distance: int = 1, window: int = 3, valid_cards: Optional[Tuple[int, int]] = (2, 2)):
+        """
+        Args:
+            ace_count: Nombre exact d'As requis dans le groupe déclencheur
+            trigger_group: Groupe déclencheur (0 = premier, 1 = deuxième); ses symboles sont prédits
+            block_other_group: Ne pas prédire si l'autre groupe contient un As
+            distance: Jeu prédit = jeu déclencheur + distance
+            window: Offsets acceptés pour la vérification (0..window); expiration au-delà
+            valid_cards: Cartes requises (groupe 1, groupe 2) pour un résultat de vérification (None = toutes)
+        """
+        if trigger_group not in (0, 1):
+            raise ValueError("trigger_group doit valoir 0 ou 1")
+        if distance < 1:
+            raise ValueError("distance doit être au moins 1")
+        if not 0 <= window <= 9:
+            raise ValueError("window doit être entre 0 et 9")
+        self.ace_count = ace_count
+        self.trigger_group = trigger_group
+        self.block_other_group = block_other_group
+        self.distance = distance
+        self.window = window
+        self.valid_cards = tuple(valid_cards) if valid_cards is not None else None
+
+    @staticmethod
+    def status(offset: int) -> str:
+        """Statut de réussite pour un offset (✅0️⃣, ✅1️⃣...)"""
+        return f"✅{offset}\ufe0f\u20e3"
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def describe(self) -> str:
+        """Libellé court pour les tableaux de résultats"""
+        cards = "x".join(map(str, self.valid_cards)) if self.valid_cards else "toutes"
+        return (f"As={self.ace_count} g{self.trigger_group + 1}{' seul' if self.block_other_group else ''} "
+                f"+{self.distance} fenêtre={self.window} cartes={cards}")
+
+    def __repr__(self) -> str:
+        return f"TriggerRule({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TriggerRule) and self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.to_dict().values()))
+
 
 class CardPredictor:
     """Card game prediction engine with pattern matching and result verification"""
     
-    def __init__(self):
+    def __init__(self, rule: Optional[TriggerRule] = None):
+        self.rule = rule or TriggerRule()
         self.last_predictions = []  # Liste [(numéro, combinaison)]
         self.prediction_status = {}  # Statut des prédictions par numéro
         self.processed_messages = set()  # Pour éviter les doublons
         self.status_log = []  # Historique des statuts
         self.prediction_messages = {}  # Stockage des IDs de messages de prédiction
         self.pending_edit_messages = {}  # Messages en attente d'édition {game_number: message_content}
+        self.pending_heap = []  # Tas des numéros passés à '⌛' (expiration sans parcourir tous les statuts)
+        self._last_parsed = (None, None)  # (message, numéro): le même message est analysé par chaque étape
+        self._last_groups = (None, [])  # (message, groupes entre parenthèses), partagé avec les stratégies
         # Système de déclenchement basé sur les As (A) dans le premier groupe uniquement
         self.trigger_numbers = {7, 8}  # Numéros de fin qui déclenchent les prédictions
         
@@ -23,63 +96,61 @@ class CardPredictor:
         self.status_log.clear()
         self.prediction_messages.clear()
         self.pending_edit_messages.clear()
+        self.pending_heap.clear()
 
-        print("Données de prédiction réinitialisées")
+        logger.info("Données de prédiction réinitialisées")
 
     def extract_game_number(self, message: str) -> Optional[int]:
         """Extract game number from message using pattern #N followed by digits"""
+        last_message, last_number = self._last_parsed
+        if message is last_message:
+            return last_number
         try:
             # Look for patterns like "#N 123", "#N123", "#N60.", etc.
-            match = re.search(r"#N\s*(\d+)\.?", message, re.IGNORECASE)
+            match = GAME_NUMBER_RE.search(message)
             if match:
                 number = int(match.group(1))
-                print(f"Numéro de jeu extrait: {number}")
+                logger.debug("Numéro de jeu extrait: %s", number)
+                self._last_parsed = (message, number)
                 return number
             
             # Alternative pattern matching
-            match = re.search(r"jeu\s*#?\s*(\d+)", message, re.IGNORECASE)
+            match = GAME_NUMBER_ALT_RE.search(message)
             if match:
                 number = int(match.group(1))
-                print(f"Numéro de jeu alternatif extrait: {number}")
+                logger.debug("Numéro de jeu alternatif extrait: %s", number)
+                self._last_parsed = (message, number)
                 return number
                 
-            print(f"Aucun numéro de jeu trouvé dans: {message}")
+            logger.debug("Aucun numéro de jeu trouvé dans: %s", message)
+            self._last_parsed = (message, None)
             return None
         except (ValueError, AttributeError) as e:
-            print(f"Erreur extraction numéro: {e}")
+            logger.error("Erreur extraction numéro: %s", e)
             return None
 
     def extract_symbols_from_parentheses(self, message: str) -> List[str]:
-        """Extract content from parentheses in the message"""
+        """Extract content from parentheses in the message (liste partagée: ne pas la modifier)"""
+        last_message, last_groups = self._last_groups
+        if message is last_message:
+            return last_groups
         try:
-            return re.findall(r"\(([^)]*)\)", message)
+            groups = PARENTHESES_RE.findall(message)
         except Exception:
             return []
+        self._last_groups = (message, groups)
+        return groups
 
     def count_total_cards(self, symbols_str: str) -> int:
         """Count total card symbols in a string"""
-        # Compter d'abord les versions emoji, puis les versions simples
-        # pour éviter le double comptage
-        emoji_symbols = ['♠️', '♥️', '♦️', '♣️']
-        simple_symbols = ['♠', '♥', '♦', '♣']
-        
-        # Remplacer les emojis par des marqueurs temporaires pour éviter le double comptage
-        temp_str = symbols_str
-        emoji_count = 0
-        
-        for emoji in emoji_symbols:
-            count = temp_str.count(emoji)
-            emoji_count += count
-            # Remplacer par des marqueurs pour éviter le recomptage
-            temp_str = temp_str.replace(emoji, 'X')
-        
-        # Compter les symboles simples restants
-        simple_count = 0
-        for symbol in simple_symbols:
-            simple_count += temp_str.count(symbol)
-            
-        total = emoji_count + simple_count
-        print(f"Comptage cartes détaillé: emoji={emoji_count}, simple={simple_count}, total={total} dans '{symbols_str}'")
+        # Une version emoji (♠️) est le symbole simple suivi du sélecteur U+FE0F:
+        # compter les symboles simples compte chaque carte une seule fois
+        total = (symbols_str.count('♠') + symbols_str.count('♥')
+                 + symbols_str.count('♦') + symbols_str.count('♣'))
+        if logger.isEnabledFor(logging.DEBUG):
+            emoji_count = sum(symbols_str.count(emoji) for emoji in ('♠️', '♥️', '♦️', '♣️'))
+            logger.debug("Comptage cartes détaillé: emoji=%s, simple=%s, total=%s dans '%s'",
+                         emoji_count, total - emoji_count, total, symbols_str)
         return total
 
     def normalize_suits(self, suits_str: str) -> str:
@@ -108,51 +179,51 @@ class CardPredictor:
             # Extract symbols from parentheses first to check for Ace trigger
             matches = self.extract_symbols_from_parentheses(message)
             if len(matches) < 2:
-                print(f"❌ Pas assez de groupes de parenthèses (besoin de 2): {matches}")
+                logger.debug("❌ Pas assez de groupes de parenthèses (besoin de 2): %s", len(matches))
                 return False, None, None
 
-            first_group = matches[0]
-            second_group = matches[1]
+            rule = self.rule
+            first_group = matches[rule.trigger_group]
+            second_group = matches[1 - rule.trigger_group]
             
             # NOUVELLE LOGIQUE: Vérifier la présence d'As (A) dans les groupes
             ace_count_first = first_group.count('A')
             ace_count_second = second_group.count('A')
             
-            print(f"🎯 Analyse As: Premier groupe='{first_group}' (As: {ace_count_first}), Deuxième groupe='{second_group}' (As: {ace_count_second})")
+            logger.debug("🎯 Analyse As: Groupe déclencheur='%s' (As: %s), Autre groupe='%s' (As: %s)",
+                         first_group, ace_count_first, second_group, ace_count_second)
             
-            # RÈGLES DE DÉCLENCHEMENT STRICTES:
+            # RÈGLES DE DÉCLENCHEMENT STRICTES (règle par défaut):
             # 1. Prédire SEULEMENT si EXACTEMENT 1 As dans le PREMIER groupe
             # 2. NE PAS prédire si As dans le DEUXIÈME groupe  
             # 3. NE PAS prédire si 2 ou plus As dans le PREMIER groupe
-            if ace_count_first != 1:
-                if ace_count_first == 0:
-                    print(f"❌ Pas d'As dans le premier groupe, pas de prédiction")
-                else:
-                    print(f"❌ {ace_count_first} As détectés dans le premier groupe (il faut exactement 1), pas de prédiction")
+            if ace_count_first != rule.ace_count:
+                logger.debug("❌ %s As dans le groupe déclencheur (il faut exactement %s), pas de prédiction",
+                             ace_count_first, rule.ace_count)
                 return False, None, None
                 
-            if ace_count_second > 0:
-                print(f"❌ {ace_count_second} As détecté(s) dans le deuxième groupe, prédiction bloquée")
+            if rule.block_other_group and ace_count_second > 0:
+                logger.debug("❌ %s As détecté(s) dans l'autre groupe, prédiction bloquée", ace_count_second)
                 return False, None, None
             
-            print(f"✅ Condition As validée: EXACTEMENT 1 As dans premier groupe uniquement")
+            logger.debug("✅ Condition As validée: EXACTEMENT %s As dans le groupe déclencheur", rule.ace_count)
 
-            # Calculate predicted game number (jeu suivant)
-            predicted_game = game_number + 1
+            # Calculate predicted game number (jeu suivant par défaut)
+            predicted_game = game_number + rule.distance
             
             # ANTI-DOUBLON: Check if predicted game already has a prediction (any status)
             if predicted_game in self.prediction_status:
-                print(f"❌ Prédiction déjà existante pour le jeu #{predicted_game} (statut: {self.prediction_status[predicted_game]}), ignoré")
+                logger.debug("❌ Prédiction déjà existante pour le jeu #%s (statut: %s), ignoré", predicted_game, self.prediction_status[predicted_game])
                 return False, None, None
             
             # ANTI-DOUBLON: Double check from processed messages to avoid scheduler conflicts
             if f"auto_prediction_{predicted_game}" in self.processed_messages:
-                print(f"❌ Prédiction automatique déjà planifiée pour #{predicted_game}, ignoré")
+                logger.debug("❌ Prédiction automatique déjà planifiée pour #%s, ignoré", predicted_game)
                 return False, None, None
             
             # Check if current game already processed
             if game_number in self.processed_messages:
-                print(f"Jeu #{game_number} déjà traité, ignoré")
+                logger.debug("Jeu #%s déjà traité, ignoré", game_number)
                 return False, None, None
 
             # Get suits from first group
@@ -165,17 +236,24 @@ class CardPredictor:
             self.processed_messages.add(game_number)
             
             # Create prediction for target game
-            self.prediction_status[predicted_game] = '⌛'
+            self.mark_pending(predicted_game)
             self.last_predictions.append((predicted_game, suits))
             
-            print(f"✅ Prédiction créée: Jeu #{predicted_game} -> {suits} (déclenchée par #{game_number} avec As dans premier groupe)")
-            print(f"📊 Prédictions actives: {[k for k, v in self.prediction_status.items() if v == '⌛']}")
+            logger.info("✅ Prédiction créée: Jeu #%s -> %s (déclenchée par #%s avec As dans le groupe déclencheur)",
+                        predicted_game, suits, game_number)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📊 Prédictions actives: %s", [k for k, v in self.prediction_status.items() if v == '⌛'])
             return True, predicted_game, suits
 
         except Exception as e:
-            print(f"Erreur dans should_predict: {e}")
+            logger.error("Erreur dans should_predict: %s", e)
             return False, None, None
     
+    def mark_pending(self, game_number: int):
+        """Passe une prédiction à '⌛' et l'indexe pour l'expiration"""
+        self.prediction_status[game_number] = '⌛'
+        heapq.heappush(self.pending_heap, game_number)
+
     def store_prediction_message(self, game_number: int, message_id: int, chat_id: int):
         """Store prediction message ID for later editing"""
         self.prediction_messages[game_number] = {'message_id': message_id, 'chat_id': chat_id}
@@ -185,16 +263,21 @@ class CardPredictor:
         return self.prediction_messages.get(game_number)
         
     def check_expired_predictions(self, current_game_number: int) -> List[int]:
-        """Check for expired predictions (offset > 3) and mark them as failed"""
+        """Check for expired predictions (offset > window, 3 par défaut) and mark them as failed"""
         expired_predictions = []
+        window = self.rule.window
         
-        for pred_num, status in list(self.prediction_status.items()):
-            if status == '⌛' and current_game_number > pred_num + 3:  # Changé de 2 à 3
+        # Le tas donne les numéros en attente du plus petit au plus grand: on s'arrête
+        # au premier qui n'est pas encore expiré (les entrées déjà résolues sont écartées)
+        heap = self.pending_heap
+        while heap and current_game_number > heap[0] + window:  # Changé de 2 à 3
+            pred_num = heapq.heappop(heap)
+            if self.prediction_status.get(pred_num) == '⌛':
                 # Marquer comme échouée
                 self.prediction_status[pred_num] = '❌❌'
                 self.status_log.append((pred_num, '❌❌'))
                 expired_predictions.append(pred_num)
-                print(f"❌ Prédiction expirée: #{pred_num} marquée comme échouée (jeu actuel: #{current_game_number})")
+                logger.info("❌ Prédiction expirée: #%s marquée comme échouée (jeu actuel: #%s)", pred_num, current_game_number)
         
         return expired_predictions
         
@@ -204,13 +287,13 @@ class CardPredictor:
             if "⏰" in message or "🕐" in message:
                 game_number = self.extract_game_number(message)
                 if game_number:
-                    print(f"🔄 Message #{game_number} en cours d'édition détecté: ⏰ ou 🕐")
+                    logger.debug("🔄 Message #%s en cours d'édition détecté: ⏰ ou 🕐", game_number)
                     # Stocker le message en attente
                     self.pending_edit_messages[game_number] = message
                     return True, game_number
             return False, None
         except Exception as e:
-            print(f"Erreur dans is_pending_edit_message: {e}")
+            logger.error("Erreur dans is_pending_edit_message: %s", e)
             return False, None
     
     def process_final_edit_message(self, message: str) -> Tuple[bool, Optional[int], Optional[str]]:
@@ -219,7 +302,7 @@ class CardPredictor:
             if "🔰" in message or "✅" in message:
                 game_number = self.extract_game_number(message)
                 if game_number and game_number in self.pending_edit_messages:
-                    print(f"✅ Message #{game_number} finalisé avec 🔰 ou ✅")
+                    logger.debug("✅ Message #%s finalisé avec 🔰 ou ✅", game_number)
                     
                     # Supprimer de la liste d'attente
                     del self.pending_edit_messages[game_number]
@@ -229,7 +312,7 @@ class CardPredictor:
                     
             return False, None, None
         except Exception as e:
-            print(f"Erreur dans process_final_edit_message: {e}")
+            logger.error("Erreur dans process_final_edit_message: %s", e)
             return False, None, None
 
     def verify_prediction(self, message: str) -> Tuple[Optional[bool], Optional[int]]:
@@ -237,7 +320,7 @@ class CardPredictor:
         try:
             # NOUVELLE LOGIQUE: Ignorer complètement les messages ⏰ et 🕐 pour la vérification
             if "⏰" in message or "🕐" in message:
-                print(f"⏰/🕐 détecté dans le message - ignoré pour la vérification")
+                logger.debug("⏰/🕐 détecté dans le message - ignoré pour la vérification")
                 return None, None
 
             # Check for verification tags (uniquement messages normaux)
@@ -247,28 +330,29 @@ class CardPredictor:
             # Extract game number
             game_number = self.extract_game_number(message)
             if game_number is None:
-                print(f"Aucun numéro de jeu trouvé dans: {message}")
                 return None, None
 
-            print(f"Numéro de jeu du résultat: {game_number}")
+            logger.debug("Numéro de jeu du résultat: %s", game_number)
 
             # Extract symbol groups
             groups = self.extract_symbols_from_parentheses(message)
             if len(groups) < 2:
-                print(f"Groupes de symboles insuffisants: {groups}")
+                logger.debug("Groupes de symboles insuffisants: %s", len(groups))
                 return None, None
 
             first_group = groups[0]
             second_group = groups[1]
-            print(f"Groupes extraits: '{first_group}' et '{second_group}'")
+            logger.debug("Groupes extraits: '%s' et '%s'", first_group, second_group)
 
             def is_valid_result():
-                """Check if the result has valid card distribution (2+2)"""
+                """Check if the result has valid card distribution (2+2 par défaut)"""
+                if self.rule.valid_cards is None:
+                    return True
                 count1 = self.count_total_cards(first_group)
                 count2 = self.count_total_cards(second_group)
-                print(f"Comptage cartes: groupe1={count1}, groupe2={count2}")
-                is_valid = count1 == 2 and count2 == 2
-                print(f"Résultat valide (2+2): {is_valid}")
+                logger.debug("Comptage cartes: groupe1=%s, groupe2=%s", count1, count2)
+                is_valid = (count1, count2) == self.rule.valid_cards
+                logger.debug("Résultat valide (%s): %s", self.rule.valid_cards, is_valid)
                 return is_valid
 
             # Vérifier les prédictions en attente dans le bon ordre
@@ -278,40 +362,35 @@ class CardPredictor:
             
             # Vérifier d'abord si c'est un résultat valide (2+2 cartes)
             if not is_valid_result():
-                print(f"❌ Résultat invalide: pas exactement 2+2 cartes, ignoré pour vérification")
+                logger.debug("❌ Résultat invalide: pas exactement 2+2 cartes, ignoré pour vérification")
                 return None, None
             
-            for offset in range(4):  # Check 0, 1, 2, 3 offsets
+            for offset in range(self.rule.window + 1):  # Check 0, 1, 2, 3 offsets (par défaut)
                 predicted_number = game_number - offset
-                print(f"Vérification si le jeu #{game_number} correspond à la prédiction #{predicted_number} (offset {offset})")
+                logger.debug("Vérification si le jeu #%s correspond à la prédiction #%s (offset %s)", game_number, predicted_number, offset)
                 
                 if (predicted_number in self.prediction_status and 
                     self.prediction_status[predicted_number] == '⌛'):
-                    print(f"Prédiction en attente trouvée: #{predicted_number}")
+                    logger.debug("Prédiction en attente trouvée: #%s", predicted_number)
                     
                     # Success with offset indicator - résultat déjà validé comme 2+2
-                    if offset == 0:
-                        statut = '✅0️⃣'  # Perfect timing
-                    elif offset == 1:
-                        statut = '✅1️⃣'  # 1 game late
-                    elif offset == 2:
-                        statut = '✅2️⃣'  # 2 games late
-                    else:  # offset == 3
-                        statut = '✅3️⃣'  # 3 games late
+                    # (✅0️⃣ perfect timing, ✅1️⃣ 1 game late, ✅2️⃣ 2 games late...)
+                    statut = self.rule.status(offset)
                         
                     self.prediction_status[predicted_number] = statut
                     self.status_log.append((predicted_number, statut))
-                    print(f"✅ Prédiction réussie: #{predicted_number} validée par le jeu #{game_number} (offset {offset})")
+                    logger.info("✅ Prédiction réussie: #%s validée par le jeu #%s (offset %s)", predicted_number, game_number, offset)
                     return True, predicted_number
 
             # Si aucune prédiction trouvée dans les 3 offsets, ne pas marquer comme expirées ici
             # Les prédictions expirées seront traitées séparément
-            print(f"Aucune prédiction correspondante trouvée pour le jeu #{game_number}")
-            print(f"Prédictions actuelles en attente: {[k for k, v in self.prediction_status.items() if v == '⌛']}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Aucune prédiction correspondante trouvée pour le jeu #%s (en attente: %s)",
+                             game_number, [k for k, v in self.prediction_status.items() if v == '⌛'])
             return None, None
 
         except Exception as e:
-            print(f"Erreur dans verify_prediction: {e}")
+            logger.error("Erreur dans verify_prediction: %s", e)
             return None, None
 
     def get_statistics(self) -> dict:
@@ -340,7 +419,7 @@ class CardPredictor:
                 'win_rate': win_rate
             }
         except Exception as e:
-            print(f"Erreur dans get_statistics: {e}")
+            logger.error("Erreur dans get_statistics: %s", e)
             return {'total': 0, 'wins': 0, 'losses': 0, 'pending': 0, 'win_rate': 0.0}
 
     def get_recent_predictions(self, count: int = 10) -> List[Tuple[int, str]]:
@@ -352,5 +431,5 @@ class CardPredictor:
                 recent.append((game_num, suits, status))
             return recent
         except Exception as e:
-            print(f"Erreur dans get_recent_predictions: {e}")
+            logger.error("Erreur dans get_recent_predictions: %s", e)
             return []
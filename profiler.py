@@ -0,0 +1,97 @@
+"""
+Profilage à la demande du bot en production
+cProfile (CPU) ou tracemalloc (allocations) est activé sur la boucle pendant
+une fenêtre bornée, puis un rapport des N entrées principales est produit
+(envoyé comme document Telegram par /profile ou téléchargé via HTTP).
+Une seule session de profilage à la fois.
+"""
+import asyncio
+import cProfile
+import io
+import math
+import pstats
+import tracemalloc
+from datetime import datetime
+from typing import Tuple
+
+
+class Profiler:
+    """Sessions de profilage CPU / mémoire sur une fenêtre de temps"""
+
+    MODES = ('cpu', 'mem')
+
+    def __init__(self, max_seconds: float = 120.0, top: int = 40):
+        """
+        Args:
+            max_seconds: Durée maximale d'une session
+            top: Nombre d'entrées dans le rapport
+        """
+        self.max_seconds = max_seconds
+        self.top = top
+        self._lock = asyncio.Lock()
+        self.sessions = 0
+
+    def is_busy(self) -> bool:
+        """Vrai si une session est en cours"""
+        return self._lock.locked()
+
+    def parse_request(self, seconds, mode) -> Tuple[float, str]:
+        """Valide la durée et le mode demandés"""
+        seconds = float(seconds)
+        if not math.isfinite(seconds) or seconds < 1 or seconds > self.max_seconds:
+            raise ValueError(f"durée entre 1 et {self.max_seconds:.0f} secondes")
+        mode = (mode or 'cpu').lower()
+        if mode not in self.MODES:
+            raise ValueError(f"mode inconnu: {mode} (attendu: {', '.join(self.MODES)})")
+        return seconds, mode
+
+    async def run(self, seconds: float, mode: str = 'cpu') -> str:
+        """Profile la boucle pendant 'seconds' et retourne le rapport texte"""
+        seconds, mode = self.parse_request(seconds, mode)
+        if self.is_busy():
+            raise RuntimeError("une session de profilage est déjà en cours")
+        async with self._lock:
+            self.sessions += 1
+            started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"🔬 Profilage {mode} pendant {seconds:.0f}s")
+            if mode == 'cpu':
+                body = await self._profile_cpu(seconds)
+            else:
+                body = await self._profile_memory(seconds)
+            header = f"Profil {mode} - début {started} - durée {seconds:.0f}s - top {self.top}\n\n"
+            return header + body
+
+    async def _profile_cpu(self, seconds: float) -> str:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        out.write("\n--- Temps propre (tottime) ---\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        return out.getvalue()
+
+    async def _profile_memory(self, seconds: float) -> str:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(10)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+        lines = [f"Mémoire tracée: {current / 1024:.1f} Ko (pic {peak / 1024:.1f} Ko)", "",
+                 "--- Allocations nettes par ligne ---"]
+        for stat in after.compare_to(before, 'lineno')[:self.top]:
+            lines.append(str(stat))
+        lines += ["", "--- Allocations vivantes par ligne ---"]
+        for stat in after.statistics('lineno')[:self.top]:
+            lines.append(str(stat))
+        return "\n".join(lines) + "\n"
@@ -15,6 +15,8 @@ from telethon.events import ChatAction
 from dotenv import load_dotenv
 from predictor import CardPredictor
 from scheduler import PredictionScheduler
+from session_store import resolve_session_path, cleanup_orphan_sessions, StartupTimer
+from log_setup import configure_logging, shutdown_logging
 from yaml_database import init_yaml_database, yaml_db
 from aiohttp import web
 import threading
@@ -29,6 +31,8 @@ try:
     BOT_TOKEN = os.getenv('BOT_TOKEN') or ''
     ADMIN_ID = int(os.getenv('ADMIN_ID') or '0')
     PORT = int(os.getenv('PORT') or '10000')
+    SESSION_NAME = os.getenv('SESSION_NAME') or 'deployer50_session'
+    SESSION_DIR = os.getenv('SESSION_DIR') or None
     
     # Validation des variables requises
     if not API_ID or API_ID == 0:
@@ -44,6 +48,9 @@ except Exception as e:
     print("Vérifiez vos variables d'environnement")
     exit(1)
 
+# Journalisation asynchrone des modules partagés (session, planificateur)
+configure_logging(os.getenv('LOG_LEVEL') or 'INFO')
+
 # Variables d'état
 detected_stat_channel = None
 detected_display_channel = None
@@ -88,11 +95,21 @@ database = init_yaml_database()
 # Gestionnaire de prédictions
 predictor = CardPredictor()
 
-# Initialize Telegram client
-import time
-session_name = f'deployer50_session_{int(time.time())}'
+# Mesure du démarrage (lancement → connexion → première mise à jour reçue)
+startup_timer = StartupTimer()
+
+# Initialize Telegram client with a stable session (réutilisée entre les redémarrages)
+session_name = resolve_session_path(SESSION_NAME, SESSION_DIR)
+cleanup_orphan_sessions(session_name)
 client = TelegramClient(session_name, API_ID, API_HASH)
 
+@client.on(events.NewMessage())
+@client.on(events.MessageEdited())
+async def handle_messages(event):
+    """Messages du canal de statistiques: première mise à jour reçue après la connexion"""
+    if detected_stat_channel and event.chat_id == detected_stat_channel:
+        startup_timer.mark('first_update')
+
 # Serveur web pour monitoring Render.com
 async def health_check(request):
     """Health check endpoint"""
@@ -107,7 +124,8 @@ async def bot_status(request):
         "bot_online": True,
         "stat_channel": detected_stat_channel,
         "display_channel": detected_display_channel,
-        "verification_offsets": "0→✅0️⃣, 1→✅1️⃣, 2→✅2️⃣, 3→✅3️⃣, >3→❌❌"
+        "verification_offsets": "0→✅0️⃣, 1→✅1️⃣, 2→✅2️⃣, 3→✅3️⃣, >3→❌❌",
+        "startup_ms": startup_timer.report()
     }
     return web.json_response(status)
 
@@ -129,6 +147,7 @@ async def start_bot():
     """Start the bot with proper configuration"""
     try:
         await client.start(bot_token=BOT_TOKEN)
+        startup_timer.mark('connected')
         me = await client.get_me()
         print(f"Bot connecté: @{me.username}")
         
@@ -170,6 +189,7 @@ async def main():
     except Exception as e:
         print(f"❌ Erreur critique: {e}")
     finally:
+        shutdown_logging()
         try:
             await client.disconnect()
             print("Bot DEPLOYER50 déconnecté proprement")
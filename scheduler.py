@@ -1,15 +1,24 @@
 import random
 import asyncio
+import itertools
 import yaml
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Union
 from telethon import TelegramClient
+from yaml_database import YAML_LOAD_SECONDS, YAML_SAVE_SECONDS
+from log_setup import get_logger
+
+logger = get_logger('scheduler')
 
 class PredictionScheduler:
     """Système de planification automatique des prédictions"""
     
-    def __init__(self, client: TelegramClient, predictor, source_channel_id: int, target_channel_id: int):
+    def __init__(self, client: TelegramClient, predictor, source_channel_id: int,
+                 target_channel_id: Union[int, List[int]],
+                 clock: Optional[Callable[[], datetime]] = None,
+                 sleep: Optional[Callable[[float], Awaitable[None]]] = None,
+                 max_concurrent_sends: int = 5, outbound=None):
         """
         Initialise le planificateur
         
@@ -17,20 +26,36 @@ class PredictionScheduler:
             client: Client Telegram
             predictor: Instance du CardPredictor
             source_channel_id: ID du canal source pour vérification
-            target_channel_id: ID du canal cible pour diffusion
+            target_channel_id: ID (ou liste d'IDs) des canaux cibles pour diffusion
+            clock: Horloge injectable (défaut: datetime.now), utilisée par la simulation
+            sleep: Attente asynchrone injectable (défaut: asyncio.sleep)
+            max_concurrent_sends: Nombre maximum d'envois simultanés vers les canaux cibles
+            outbound: File d'envoi partagée (OutboundQueue); à défaut, le client est appelé directement
         """
         self.client = client
+        self.sender = outbound or client
         self.predictor = predictor
         self.source_channel_id = source_channel_id
-        self.target_channel_id = target_channel_id
+        if isinstance(target_channel_id, (list, tuple, set)):
+            self.target_channel_ids = [c for c in dict.fromkeys(target_channel_id) if c]
+        else:
+            self.target_channel_ids = [target_channel_id] if target_channel_id else []
+        # Canal principal (compatibilité: message_id/chat_id des données de planification)
+        self.target_channel_id = self.target_channel_ids[0] if self.target_channel_ids else target_channel_id
+        self.send_semaphore = asyncio.Semaphore(max(1, max_concurrent_sends))
+        self.launch_tasks: Dict[str, asyncio.Task] = {}
+        self.clock = clock or datetime.now
+        self.sleep = sleep or asyncio.sleep
         self.schedule_file = "prediction.yaml"
         self.is_running = False
         self.schedule_data = {}
+        self._slots = {}
+        self._slots_key = None
         
     def generate_next_prediction_time(self, current_time: Optional[datetime] = None) -> Dict[str, Any]:
         """Génère la prochaine prédiction avec lancement variable (1-4 min avant)"""
         if current_time is None:
-            current_time = datetime.now()
+            current_time = self.clock()
         
         # Ajouter un intervalle fixe pour la prochaine prédiction (ex: 1 heure)
         next_time = current_time + timedelta(hours=1)
@@ -61,7 +86,7 @@ class PredictionScheduler:
     def generate_daily_schedule(self) -> Dict[str, Any]:
         """Génère une planification avec heures de lancement variables"""
         planification = {}
-        current_time = datetime.now()
+        current_time = self.clock()
         
         # Générer des prédictions toutes les heures avec lancement variable
         num_predictions = 12  # 12 prédictions sur 12 heures
@@ -96,44 +121,61 @@ class PredictionScheduler:
                 "launch_offset": launch_offset_minutes
             }
         
-        print(f"✅ Planification avec lancement variable générée: {num_predictions} prédictions")
-        print(f"    Variations de lancement: 1-4 minutes avant chaque prédiction")
+        logger.info("✅ Planification avec lancement variable générée: %s prédictions", num_predictions)
+        logger.info("    Variations de lancement: 1-4 minutes avant chaque prédiction")
         return planification
     
     def save_schedule(self, schedule_data: Dict[str, Any]):
         """Sauvegarde la planification dans le fichier YAML"""
         try:
-            with open(self.schedule_file, "w", encoding='utf-8') as f:
-                yaml.dump(schedule_data, f, allow_unicode=True, default_flow_style=False)
-            print(f"✅ Planification sauvegardée dans {self.schedule_file}")
+            with YAML_SAVE_SECONDS.labels(os.path.basename(self.schedule_file)).time():
+                with open(self.schedule_file, "w", encoding='utf-8') as f:
+                    yaml.dump(schedule_data, f, allow_unicode=True, default_flow_style=False)
+            logger.debug("✅ Planification sauvegardée dans %s", self.schedule_file)
         except Exception as e:
-            print(f"❌ Erreur sauvegarde planification: {e}")
+            logger.error("❌ Erreur sauvegarde planification: %s", e)
     
     def load_schedule(self) -> Dict[str, Any]:
         """Charge la planification depuis le fichier YAML"""
         try:
             if os.path.exists(self.schedule_file):
-                with open(self.schedule_file, "r", encoding='utf-8') as f:
-                    data = yaml.safe_load(f) or {}
-                print(f"✅ Planification chargée: {len(data)} entrées")
+                with YAML_LOAD_SECONDS.labels(os.path.basename(self.schedule_file)).time():
+                    with open(self.schedule_file, "r", encoding='utf-8') as f:
+                        data = yaml.safe_load(f) or {}
+                logger.info("✅ Planification chargée: %s entrées", len(data))
                 return data
             else:
-                print("ℹ️ Aucune planification existante, génération d'une nouvelle")
+                logger.info("ℹ️ Aucune planification existante, génération d'une nouvelle")
                 return {}
         except Exception as e:
-            print(f"❌ Erreur chargement planification: {e}")
+            logger.error("❌ Erreur chargement planification: %s", e)
             return {}
     
     def get_current_time_slot(self) -> str:
         """Retourne le créneau horaire actuel au format HH:MM"""
-        now = datetime.now()
+        now = self.clock()
         return now.strftime("%H:%M")
     
+    def _launch_slots(self) -> Dict[str, list]:
+        """Index heure de lancement → numéros, reconstruit quand la planification change"""
+        data_id, indexed = self._slots_key or (None, 0)
+        size = len(self.schedule_data)
+        if data_id != id(self.schedule_data) or size < indexed:
+            self._slots = {}
+            indexed = 0
+        if size != indexed:
+            # Les entrées ne sont qu'ajoutées: seules les nouvelles sont indexées
+            for numero in itertools.islice(self.schedule_data, indexed, None):
+                self._slots.setdefault(self.schedule_data[numero]["heure_lancement"], []).append(numero)
+        self._slots_key = (id(self.schedule_data), size)
+        return self._slots
+    
     def get_pending_launches(self, current_time: str) -> list:
         """Retourne les prédictions à lancer pour l'heure actuelle"""
         pending = []
-        for numero, data in self.schedule_data.items():
-            if (data["heure_lancement"] == current_time and 
+        for numero in self._launch_slots().get(current_time, ()):
+            data = self.schedule_data.get(numero)
+            if (data and 
                 not data["launched"] and 
                 data["statut"] == "⌛"):
                 pending.append((numero, data))
@@ -157,11 +199,11 @@ class PredictionScheduler:
             self.schedule_data[numero] = new_prediction
             self.save_schedule(self.schedule_data)
             
-            print(f"✅ Nouvelle prédiction ajoutée: {numero} à {new_prediction['heure_lancement']}")
+            logger.info("✅ Nouvelle prédiction ajoutée: %s à %s", numero, new_prediction['heure_lancement'])
             return numero
             
         except Exception as e:
-            print(f"❌ Erreur ajout prédiction: {e}")
+            logger.error("❌ Erreur ajout prédiction: %s", e)
             return None
     
     def get_predictions_to_verify(self) -> list:
@@ -174,13 +216,23 @@ class PredictionScheduler:
                 to_verify.append((numero, data))
         return to_verify
     
+    async def _send_to_target(self, chat_id: int, text: str):
+        """Envoie un message vers un canal cible en respectant la limite de concurrence"""
+        async with self.send_semaphore:
+            return await self.sender.send_message(chat_id, text)
+    
+    async def _edit_target(self, chat_id: int, message_id: int, text: str):
+        """Édite un message d'un canal cible en respectant la limite de concurrence"""
+        async with self.send_semaphore:
+            return await self.sender.edit_message(chat_id, message_id, text)
+    
     async def launch_prediction(self, numero: str, data: Dict[str, Any]):
         """Lance une prédiction automatique selon le nouveau format"""
         try:
             # Vérifier les doublons avant de lancer
             game_number = int(numero.replace('N', ''))
             if game_number in self.predictor.prediction_status:
-                print(f"❌ Prédiction déjà existante pour {numero}, abandon du lancement automatique")
+                logger.info("❌ Prédiction déjà existante pour %s, abandon du lancement automatique", numero)
                 return False
             
             # Marquer comme prédiction automatique pour éviter les conflits
@@ -190,31 +242,57 @@ class PredictionScheduler:
             suit_prediction = self.generate_suit_prediction()
             
             # Message de prédiction automatique selon le nouveau format demandé
-            game_number = int(numero.replace('N', ''))
             prediction_text = f"🔵{game_number}— 3D🔵 statut :⌛"
             
-            # Envoie le message au canal cible
-            sent_message = await self.client.send_message(self.target_channel_id, prediction_text)
+            # Envoie le message à tous les canaux cibles en parallèle:
+            # un canal lent ou limité (FloodWait) ne retarde pas les autres
+            results = await asyncio.gather(
+                *(self._send_to_target(chat_id, prediction_text) for chat_id in self.target_channel_ids),
+                return_exceptions=True
+            )
+            
+            targets = []
+            for chat_id, result in zip(self.target_channel_ids, results):
+                if isinstance(result, BaseException):
+                    logger.error("❌ Erreur envoi %s vers %s: %s", numero, chat_id, result)
+                else:
+                    targets.append({"chat_id": chat_id, "message_id": result.id})
+            
+            if not targets:
+                logger.error("❌ Aucun canal cible n'a reçu la prédiction %s", numero)
+                return False
             
             # Met à jour les données
             data["launched"] = True
-            data["message_id"] = sent_message.id
-            data["chat_id"] = self.target_channel_id
+            data["launched_at"] = self.clock().strftime("%Y-%m-%d %H:%M:%S")
+            data["message_id"] = targets[0]["message_id"]
+            data["chat_id"] = targets[0]["chat_id"]
+            data["targets"] = targets
             data["prediction_format"] = suit_prediction
             
             # Ajouter à la prédiction status pour éviter les doublons
-            self.predictor.prediction_status[game_number] = '⌛'
+            self.predictor.mark_pending(game_number)
             
             # Sauvegarde
             self.save_schedule(self.schedule_data)
             
-            print(f"🚀 Prédiction automatique lancée: {numero} ({suit_prediction}) à {data['heure_lancement']}")
+            logger.info("🚀 Prédiction automatique lancée: %s (%s) à %s vers %s/%s canal(aux)",
+                        numero, suit_prediction, data['heure_lancement'], len(targets), len(self.target_channel_ids))
             return True
             
         except Exception as e:
-            print(f"❌ Erreur lancement prédiction {numero}: {e}")
+            logger.error("❌ Erreur lancement prédiction %s: %s", numero, e)
             return False
     
+    def start_launch(self, numero: str, data: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Démarre un lancement en tâche de fond (un seul lancement en cours par numéro)"""
+        if numero in self.launch_tasks:
+            return None
+        task = asyncio.create_task(self.launch_prediction(numero, data))
+        self.launch_tasks[numero] = task
+        task.add_done_callback(lambda _: self.launch_tasks.pop(numero, None))
+        return task
+    
     def generate_suit_prediction(self) -> str:
         """Génère une prédiction au format 2K/2K"""
         # Formats possibles pour les prédictions automatiques
@@ -234,7 +312,7 @@ class PredictionScheduler:
         3. Vérifie le numéro +2 (offset 2) → ✅2️⃣
         4. Sinon → 📌❌
         """
-        print(f"🔍 Vérification du statut pour {numero}")
+        logger.debug("🔍 Vérification du statut pour %s", numero)
         
         # Cette fonction sera appelée depuis le bot principal lors du traitement des messages
         # Elle ne fait plus de requêtes API directes mais utilise les messages reçus
@@ -243,19 +321,26 @@ class PredictionScheduler:
     async def update_prediction_message(self, numero: str, data: Dict[str, Any], new_status: str):
         """Met à jour le message de prédiction avec le nouveau statut"""
         try:
-            if data["message_id"] and data["chat_id"]:
-                # Message mis à jour selon le nouveau format demandé
-                game_number = int(numero.replace('N', ''))
-                new_text = f"🔵{game_number}— 3D🔵 statut :{new_status}"
-
-                await self.client.edit_message(
-                    data["chat_id"], 
-                    data["message_id"], 
-                    new_text
-                )
-                print(f"📝 Message automatique {numero} mis à jour: {new_status}")
+            targets = data.get("targets") or []
+            if not targets and data["message_id"] and data["chat_id"]:
+                targets = [{"chat_id": data["chat_id"], "message_id": data["message_id"]}]
+            if not targets:
+                return
+            
+            # Message mis à jour selon le nouveau format demandé
+            game_number = int(numero.replace('N', ''))
+            new_text = f"🔵{game_number}— 3D🔵 statut :{new_status}"
+            
+            results = await asyncio.gather(
+                *(self._edit_target(t["chat_id"], t["message_id"], new_text) for t in targets),
+                return_exceptions=True
+            )
+            for target, result in zip(targets, results):
+                if isinstance(result, BaseException):
+                    logger.error("❌ Erreur mise à jour message %s dans %s: %s", numero, target['chat_id'], result)
+            logger.info("📝 Message automatique %s mis à jour: %s", numero, new_status)
         except Exception as e:
-            print(f"❌ Erreur mise à jour message {numero}: {e}")
+            logger.error("❌ Erreur mise à jour message %s: %s", numero, e)
     
     def check_card_distribution(self, group1: str, group2: str) -> bool:
         """
@@ -284,7 +369,7 @@ class PredictionScheduler:
         count1 = count_cards(group1)
         count2 = count_cards(group2)
         
-        print(f"🃏 Comptage cartes: groupe1='{group1}'→{count1}, groupe2='{group2}'→{count2}")
+        logger.debug("🃏 Comptage cartes: groupe1='%s'→%s, groupe2='%s'→%s", group1, count1, group2, count2)
         return count1 == 2 and count2 == 2
     
     def verify_prediction_from_message(self, message_text: str, predicted_numbers: list) -> tuple:
@@ -303,12 +388,12 @@ class PredictionScheduler:
             return None, None
         
         current_number = int(match.group(1))
-        print(f"🔍 Message reçu pour #N{current_number}")
+        logger.debug("🔍 Message reçu pour #N%s", current_number)
         
         # Extrait les groupes de cartes entre parenthèses
         groups = re.findall(r"\(([^)]*)\)", message_text)
         if len(groups) < 2:
-            print(f"❌ Groupes insuffisants dans le message: {groups}")
+            logger.debug("❌ Groupes insuffisants dans le message: %s", len(groups))
             return None, None
         
         group1, group2 = groups[0], groups[1]
@@ -320,7 +405,7 @@ class PredictionScheduler:
                 target_number = predicted_num + offset
                 
                 if current_number == target_number:
-                    print(f"🎯 Correspondance trouvée: prédiction N{predicted_num:03d} vs message N{current_number} (offset {offset})")
+                    logger.debug("🎯 Correspondance trouvée: prédiction N%03d vs message N%s (offset %s)", predicted_num, current_number, offset)
                     
                     # Vérifie la distribution des cartes
                     if self.check_card_distribution(group1, group2):
@@ -332,18 +417,58 @@ class PredictionScheduler:
                         else:  # offset == 2
                             status = "✅2️⃣"
                         
-                        print(f"✅ Prédiction réussie N{predicted_num:03d}: {status}")
+                        logger.info("✅ Prédiction réussie N%03d: %s", predicted_num, status)
                         return predicted_num, status
                     else:
                         # Distribution incorrecte
-                        print(f"❌ Distribution incorrecte pour N{predicted_num:03d}")
+                        logger.info("❌ Distribution incorrecte pour N%03d", predicted_num)
                         return predicted_num, "📌❌"
         
         return None, None
     
+    async def process_result_message(self, message_text: str) -> Optional[str]:
+        """
+        Vérifie un message de résultat contre les prédictions automatiques lancées.
+        Retourne le numéro (ex: N0730) de la prédiction vérifiée, sinon None.
+        """
+        if not self.schedule_data:
+            return None
+        
+        # Récupère les numéros des prédictions automatiques en attente
+        # (numéro entier → clé de planification, ex: 730 → "N0730")
+        pending_auto_predictions = {}
+        for numero_str, data in self.schedule_data.items():
+            if data["launched"] and not data["verified"]:
+                pending_auto_predictions[int(numero_str.replace('N', ''))] = numero_str
+        
+        if not pending_auto_predictions:
+            return None
+        
+        predicted_num, status = self.verify_prediction_from_message(message_text, list(pending_auto_predictions))
+        if not (predicted_num and status):
+            return None
+        
+        numero_str = pending_auto_predictions[predicted_num]
+        
+        data = self.schedule_data[numero_str]
+        data["verified"] = True
+        data["statut"] = status
+        data["verified_at"] = self.clock().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Met à jour le message
+        await self.update_prediction_message(numero_str, data, status)
+        
+        # Ajouter une nouvelle prédiction pour maintenir la continuité
+        self.add_next_prediction()
+        
+        # Sauvegarde
+        self.save_schedule(self.schedule_data)
+        logger.info("📝 Prédiction automatique %s vérifiée: %s (nouvelle prédiction générée)", numero_str, status)
+        return numero_str
+    
     async def run_scheduler(self):
         """Boucle principale du planificateur"""
-        print("🚀 Démarrage du planificateur automatique")
+        logger.info("🚀 Démarrage du planificateur automatique")
         
         # Charge ou génère la planification
         self.schedule_data = self.load_schedule()
@@ -357,25 +482,26 @@ class PredictionScheduler:
             try:
                 current_time = self.get_current_time_slot()
                 
-                # Lance les prédictions en attente
+                # Lance les prédictions en attente en tâches de fond:
+                # plusieurs lancements de la même minute partent simultanément
                 pending_launches = self.get_pending_launches(current_time)
                 for numero, data in pending_launches:
-                    await self.launch_prediction(numero, data)
+                    self.start_launch(numero, data)
                 
                 # Les vérifications automatiques sont maintenant gérées 
                 # directement dans handle_messages() lors de la réception des messages
                 
                 # Attendre 30 secondes avant le prochain cycle
-                await asyncio.sleep(30)
+                await self.sleep(30)
                 
             except Exception as e:
-                print(f"❌ Erreur dans le planificateur: {e}")
-                await asyncio.sleep(60)  # Attendre plus longtemps en cas d'erreur
+                logger.error("❌ Erreur dans le planificateur: %s", e)
+                await self.sleep(60)  # Attendre plus longtemps en cas d'erreur
     
     def stop_scheduler(self):
         """Arrête le planificateur"""
         self.is_running = False
-        print("🛑 Planificateur arrêté")
+        logger.info("🛑 Planificateur arrêté")
     
     def get_schedule_status(self) -> Dict[str, Any]:
         """Retourne le statut actuel de la planification"""
@@ -408,7 +534,7 @@ class PredictionScheduler:
         """Régénère une nouvelle planification quotidienne"""
         self.schedule_data = self.generate_daily_schedule()
         self.save_schedule(self.schedule_data)
-        print("🔄 Nouvelle planification générée")
+        logger.info("🔄 Nouvelle planification générée")
 
 # Exemple d'utilisation
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+Session Telethon persistante
+Le nom de session est stable (configurable par SESSION_NAME) et le fichier
+SQLite est réutilisé d'un démarrage à l'autre: pas de nouvelle authentification
+complète à chaque boot et le cache d'entités de Telethon est conservé.
+Les anciens fichiers horodatés (bot_session_<timestamp>.session) sont supprimés.
+"""
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional, List
+from log_setup import get_logger
+
+logger = get_logger('session_store')
+
+# Moment du démarrage du processus (import du module)
+PROCESS_STARTED_AT = time.monotonic()
+
+# Anciennes sessions créées avec un horodatage dans le nom
+ORPHAN_SESSION_PATTERN = re.compile(r'^(bot|deployer50)_session_\d+\.session(-journal)?$')
+
+
+def resolve_session_path(session_name: str, session_dir: Optional[str] = None) -> str:
+    """
+    Retourne le chemin de session à passer à TelegramClient (sans l'extension .session)
+
+    Args:
+        session_name: Nom stable de la session (ex: 'bot_session') ou chemin complet
+        session_dir: Répertoire de stockage (créé si besoin)
+    """
+    path = Path(session_name)
+    if path.suffix == '.session':
+        path = path.with_suffix('')
+    if session_dir:
+        path = Path(session_dir) / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def cleanup_orphan_sessions(keep: str, directory: str = '.') -> List[str]:
+    """
+    Supprime les fichiers de session horodatés laissés par les anciens démarrages
+
+    Args:
+        keep: Chemin de la session utilisée (jamais supprimée)
+        directory: Répertoire à nettoyer
+
+    Returns:
+        Liste des fichiers supprimés
+    """
+    keep_file = Path(f"{keep}.session").resolve()
+    removed = []
+    try:
+        for candidate in Path(directory).iterdir():
+            if not ORPHAN_SESSION_PATTERN.match(candidate.name):
+                continue
+            if candidate.resolve() in (keep_file, Path(f"{keep_file}-journal")):
+                continue
+            try:
+                candidate.unlink()
+                removed.append(candidate.name)
+            except OSError as e:
+                logger.warning("⚠️ Impossible de supprimer la session orpheline %s: %s", candidate.name, e)
+    except Exception as e:
+        logger.error("❌ Erreur nettoyage des sessions: %s", e)
+    if removed:
+        logger.info("🧹 %s session(s) orpheline(s) supprimée(s)", len(removed))
+    return removed
+
+
+class StartupTimer:
+    """Mesure les étapes du démarrage depuis le lancement du processus"""
+
+    def __init__(self, started_at: float = PROCESS_STARTED_AT):
+        self.started_at = started_at
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, step: str) -> bool:
+        """Enregistre une étape (seulement la première fois); retourne True si nouvelle"""
+        if step in self.marks:
+            return False
+        self.marks[step] = (time.monotonic() - self.started_at) * 1000
+        logger.info("⏱️ Démarrage: %s après %.0f ms", step, self.marks[step])
+        return True
+
+    def report(self) -> Dict[str, float]:
+        """Durées (ms) depuis le lancement du processus pour chaque étape"""
+        return {step: round(ms, 1) for step, ms in self.marks.items()}
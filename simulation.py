@@ -0,0 +1,256 @@
+"""
+Simulation accélérée du planificateur de prédictions
+Rejoue 24 heures ou 30 jours de planification en quelques secondes grâce à
+une horloge virtuelle et un faux client Telegram, puis produit un rapport
+de précision des heures de lancement.
+
+Usage:
+    python simulation.py --hours 24
+    python simulation.py --days 30 --seed 42
+"""
+import argparse
+import asyncio
+import contextlib
+import heapq
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from predictor import CardPredictor
+from scheduler import PredictionScheduler
+from log_setup import configure_logging
+
+
+class VirtualClock:
+    """Horloge virtuelle: sleep() avance le temps instantanément"""
+
+    def __init__(self, start: Optional[datetime] = None):
+        self.current = start or datetime.now().replace(microsecond=0)
+        self.hooks: List[Callable[[datetime], Any]] = []
+        # Tâches à terminer avant d'avancer le temps (lancements en cours)
+        self.pending_tasks: Callable[[], List[asyncio.Task]] = list
+
+    def now(self) -> datetime:
+        """Retourne l'heure virtuelle courante"""
+        return self.current
+
+    async def sleep(self, seconds: float):
+        """Avance l'horloge puis exécute les hooks (messages simulés, arrêt...)"""
+        tasks = self.pending_tasks()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.current += timedelta(seconds=seconds)
+        for hook in list(self.hooks):
+            result = hook(self.current)
+            if asyncio.iscoroutine(result):
+                await result
+        # Rend la main à la boucle sans attente réelle
+        await asyncio.sleep(0)
+
+
+class FakeTelegramClient:
+    """Faux client Telegram qui enregistre les envois et éditions"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.sent: List[Dict[str, Any]] = []
+        self.edits: List[Dict[str, Any]] = []
+        self._next_id = 1
+
+    async def send_message(self, chat_id: int, text: str):
+        message = SimpleNamespace(id=self._next_id, chat_id=chat_id, message=text)
+        self._next_id += 1
+        self.sent.append({"chat_id": chat_id, "message_id": message.id, "text": text, "at": self.clock.now()})
+        return message
+
+    async def edit_message(self, chat_id: int, message_id: int, text: str):
+        self.edits.append({"chat_id": chat_id, "message_id": message_id, "text": text, "at": self.clock.now()})
+        return SimpleNamespace(id=message_id, chat_id=chat_id, message=text)
+
+
+class SchedulerSimulation:
+    """Pilote PredictionScheduler en temps virtuel et collecte les mesures"""
+
+    SOURCE_CHANNEL = -1000000000001
+    TARGET_CHANNEL = -1000000000002
+
+    def __init__(self, duration: timedelta, seed: Optional[int] = None,
+                 start: Optional[datetime] = None, max_result_delay: int = 2, targets: int = 1):
+        """
+        Args:
+            duration: Durée virtuelle à simuler
+            seed: Graine aléatoire pour un rejeu déterministe
+            start: Heure virtuelle de départ
+            max_result_delay: Décalage maximum (en jeux) du résultat simulé
+            targets: Nombre de canaux cibles simulés
+        """
+        self.duration = duration
+        self.rng = random.Random(seed)
+        if seed is not None:
+            # Les offsets de lancement (1-4 min) utilisent le module random
+            random.seed(seed)
+        self.clock = VirtualClock(start)
+        self.start = self.clock.now()
+        self.end = self.start + duration
+        self.client = FakeTelegramClient(self.clock)
+        self.predictor = CardPredictor()
+        self.max_result_delay = max_result_delay
+        self._workdir = tempfile.TemporaryDirectory(prefix="scheduler_sim_")
+
+        self.scheduler = PredictionScheduler(
+            self.client, self.predictor, self.SOURCE_CHANNEL,
+            [self.TARGET_CHANNEL - i for i in range(max(1, targets))],
+            clock=self.clock.now, sleep=self.clock.sleep
+        )
+        self.scheduler.schedule_file = os.path.join(self._workdir.name, "prediction.yaml")
+        # La sérialisation YAML complète à chaque lancement domine le temps de
+        # simulation: on compte les sauvegardes sans écrire le fichier
+        self.saves = 0
+        self.scheduler.save_schedule = self._count_save
+
+        # Messages de résultat à injecter, triés par heure: [(heure, texte)]
+        self.pending_results: List[tuple] = []
+        self._launch_prediction = self.scheduler.launch_prediction
+        self.scheduler.launch_prediction = self._launch_and_plan_result
+        self.results_emitted = 0
+        self.clock.hooks.append(self._on_tick)
+        self.clock.pending_tasks = lambda: list(self.scheduler.launch_tasks.values())
+
+    def _count_save(self, schedule_data: Dict[str, Any]):
+        self.saves += 1
+
+    def _result_message(self, game_number: int) -> str:
+        """Construit un message de résultat valide (2+2 cartes)"""
+        return f"#N{game_number}. ✅ 3(A♠️K♥️) - 5(9♦️4♣️)"
+
+    async def _launch_and_plan_result(self, numero: str, data: Dict[str, Any]) -> bool:
+        """Lance via le planificateur puis planifie le résultat simulé du jeu"""
+        launched = await self._launch_prediction(numero, data)
+        if launched:
+            now = self.clock.now()
+            game_number = int(numero.replace('N', ''))
+            delay = self.rng.randint(0, self.max_result_delay)
+            hour, minute = map(int, data["heure_prediction"].split(":"))
+            due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if due < now - timedelta(hours=12):
+                due += timedelta(days=1)
+            heapq.heappush(self.pending_results, (due + timedelta(minutes=delay), self._result_message(game_number + delay)))
+        return launched
+
+    async def _on_tick(self, now: datetime):
+        """Hook de l'horloge: injecte les résultats échus et arrête en fin de simulation"""
+        while self.pending_results and self.pending_results[0][0] <= now:
+            _, text = heapq.heappop(self.pending_results)
+            await self.process_message(text)
+        if now >= self.end:
+            self.scheduler.stop_scheduler()
+
+    async def process_message(self, message_text: str):
+        """Même chemin de vérification que handle_messages (sans diffusion)"""
+        self.results_emitted += 1
+        self.predictor.verify_prediction(message_text)
+        game_number = self.predictor.extract_game_number(message_text)
+        if game_number:
+            self.predictor.check_expired_predictions(game_number)
+        await self.scheduler.process_result_message(message_text)
+
+    async def run(self, verbose: bool = False) -> Dict[str, Any]:
+        """Exécute la simulation et retourne le rapport"""
+        wall_start = time.perf_counter()
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            await self.scheduler.run_scheduler()
+        wall_seconds = time.perf_counter() - wall_start
+        return self.build_report(wall_seconds)
+
+    def build_report(self, wall_seconds: float) -> Dict[str, Any]:
+        """Calcule la précision des lancements par rapport à l'heure planifiée"""
+        lateness = []
+        launched = 0
+        missed = []
+        for numero, data in self.scheduler.schedule_data.items():
+            generated_at = datetime.strptime(data["generated_at"], "%Y-%m-%d %H:%M:%S")
+            hour, minute = map(int, data["heure_lancement"].split(":"))
+            planned = generated_at.replace(hour=hour, minute=minute, second=0)
+            while planned < generated_at.replace(second=0):
+                planned += timedelta(days=1)
+
+            if data.get("launched") and data.get("launched_at"):
+                launched += 1
+                actual = datetime.strptime(data["launched_at"], "%Y-%m-%d %H:%M:%S")
+                lateness.append((actual - planned).total_seconds())
+            elif planned < self.end:
+                missed.append(numero)
+
+        lateness.sort()
+        statuses: Dict[str, int] = {}
+        for data in self.scheduler.schedule_data.values():
+            if data.get("verified"):
+                statuses[data["statut"]] = statuses.get(data["statut"], 0) + 1
+
+        def percentile(p: float) -> float:
+            if not lateness:
+                return 0.0
+            return lateness[min(len(lateness) - 1, int(p * len(lateness)))]
+
+        virtual_seconds = (self.clock.now() - self.start).total_seconds()
+        return {
+            "virtual_hours": virtual_seconds / 3600,
+            "wall_seconds": wall_seconds,
+            "speedup": virtual_seconds / wall_seconds if wall_seconds else 0.0,
+            "planned": len(self.scheduler.schedule_data),
+            "launched": launched,
+            "missed": len(missed),
+            "missed_numbers": missed,
+            "messages_sent": len(self.client.sent),
+            "messages_edited": len(self.client.edits),
+            "schedule_saves": self.saves,
+            "results_emitted": self.results_emitted,
+            "verified": sum(statuses.values()),
+            "statuses": statuses,
+            "lateness_mean": sum(lateness) / len(lateness) if lateness else 0.0,
+            "lateness_p50": percentile(0.50),
+            "lateness_p95": percentile(0.95),
+            "lateness_max": lateness[-1] if lateness else 0.0,
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formate le rapport de précision pour l'affichage"""
+    statuses = ", ".join(f"{k}: {v}" for k, v in sorted(report["statuses"].items())) or "aucun"
+    return f"""📊 Rapport de simulation du planificateur
+⏱️ Durée virtuelle: {report['virtual_hours']:.1f} h en {report['wall_seconds']:.2f} s (x{report['speedup']:.0f})
+📋 Prédictions planifiées: {report['planned']}
+🚀 Lancées: {report['launched']} | Manquées: {report['missed']}
+📨 Messages envoyés: {report['messages_sent']} | édités: {report['messages_edited']} | sauvegardes: {report['schedule_saves']}
+🎯 Résultats injectés: {report['results_emitted']} | Vérifiées: {report['verified']} ({statuses})
+🕐 Retard de lancement (s): moyenne={report['lateness_mean']:.1f}, p50={report['lateness_p50']:.0f}, p95={report['lateness_p95']:.0f}, max={report['lateness_max']:.0f}"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation accélérée du planificateur de prédictions")
+    parser.add_argument("--hours", type=float, default=0, help="Durée virtuelle en heures")
+    parser.add_argument("--days", type=float, default=0, help="Durée virtuelle en jours")
+    parser.add_argument("--seed", type=int, default=None, help="Graine aléatoire")
+    parser.add_argument("--targets", type=int, default=1, help="Nombre de canaux cibles simulés")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les logs du planificateur")
+    args = parser.parse_args()
+
+    if args.verbose:
+        configure_logging('DEBUG')
+
+    duration = timedelta(hours=args.hours, days=args.days) or timedelta(hours=24)
+    simulation = SchedulerSimulation(duration, seed=args.seed, targets=args.targets)
+    report = asyncio.run(simulation.run(verbose=args.verbose))
+    print(format_report(report))
+    if report["missed_numbers"]:
+        print(f"⚠️ Lancements manqués: {', '.join(report['missed_numbers'][:20])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Stratégies de prédiction évaluées en parallèle sur le flux en direct
+Chaque message du canal de statistiques est analysé une seule fois
+(numéro de jeu, marqueurs, As et cartes par groupe); chaque stratégie
+enregistrée (une TriggerRule nommée) fait avancer son propre état à partir
+de cette analyse, avec les mêmes décisions que CardPredictor.
+Seule la stratégie principale publie sur Telegram (via le CardPredictor du
+bot): ses compteurs sont alimentés par les décisions de ce prédicteur, qui
+partage aussi son analyse du message; les autres suivent leurs performances
+en ombre.
+"""
+import heapq
+from typing import Dict, Any, List, Optional, Tuple
+from predictor import CardPredictor, TriggerRule
+from metrics import Counter, Gauge
+
+# Indicateurs par message
+F_PENDING = 1      # ⏰ ou 🕐 (message en cours d'édition)
+F_FINAL = 2        # 🔰 ou ✅ (édition finale)
+F_VERIFY = 4       # ✅, 🔰, ❌ ou ⭕ (résultat vérifiable)
+F_TWO_GROUPS = 8   # Au moins deux groupes entre parenthèses
+F_SUITS_1 = 16     # Symboles de cartes dans le premier groupe
+F_SUITS_2 = 32     # Symboles de cartes dans le deuxième groupe
+
+NO_GAME = -1
+
+# (numéro de jeu ou NO_GAME, indicateurs, (As g1, As g2), (cartes g1, cartes g2))
+ParsedMessage = Tuple[int, int, Tuple[int, int], Tuple[int, int]]
+
+STRATEGY_RESULTS = Counter('strategy_results_total', "Résultats des prédictions par stratégie",
+                           ('strategy', 'result'))
+STRATEGY_WIN_RATE = Gauge('strategy_win_rate_percent', "Taux de réussite par stratégie", ('strategy',))
+
+WAITING = -1  # Statut '⌛' (sinon offset de réussite)
+EXPIRED = -2  # Statut '❌❌'
+
+
+def parse_message(parser: CardPredictor, text: str) -> ParsedMessage:
+    """Analyse unique d'un message avec les fonctions de CardPredictor"""
+    game_number = parser.extract_game_number(text)
+    flags = 0
+    if "⏰" in text or "🕐" in text:
+        flags |= F_PENDING
+    if "🔰" in text or "✅" in text:
+        flags |= F_FINAL
+    if flags & F_FINAL or "❌" in text or "⭕" in text:
+        flags |= F_VERIFY
+    groups = parser.extract_symbols_from_parentheses(text)
+    aces = (0, 0)
+    cards = (0, 0)
+    if len(groups) >= 2:
+        flags |= F_TWO_GROUPS
+        first, second = groups[0], groups[1]
+        aces = (min(255, first.count('A')), min(255, second.count('A')))
+        cards = (min(255, parser.count_total_cards(first)), min(255, parser.count_total_cards(second)))
+        if parser.normalize_suits(first):
+            flags |= F_SUITS_1
+        if parser.normalize_suits(second):
+            flags |= F_SUITS_2
+    return (NO_GAME if game_number is None else game_number), flags, aces, cards
+
+
+class ShadowPredictor:
+    """État d'une stratégie (statuts, jeux traités, éditions en attente) et ses compteurs"""
+
+    __slots__ = ('rule', 'status', 'processed', 'pending_edit', 'heap', 'trigger_mask',
+                 'predictions', 'wins', 'losses', 'offsets')
+
+    def __init__(self, rule: TriggerRule):
+        self.rule = rule
+        self.trigger_mask = F_TWO_GROUPS | (F_SUITS_1 if rule.trigger_group == 0 else F_SUITS_2)
+        self.reset()
+
+    def reset(self):
+        self.status: Dict[int, int] = {}
+        self.processed = set()
+        self.pending_edit = set()
+        self.heap: List[int] = []
+        self.predictions = 0
+        self.wins = 0
+        self.losses = 0
+        self.offsets = [0] * (self.rule.window + 1)
+
+    def record(self, predicted: bool, offset: Optional[int], expired: int):
+        """Compteurs alimentés de l'extérieur (stratégie principale: décisions du prédicteur qui publie)"""
+        if predicted:
+            self.predictions += 1
+        if offset is not None:
+            self.offsets[offset] += 1
+            self.wins += 1
+        self.losses += expired
+
+    def step(self, parsed: ParsedMessage, allow_trigger: bool = True) -> Optional[int]:
+        """
+        Applique un message analysé (même enchaînement que process_stat_update,
+        égalité avec CardPredictor vérifiée par tests/test_strategies.py).
+        Retourne le numéro prédit si la stratégie aurait publié une prédiction.
+        """
+        game, flag, aces, cards = parsed
+        rule = self.rule
+        if flag & F_PENDING:
+            if game > 0:
+                self.pending_edit.add(game)
+                return None
+        elif flag & F_FINAL and game > 0:
+            self.pending_edit.discard(game)
+
+        predicted = None
+        trigger_mask = self.trigger_mask
+        if allow_trigger and game >= 0 and flag & trigger_mask == trigger_mask \
+                and aces[rule.trigger_group] == rule.ace_count \
+                and not (rule.block_other_group and aces[1 - rule.trigger_group]):
+            target = game + rule.distance
+            if target not in self.status and game not in self.processed:
+                self.processed.add(game)
+                self.status[target] = WAITING
+                heapq.heappush(self.heap, target)
+                self.predictions += 1
+                predicted = target
+
+        if game >= 0 and flag & (F_VERIFY | F_TWO_GROUPS) == F_VERIFY | F_TWO_GROUPS \
+                and not flag & F_PENDING and (rule.valid_cards is None or cards == rule.valid_cards):
+            for offset in range(rule.window + 1):
+                if self.status.get(game - offset) == WAITING:
+                    self.status[game - offset] = offset
+                    self.offsets[offset] += 1
+                    self.wins += 1
+                    break
+
+        if game > 0:
+            heap = self.heap
+            while heap and game > heap[0] + rule.window:
+                number = heapq.heappop(heap)
+                if self.status.get(number) == WAITING:
+                    self.status[number] = EXPIRED
+                    self.losses += 1
+        return predicted
+
+    @property
+    def win_rate(self) -> float:
+        resolved = self.wins + self.losses
+        return self.wins / resolved * 100 if resolved else 0.0
+
+    def get_stats(self, pending: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "predictions": self.predictions,
+            "wins": self.wins,
+            "losses": self.losses,
+            "pending": sum(1 for value in self.status.values() if value == WAITING) if pending is None else pending,
+            "win_rate": round(self.win_rate, 2),
+            "offsets": list(self.offsets),
+        }
+
+
+class StrategyRegistry:
+    """Stratégies nommées évaluées sur chaque message avec une analyse partagée"""
+
+    def __init__(self, publisher: Optional[CardPredictor] = None):
+        """
+        Args:
+            publisher: Prédicteur qui publie: son analyse du message (mémorisée) est réutilisée
+                et ses décisions alimentent la stratégie principale via record_primary.
+                Sans prédicteur, toutes les stratégies sont simulées avec un analyseur neuf.
+        """
+        self.publisher = publisher
+        self.parser = publisher or CardPredictor()
+        self.strategies: Dict[str, ShadowPredictor] = {}
+        self.primary: Optional[str] = None
+        self.messages = 0
+
+    def register(self, name: str, rule: TriggerRule, primary: bool = False) -> ShadowPredictor:
+        """Ajoute (ou remplace) une stratégie; la première enregistrée est principale par défaut"""
+        strategy = ShadowPredictor(rule)
+        self.strategies[name] = strategy
+        if primary or self.primary is None:
+            self.primary = name
+        STRATEGY_RESULTS.labels(name, 'prediction').set_function(lambda: strategy.predictions)
+        STRATEGY_RESULTS.labels(name, 'win').set_function(lambda: strategy.wins)
+        STRATEGY_RESULTS.labels(name, 'loss').set_function(lambda: strategy.losses)
+        STRATEGY_WIN_RATE.labels(name).set_function(lambda: strategy.win_rate)
+        return strategy
+
+    @property
+    def primary_rule(self) -> TriggerRule:
+        """Règle de la stratégie qui publie (règle en production si aucune n'est enregistrée)"""
+        return self.strategies[self.primary].rule if self.primary else TriggerRule()
+
+    def process(self, text: str, allow_trigger: bool = True) -> Dict[str, int]:
+        """
+        Analyse le message une fois et fait avancer toutes les stratégies.
+        Retourne {stratégie: numéro prédit} pour celles qui auraient publié.
+        """
+        self.messages += 1
+        parsed = parse_message(self.parser, text)
+        predicted = {}
+        skip = self.primary if self.publisher is not None else None
+        for name, strategy in self.strategies.items():
+            if name == skip:
+                continue  # Décisions déjà prises par le prédicteur qui publie
+            number = strategy.step(parsed, allow_trigger)
+            if number is not None:
+                predicted[name] = number
+        return predicted
+
+    def record_primary(self, predicted: bool, status: Optional[str], expired: int):
+        """
+        Résultats du prédicteur qui publie pour le message traité
+        (prédiction créée, statut de réussite attribué, prédictions expirées)
+        """
+        strategy = self.strategies.get(self.primary) if self.publisher is not None else None
+        if strategy is None:
+            return
+        offset = None
+        if status is not None:
+            offsets = {strategy.rule.status(o): o for o in range(strategy.rule.window + 1)}
+            offset = offsets.get(status)
+        strategy.record(predicted, offset, expired)
+
+    def reset(self):
+        """Remet toutes les stratégies à zéro (/reset)"""
+        for strategy in self.strategies.values():
+            strategy.reset()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques par stratégie, de la meilleure à la moins bonne"""
+        ranked = sorted(self.strategies.items(), key=lambda item: item[1].win_rate, reverse=True)
+        stats = {}
+        for name, strategy in ranked:
+            pending = None
+            if name == self.primary and self.publisher is not None:
+                pending = sum(1 for s in self.publisher.prediction_status.values() if s == '⌛')
+            stats[name] = dict(strategy.get_stats(pending), primary=(name == self.primary),
+                               rule=strategy.rule.describe())
+        return stats
+
+    @staticmethod
+    def parse_spec(spec: str) -> List[Tuple[str, TriggerRule]]:
+        """
+        Stratégies depuis une chaîne de configuration:
+        "nom:ace_count=2,distance=2;large:window=5,valid_cards=2x3"
+        (valid_cards: AxB ou 'toutes'; block_other_group: oui/non)
+        La chaîne entière est validée: ValueError à la première erreur, aucune
+        stratégie n'est retournée partiellement.
+        """
+        strategies = []
+        names = set()
+        for item in filter(None, (part.strip() for part in spec.split(";"))):
+            name, _, params = item.partition(":")
+            name = name.strip()
+            if not name:
+                raise ValueError(f"stratégie sans nom: '{item}'")
+            if name in names:
+                raise ValueError(f"stratégie en double: {name}")
+            names.add(name)
+            kwargs: Dict[str, Any] = {}
+            for param in filter(None, (p.strip() for p in params.split(","))):
+                key, _, value = param.partition("=")
+                key, value = key.strip(), value.strip()
+                if key == "valid_cards":
+                    if value in ("toutes", "any"):
+                        kwargs[key] = None
+                    else:
+                        counts = value.split("x")
+                        if len(counts) != 2 or not all(c.strip().isdigit() for c in counts):
+                            raise ValueError(f"valid_cards attendu sous la forme AxB: {value}")
+                        kwargs[key] = (int(counts[0]), int(counts[1]))
+                elif key == "block_other_group":
+                    kwargs[key] = value.lower() in ("oui", "1", "true", "yes")
+                elif key == "trigger_group":
+                    kwargs[key] = int(value) - 1  # 1 = premier groupe
+                elif key in ("ace_count", "distance", "window"):
+                    kwargs[key] = int(value)
+                else:
+                    raise ValueError(f"paramètre de stratégie inconnu: {key}")
+            try:
+                strategies.append((name, TriggerRule(**kwargs)))
+            except ValueError as e:
+                raise ValueError(f"stratégie {name}: {e}") from e
+        return strategies
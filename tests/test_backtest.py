@@ -0,0 +1,113 @@
+"""
+Non-régression du rejeu hors ligne (backtest)
+Les compteurs d'un historique synthétique fixe sont figés: toute modification
+de CardPredictor ou de TriggerRule qui change une décision (déclenchement,
+vérification, expiration) fait échouer ces tests.
+
+Les valeurs de référence de la règle en production ont été obtenues avec le
+CardPredictor d'origine (avant l'index d'expiration et le cache d'analyse).
+
+Usage:
+    python -m pytest -q tests
+"""
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import Backtest, ParallelBacktest, iter_source, synthetic_messages  # noqa: E402
+from predictor import TriggerRule  # noqa: E402
+
+SYNTHETIC_COUNT = 20000
+SYNTHETIC_SEED = 42
+# Champs du rapport qui dépendent de la machine
+TIMING_FIELDS = ("jobs", "wall_seconds", "engine_seconds", "parent_seconds",
+                 "messages_per_second", "engine_messages_per_second")
+
+
+def replay(rule=None, **kwargs):
+    counters = Backtest(rule=rule, **kwargs).feed(synthetic_messages(SYNTHETIC_COUNT, seed=SYNTHETIC_SEED)).counters()
+    counters.pop("engine_seconds")
+    return counters
+
+
+def test_production_rule_counters():
+    assert replay() == {
+        "messages": 25944,
+        "duplicates": 0,
+        "cycles": 14,
+        "predictions": 2801,
+        "offsets": {0: 987, 1: 561, 2: 338, 3: 215},
+        "expired": 695,
+        "unresolved": 5,
+        "pending": 0,
+    }
+
+
+def test_parameterised_rule_counters():
+    rule = TriggerRule(ace_count=2, distance=2, window=2, valid_cards=(2, 3))
+    assert replay(rule) == {
+        "messages": 25944,
+        "duplicates": 0,
+        "cycles": 14,
+        "predictions": 164,
+        "offsets": {0: 33, 1: 36, 2: 16},
+        "expired": 79,
+        "unresolved": 0,
+        "pending": 0,
+    }
+
+
+def test_default_rule_is_production_rule():
+    assert replay(TriggerRule()) == replay()
+
+
+def test_duplicates_are_skipped():
+    messages = list(synthetic_messages(2000, seed=SYNTHETIC_SEED))
+    single = Backtest().feed(messages).counters()
+    doubled = Backtest().feed(message for message in messages for _ in range(2)).counters()
+    assert doubled["duplicates"] == len(messages)
+    for key in ("predictions", "offsets", "expired", "unresolved", "pending"):
+        assert doubled[key] == single[key]
+
+
+def outcome(report):
+    return {key: value for key, value in report.items() if key not in TIMING_FIELDS}
+
+
+def test_synthetic_slices_match_full_generation():
+    full = list(synthetic_messages(5000, seed=SYNTHETIC_SEED))
+    tail = list(synthetic_messages(3000, seed=SYNTHETIC_SEED, start=2000))
+    assert tail == [message for message in full if message[1] > 2000]
+
+
+def test_parallel_synthetic_matches_sequential():
+    sequential = Backtest(dedupe=False).run(synthetic_messages(SYNTHETIC_COUNT, seed=SYNTHETIC_SEED))
+    parallel = ParallelBacktest(jobs=2, dedupe=False).run_synthetic(SYNTHETIC_COUNT, seed=SYNTHETIC_SEED)
+    assert outcome(parallel) == outcome(sequential)
+
+
+def test_parallel_capture_matches_sequential(tmp_path):
+    # Capture avec doublons (y compris à cheval sur deux tranches) et messages sans numéro
+    rng = random.Random(SYNTHETIC_SEED)
+    events = []
+    for message in synthetic_messages(6000, seed=SYNTHETIC_SEED):
+        events.append(message)
+        if rng.random() < 0.05:
+            events.append(message)
+        if rng.random() < 0.01:
+            events.append(("new", None, "Message sans numéro de jeu"))
+        if rng.random() < 0.005 and len(events) > 300:
+            events.append(events[-rng.randint(50, 300)])
+    capture = tmp_path / "stat_events.jsonl"
+    with open(capture, "w", encoding="utf-8") as f:
+        for kind, message_id, text in events:
+            f.write(json.dumps({"type": kind, "chat_id": 1, "message_id": message_id, "ts": 0, "text": text},
+                               ensure_ascii=False) + "\n")
+
+    sequential = Backtest().run(iter_source(str(capture)))
+    parallel = ParallelBacktest(jobs=2, min_shard_bytes=20000).run_source(str(capture))
+    assert sequential["duplicates"] > 0
+    assert outcome(parallel) == outcome(sequential)
@@ -0,0 +1,62 @@
+"""
+Grid search aligné sur le backtest
+evaluate() réimplémente en colonnes les décisions de CardPredictor (déclenchement,
+vérification, expiration) pour la vitesse: ses compteurs doivent rester égaux à
+ceux de Backtest, qui passe par CardPredictor, pour toute une grille de règles.
+
+Usage:
+    python -m pytest -q tests
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import Backtest, synthetic_messages  # noqa: E402
+from grid_search import ParsedCorpus, build_grid, evaluate, search  # noqa: E402
+from predictor import TriggerRule  # noqa: E402
+
+FIXTURE_COUNT = 2500
+FIXTURE_SEED = 7
+
+
+def fixture_messages():
+    """Deux cycles de résultats synthétiques, avec quelques doublons"""
+    rng = random.Random(FIXTURE_SEED)
+    events = []
+    for message in synthetic_messages(FIXTURE_COUNT, seed=FIXTURE_SEED):
+        events.append(message)
+        if rng.random() < 0.03:
+            events.append(message)
+    return events
+
+
+def backtest_counters(messages, rule):
+    counters = Backtest(rule=rule).feed(messages).counters()
+    counters.pop("engine_seconds")
+    return counters
+
+
+def grid_counters(corpus, rule):
+    counters = evaluate(corpus, rule)
+    counters.pop("engine_seconds")
+    return counters
+
+
+def test_evaluate_matches_backtest_over_grid():
+    messages = fixture_messages()
+    corpus = ParsedCorpus.build(messages)
+    assert corpus.duplicates > 0 and len(corpus.cycle_starts) > 1
+    rules = build_grid([0, 1, 2], [0, 1], [True, False], [1, 2], [0, 1, 3], [(2, 2), (2, 3), None])
+    mismatches = [rule.describe() for rule in rules
+                  if grid_counters(corpus, rule) != backtest_counters(messages, rule)]
+    assert mismatches == []
+
+
+def test_search_reports_production_rule_like_backtest():
+    messages = fixture_messages()
+    report = search(ParsedCorpus.build(messages), [TriggerRule()], jobs=1)[0]
+    expected = Backtest().run(messages)
+    for key in ("predictions", "wins", "losses", "pending", "win_rate", "offsets"):
+        assert report[key] == expected[key]
@@ -0,0 +1,129 @@
+"""
+Stratégies en ombre alignées sur CardPredictor
+ShadowPredictor.step rejoue les décisions de CardPredictor à partir d'une
+analyse partagée: sur un cycle de résultats, chaque stratégie doit compter
+exactement ce que compte Backtest (qui passe par CardPredictor) pour sa règle.
+STRATEGIES est validée en entier par parse_spec.
+
+Usage:
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import Backtest, synthetic_messages  # noqa: E402
+from predictor import CardPredictor, TriggerRule  # noqa: E402
+from strategies import (F_PENDING, F_FINAL, F_VERIFY, F_TWO_GROUPS, F_SUITS_1, F_SUITS_2,  # noqa: E402
+                        NO_GAME, StrategyRegistry, parse_message)
+
+# Un seul cycle (1440 jeux par cycle): les stratégies en direct ne repartent pas de zéro
+CYCLE_COUNT = 1400
+CYCLE_SEED = 42
+SPEC = ("deux_as:ace_count=2,distance=2,window=2,valid_cards=2x3;"
+        "g2:trigger_group=2,block_other_group=non,window=1;"
+        "large:window=5,valid_cards=toutes")
+
+
+def cycle_messages():
+    return list(synthetic_messages(CYCLE_COUNT, seed=CYCLE_SEED))
+
+
+def expected_stats(messages, rule):
+    """Compteurs de Backtest au format ShadowPredictor.get_stats"""
+    counters = Backtest(rule=rule).feed(messages).counters()
+    offsets = [counters["offsets"][offset] for offset in range(rule.window + 1)]
+    wins, losses = sum(offsets), counters["expired"]
+    return {
+        "predictions": counters["predictions"],
+        "wins": wins,
+        "losses": losses,
+        "pending": counters["pending"],
+        "win_rate": round(wins / (wins + losses) * 100, 2) if wins + losses else 0.0,
+        "offsets": offsets,
+    }
+
+
+def shadow_stats(stats):
+    return {key: value for key, value in stats.items() if key not in ("primary", "rule")}
+
+
+def test_parse_message():
+    parser = CardPredictor()
+    assert parse_message(parser, "#N4. ✅6(J♦️A♠️5♦️) - 0(J♦️Q♥️Q♣️)") == \
+        (4, F_FINAL | F_VERIFY | F_TWO_GROUPS | F_SUITS_1 | F_SUITS_2, (1, 0), (3, 3))
+    assert parse_message(parser, "⏰#N5. 2(3♠️9♠️) - ▶️6(9♦️3♠️4♠️)") == \
+        (5, F_PENDING | F_TWO_GROUPS | F_SUITS_1 | F_SUITS_2, (0, 0), (2, 3))
+    assert parse_message(parser, "Bonjour") == (NO_GAME, 0, (0, 0), (0, 0))
+
+
+def test_default_shadow_matches_card_predictor():
+    messages = cycle_messages()
+    registry = StrategyRegistry()
+    registry.register("production", TriggerRule())
+    for _, _, text in messages:
+        registry.process(text)
+    assert shadow_stats(registry.get_stats()["production"]) == expected_stats(messages, TriggerRule())
+
+
+def test_spec_shadows_match_card_predictor():
+    messages = cycle_messages()
+    registry = StrategyRegistry()
+    rules = dict(StrategyRegistry.parse_spec(SPEC))
+    for name, rule in rules.items():
+        registry.register(name, rule)
+    for _, _, text in messages:
+        registry.process(text)
+    stats = registry.get_stats()
+    for name, rule in rules.items():
+        assert shadow_stats(stats[name]) == expected_stats(messages, rule), name
+
+
+def test_primary_follows_publishing_predictor():
+    messages = cycle_messages()
+    rule = TriggerRule()
+    replay = Backtest(rule=rule)
+    registry = StrategyRegistry(replay.predictor)
+    registry.register("production", rule, primary=True)
+    registry.register("ombre", rule)
+    for kind, message_id, text in messages:
+        registry.process(text)
+        predictions, offsets, expired = replay.predictions, dict(replay.offsets), replay.expired
+        replay.process(kind, message_id, text)
+        offset = next((o for o, count in replay.offsets.items() if count != offsets[o]), None)
+        registry.record_primary(replay.predictions > predictions,
+                                None if offset is None else rule.status(offset), replay.expired - expired)
+    stats = registry.get_stats()
+    assert stats["production"]["primary"]
+    assert shadow_stats(stats["production"]) == shadow_stats(stats["ombre"]) == expected_stats(messages, rule)
+
+
+def test_parse_spec():
+    assert StrategyRegistry.parse_spec(" a:ace_count=2,distance=2 ; b:valid_cards=toutes,block_other_group=non,"
+                                       "trigger_group=2;c:window=5,valid_cards=2x3;") == [
+        ("a", TriggerRule(ace_count=2, distance=2)),
+        ("b", TriggerRule(valid_cards=None, block_other_group=False, trigger_group=1)),
+        ("c", TriggerRule(window=5, valid_cards=(2, 3))),
+    ]
+    assert StrategyRegistry.parse_spec("") == []
+
+
+@pytest.mark.parametrize("spec", [
+    "a:foo=1",
+    "a:valid_cards=2x",
+    "a:valid_cards=2x3x4",
+    "a:valid_cards=deux",
+    "a:window=deux",
+    "a:window=12",
+    "a:distance=0",
+    "a:trigger_group=3",
+    ":window=2",
+    "a:window=2;a:window=3",
+    "ok:window=2;a:foo=1",
+])
+def test_parse_spec_rejects_malformed(spec):
+    with pytest.raises(ValueError):
+        StrategyRegistry.parse_spec(spec)
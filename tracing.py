@@ -0,0 +1,161 @@
+"""
+Traçage par message du pipeline de statistiques
+Chaque mise à jour reçoit un identifiant de corrélation et une suite d'étapes
+chronométrées (réception → routage → file → analyse → ... → envoi/édition).
+Les traces sont écrites en JSONL dans un fichier à rotation (thread d'écriture
+séparé) et résumées en p50/p95/p99 par étape pour /status.
+"""
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+from log_setup import DeferredQueueHandler, get_logger
+
+logger = get_logger('tracing')
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Sérialise le dictionnaire de trace (formaté dans le thread d'écriture)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, separators=(',', ':'))
+
+
+class Trace:
+    """Trace d'une mise à jour: étapes chronométrées par tours successifs"""
+
+    __slots__ = ('tracer', 'trace_id', 'attrs', 'started', 'last', 'spans')
+
+    def __init__(self, tracer: "Tracer", trace_id: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.spans: List[tuple] = []
+
+    def add(self, stage: str, seconds: float):
+        """Ajoute une étape mesurée ailleurs"""
+        self.spans.append((stage, seconds))
+
+    def lap(self, stage: str):
+        """Clôt l'étape en cours: durée depuis le tour précédent"""
+        now = time.perf_counter()
+        self.spans.append((stage, now - self.last))
+        self.last = now
+
+    def total(self, *stages: str) -> float:
+        """Durée cumulée des étapes données"""
+        return sum(seconds for stage, seconds in self.spans if stage in stages)
+
+    def skip(self):
+        """Ignore le temps écoulé depuis le tour précédent"""
+        self.last = time.perf_counter()
+
+    def finish(self, **attrs):
+        """Termine la trace et l'écrit"""
+        self.attrs.update(attrs)
+        self.tracer.finish(self)
+
+
+class Tracer:
+    """Création, agrégation et écriture des traces"""
+
+    def __init__(self, trace_file: str = "traces/stat_trace.jsonl", max_bytes: int = 5 * 1024 * 1024,
+                 backups: int = 3, window: int = 2000, histogram=None):
+        """
+        Args:
+            trace_file: Fichier JSONL (rotation à max_bytes, 'backups' fichiers conservés)
+            window: Nombre de durées récentes conservées par étape pour les percentiles
+            histogram: Histogramme (label 'stage') alimenté par chaque étape
+        """
+        self.window = window
+        self.histogram = histogram
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}-{int(time.time()):x}"
+        self.durations: Dict[str, deque] = {}
+        self.traces = 0
+        self._listener = None
+        self._logger = logging.getLogger(f"trace.{id(self):x}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if trace_file:
+            try:
+                Path(trace_file).parent.mkdir(parents=True, exist_ok=True)
+                output = logging.handlers.RotatingFileHandler(trace_file, maxBytes=max_bytes,
+                                                              backupCount=backups, encoding='utf-8')
+                output.setFormatter(JsonLineFormatter())
+                trace_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+                self._logger.addHandler(DeferredQueueHandler(trace_queue))
+                self._listener = logging.handlers.QueueListener(trace_queue, output)
+                self._listener.start()
+            except OSError as e:
+                logger.warning("⚠️ Traces désactivées (%s): %s", trace_file, e)
+
+    def start(self, **attrs) -> Trace:
+        """Nouvelle trace avec identifiant de corrélation"""
+        return Trace(self, f"{self._prefix}-{next(self._ids)}", attrs)
+
+    def _observe(self, stage: str, seconds: float):
+        samples = self.durations.get(stage)
+        if samples is None:
+            samples = self.durations[stage] = deque(maxlen=self.window)
+        samples.append(seconds)
+        if self.histogram is not None:
+            self.histogram.labels(stage).observe(seconds)
+
+    def finish(self, trace: Trace):
+        """Agrège les étapes et écrit la trace"""
+        total = time.perf_counter() - trace.started
+        for stage, seconds in trace.spans:
+            self._observe(stage, seconds)
+        self.traces += 1
+        self._write({
+            "trace_id": trace.trace_id,
+            "ts": round(time.time(), 3),
+            **trace.attrs,
+            "total_ms": round(total * 1000, 3),
+            "spans": {stage: round(seconds * 1000, 3) for stage, seconds in trace.spans},
+        })
+
+    def record(self, trace_id: Optional[str], stage: str, seconds: float, **attrs):
+        """Étape asynchrone rattachée à une trace déjà écrite (ex: envoi ou édition différés)"""
+        self._observe(stage, seconds)
+        if trace_id:
+            self._write({"trace_id": trace_id, "ts": round(time.time(), 3), **attrs,
+                         "spans": {stage: round(seconds * 1000, 3)}})
+
+    def _write(self, data: Dict[str, Any]):
+        if self._listener is not None:
+            self._logger.info(data)
+
+    @staticmethod
+    def _percentile(ordered: List[float], q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 (ms) par étape sur la fenêtre récente"""
+        summary = {}
+        for stage, samples in self.durations.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            summary[stage] = {
+                "count": len(ordered),
+                "p50_ms": round(self._percentile(ordered, 0.50) * 1000, 3),
+                "p95_ms": round(self._percentile(ordered, 0.95) * 1000, 3),
+                "p99_ms": round(self._percentile(ordered, 0.99) * 1000, 3),
+            }
+        return summary
+
+    def stop(self):
+        """Vide la file et arrête le thread d'écriture"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
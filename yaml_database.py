@@ -7,6 +7,13 @@ import os
 from datetime import datetime, date, time
 from typing import Dict, Any, Optional, List
 from pathlib import Path
+from metrics import Histogram
+from log_setup import get_logger
+
+logger = get_logger('yaml_database')
+
+YAML_LOAD_SECONDS = Histogram('yaml_load_duration_seconds', "Durée de lecture des fichiers YAML", ('file',))
+YAML_SAVE_SECONDS = Histogram('yaml_save_duration_seconds', "Durée d'écriture des fichiers YAML", ('file',))
 
 class YAMLDatabase:
     """Gestionnaire de base de données YAML pour le bot"""
@@ -26,9 +33,14 @@ class YAMLDatabase:
         self.predictions_file = self.db_dir / "predictions.yaml"
         self.auto_predictions_file = self.db_dir / "auto_predictions.yaml"
         self.messages_file = self.db_dir / "messages_history.yaml"
+        self.message_index_file = self.db_dir / "message_index.yaml"
+        
+        # Index en mémoire numéro de jeu → messages de prédiction (chargé une fois)
+        self._message_index: Optional[Dict[int, List[Dict[str, int]]]] = None
+        self.message_index_size = 5000
         
         self._init_files()
-        print("✅ Base de données YAML initialisée")
+        logger.info("✅ Base de données YAML initialisée")
     
     def _init_files(self):
         """Initialise les fichiers YAML s'ils n'existent pas"""
@@ -36,7 +48,8 @@ class YAMLDatabase:
             self.config_file: {},
             self.predictions_file: {"predictions": []},
             self.auto_predictions_file: {"auto_predictions": []},
-            self.messages_file: {"messages": []}
+            self.messages_file: {"messages": []},
+            self.message_index_file: {"messages": {}}
         }
         
         for file_path, default_content in default_files.items():
@@ -47,20 +60,22 @@ class YAMLDatabase:
         """Charge un fichier YAML"""
         try:
             if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return yaml.safe_load(f) or {}
+                with YAML_LOAD_SECONDS.labels(file_path.name).time():
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        return yaml.safe_load(f) or {}
             return {}
         except Exception as e:
-            print(f"Erreur chargement {file_path}: {e}")
+            logger.error("Erreur chargement %s: %s", file_path, e)
             return {}
     
     def _save_yaml(self, file_path: Path, data: Dict[str, Any]):
         """Sauvegarde un fichier YAML"""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, default_flow_style=False, allow_unicode=True, indent=2)
+            with YAML_SAVE_SECONDS.labels(file_path.name).time():
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    yaml.dump(data, f, default_flow_style=False, allow_unicode=True, indent=2)
         except Exception as e:
-            print(f"Erreur sauvegarde {file_path}: {e}")
+            logger.error("Erreur sauvegarde %s: %s", file_path, e)
     
     # === CONFIGURATION ===
     def get_config(self, key: str) -> Optional[str]:
@@ -69,7 +84,7 @@ class YAMLDatabase:
             config = self._load_yaml(self.config_file)
             return config.get(key)
         except Exception as e:
-            print(f"Erreur get_config({key}): {e}")
+            logger.error("Erreur get_config(%s): %s", key, e)
             return None
     
     def set_config(self, key: str, value: Any):
@@ -79,9 +94,9 @@ class YAMLDatabase:
             config[key] = str(value) if value is not None else None
             config['updated_at'] = datetime.now().isoformat()
             self._save_yaml(self.config_file, config)
-            print(f"✅ Configuration mise à jour: {key} = {value}")
+            logger.info("✅ Configuration mise à jour: %s = %s", key, value)
         except Exception as e:
-            print(f"Erreur set_config({key}, {value}): {e}")
+            logger.error("Erreur set_config(%s, %s): %s", key, value, e)
     
     def get_all_config(self) -> Dict[str, Any]:
         """Récupère toute la configuration"""
@@ -110,10 +125,10 @@ class YAMLDatabase:
             
             predictions_data["predictions"].append(prediction)
             self._save_yaml(self.predictions_file, predictions_data)
-            print(f"✅ Prédiction ajoutée: #{game_number}")
+            logger.debug("✅ Prédiction ajoutée: #%s", game_number)
             return True
         except Exception as e:
-            print(f"Erreur add_prediction: {e}")
+            logger.error("Erreur add_prediction: %s", e)
             return False
     
     def update_prediction_status(self, game_number: int, status: str) -> bool:
@@ -123,17 +138,18 @@ class YAMLDatabase:
             if "predictions" not in predictions_data:
                 return False
             
-            for prediction in predictions_data["predictions"]:
+            # La plus récente d'abord (les numéros de jeu reviennent après une remise à zéro)
+            for prediction in reversed(predictions_data["predictions"]):
                 if prediction["game_number"] == game_number:
                     prediction["status"] = status
                     prediction["verified_at"] = datetime.now().isoformat()
                     self._save_yaml(self.predictions_file, predictions_data)
-                    print(f"✅ Statut prédiction #{game_number} mis à jour: {status}")
+                    logger.debug("✅ Statut prédiction #%s mis à jour: %s", game_number, status)
                     return True
             
             return False
         except Exception as e:
-            print(f"Erreur update_prediction_status: {e}")
+            logger.error("Erreur update_prediction_status: %s", e)
             return False
     
     def get_prediction(self, game_number: int) -> Optional[Dict[str, Any]]:
@@ -148,7 +164,7 @@ class YAMLDatabase:
                     return prediction
             return None
         except Exception as e:
-            print(f"Erreur get_prediction: {e}")
+            logger.error("Erreur get_prediction: %s", e)
             return None
     
     def get_pending_predictions(self) -> List[Dict[str, Any]]:
@@ -160,7 +176,7 @@ class YAMLDatabase:
             
             return [p for p in predictions_data["predictions"] if p["status"] == "⌛"]
         except Exception as e:
-            print(f"Erreur get_pending_predictions: {e}")
+            logger.error("Erreur get_pending_predictions: %s", e)
             return []
     
     def get_all_predictions(self) -> List[Dict[str, Any]]:
@@ -169,9 +185,49 @@ class YAMLDatabase:
             predictions_data = self._load_yaml(self.predictions_file)
             return predictions_data.get("predictions", [])
         except Exception as e:
-            print(f"Erreur get_all_predictions: {e}")
+            logger.error("Erreur get_all_predictions: %s", e)
             return []
     
+    # === INDEX DES MESSAGES DE PRÉDICTION ===
+    def load_message_index(self) -> Dict[int, List[Dict[str, int]]]:
+        """Charge (une seule fois) l'index numéro de jeu → messages diffusés"""
+        if self._message_index is None:
+            data = self._load_yaml(self.message_index_file).get("messages") or {}
+            self._message_index = {int(game): list(messages) for game, messages in data.items()}
+        return self._message_index
+    
+    def set_prediction_messages(self, game_number: int, messages: List[tuple]):
+        """Enregistre les messages (chat_id, message_id) d'une prédiction diffusée"""
+        try:
+            index = self.load_message_index()
+            index.pop(game_number, None)
+            index[game_number] = [{"chat_id": chat_id, "message_id": message_id}
+                                  for chat_id, message_id in messages]
+            # Garder seulement les prédictions les plus récentes
+            while len(index) > self.message_index_size:
+                del index[next(iter(index))]
+            self._save_yaml(self.message_index_file, {"messages": index})
+        except Exception as e:
+            logger.error("Erreur set_prediction_messages: %s", e)
+    
+    def get_prediction_messages(self, game_number: int) -> List[Dict[str, int]]:
+        """Messages diffusés pour une prédiction (O(1), sans relire le fichier)"""
+        return self.load_message_index().get(game_number, [])
+    
+    def forget_prediction_messages(self, game_number: int):
+        """Retire les messages d'une prédiction précédente (le numéro de jeu est réutilisé)"""
+        try:
+            index = self.load_message_index()
+            if index.pop(game_number, None) is not None:
+                self._save_yaml(self.message_index_file, {"messages": index})
+        except Exception as e:
+            logger.error("Erreur forget_prediction_messages: %s", e)
+    
+    def clear_message_index(self):
+        """Vide l'index des messages de prédiction"""
+        self._message_index = {}
+        self._save_yaml(self.message_index_file, {"messages": {}})
+    
     # === PRÉDICTIONS AUTOMATIQUES (SCHEDULER) ===
     def add_auto_prediction(self, numero: str, lanceur: str, heure_lancement: str,
                            heure_prediction: str, **kwargs) -> bool:
@@ -198,10 +254,10 @@ class YAMLDatabase:
             
             auto_data["auto_predictions"].append(prediction)
             self._save_yaml(self.auto_predictions_file, auto_data)
-            print(f"✅ Prédiction automatique ajoutée: {numero}")
+            logger.debug("✅ Prédiction automatique ajoutée: %s", numero)
             return True
         except Exception as e:
-            print(f"Erreur add_auto_prediction: {e}")
+            logger.error("Erreur add_auto_prediction: %s", e)
             return False
     
     def update_auto_prediction(self, numero: str, **kwargs) -> bool:
@@ -217,12 +273,12 @@ class YAMLDatabase:
                         if key in prediction:
                             prediction[key] = value
                     self._save_yaml(self.auto_predictions_file, auto_data)
-                    print(f"✅ Prédiction automatique {numero} mise à jour")
+                    logger.debug("✅ Prédiction automatique %s mise à jour", numero)
                     return True
             
             return False
         except Exception as e:
-            print(f"Erreur update_auto_prediction: {e}")
+            logger.error("Erreur update_auto_prediction: %s", e)
             return False
     
     def get_auto_prediction(self, numero: str) -> Optional[Dict[str, Any]]:
@@ -237,7 +293,7 @@ class YAMLDatabase:
                     return prediction
             return None
         except Exception as e:
-            print(f"Erreur get_auto_prediction: {e}")
+            logger.error("Erreur get_auto_prediction: %s", e)
             return None
     
     def get_pending_auto_predictions(self) -> List[Dict[str, Any]]:
@@ -250,7 +306,7 @@ class YAMLDatabase:
             return [p for p in auto_data["auto_predictions"] 
                    if p["launched"] and not p["verified"]]
         except Exception as e:
-            print(f"Erreur get_pending_auto_predictions: {e}")
+            logger.error("Erreur get_pending_auto_predictions: %s", e)
             return []
     
     # === HISTORIQUE DES MESSAGES ===
@@ -279,7 +335,7 @@ class YAMLDatabase:
             
             self._save_yaml(self.messages_file, messages_data)
         except Exception as e:
-            print(f"Erreur add_message_history: {e}")
+            logger.error("Erreur add_message_history: %s", e)
     
     # === STATISTIQUES ===
     def get_prediction_statistics(self) -> Dict[str, Any]:
@@ -327,7 +383,7 @@ class YAMLDatabase:
                 }
             }
         except Exception as e:
-            print(f"Erreur get_prediction_statistics: {e}")
+            logger.error("Erreur get_prediction_statistics: %s", e)
             return {"total": 0, "wins": 0, "losses": 0, "pending": 0, "win_rate": 0.0}
 
 # Instance globale
@@ -340,5 +396,5 @@ def init_yaml_database():
         yaml_db = YAMLDatabase()
         return yaml_db
     except Exception as e:
-        print(f"❌ Erreur initialisation base YAML: {e}")
+        logger.error("❌ Erreur initialisation base YAML: %s", e)
         return None
\ No newline at end of file